@@ -0,0 +1,216 @@
+import re
+import time
+import random
+
+class ContactExtractor:
+    """
+    The ContactExtractor module finds the emails, Cloudflare-protected emails, facebooks, instagrams, twitters
+    and linkedins of a webpage in a single scan over the raw bytes of the response, so the page does not need
+    to be decoded. All patterns are compiled once, and the contacts are returned already normalized: in
+    lowercase and without the trailing '/' of SNS links.
+    """
+
+    # SNS networks in the order of the returned sets, after emails
+    networks = (b'facebook', b'instagram', b'twitter', b'linkedin')
+
+    # every contact contains one of these anchors, which start with characters that are rare in HTML: the '@'
+    # of an email, the '=' of the data-cfemail attribute and the '.com/' of an SNS link
+    __anchor_pattern = re.compile(rb'@|="([a-z0-9]{38})"|\.com/([@a-z0-9_-]+)/?"')
+    # domain of an email, matched after the '@'
+    __domain_pattern = re.compile(rb'[a-z0-9_-]+\.com')
+    # characters of the local part of an email, found before the '@'
+    __local_chars = frozenset(b'abcdefghijklmnopqrstuvwxyz0123456789_-')
+
+    # bytes of the previous chunk scanned again with the next chunk, longer than any contact
+    overlap = 1024
+
+    def extract(self, content):
+        """Extracts the contacts of a webpage.
+
+        Pre:
+            content: raw bytes of the webpage, or its decoded HTML
+        Post:
+            None
+        Return:
+            emails, facebooks, instagrams, twitters, linkedins: sets of normalized contacts
+        """
+
+        return self.extract_chunks([content])
+
+    def extract_chunks(self, chunks):
+        """Extracts the contacts of a webpage read in chunks, so the whole page never needs to be in memory.
+        The end of each chunk is scanned again with the next one, so contacts split between chunks are found.
+
+        Pre:
+            chunks: iterable of raw bytes, or decoded HTML, of consecutive parts of the webpage
+        Post:
+            None
+        Return:
+            emails, facebooks, instagrams, twitters, linkedins: sets of normalized contacts
+        """
+
+        emails = set()
+        sns = {}
+        for network in self.networks:
+            sns[network] = set()
+
+        tail = b''
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8', errors='ignore')
+            content = tail + chunk.lower()
+            self.__scan(content, len(tail) > 0, emails, sns)
+            tail = content[-self.overlap:]
+
+        return emails, sns[b'facebook'], sns[b'instagram'], sns[b'twitter'], sns[b'linkedin']
+
+    def __scan(self, content, continued, emails, sns):
+        """Adds the contacts found in lowercase bytes to the sets of contacts.
+
+        Pre:
+            content: lowercase bytes of the webpage, or of a part of it
+            continued: whether content starts in the middle of the webpage, in which case an email starting at
+                       the first byte may be cut off and is skipped
+            emails: set of emails to add to
+            sns: dictionary of the sets of SNS contacts by network
+        Post:
+            contacts added to emails and sns
+        Return:
+            None
+        """
+
+        local_chars = self.__local_chars
+        domain_match = self.__domain_pattern.match
+        for match in self.__anchor_pattern.finditer(content):
+            handle = match.group(2)
+            if handle != None:
+                # SNS link: the network name must directly precede '.com/'
+                for network in self.networks:
+                    if content.endswith(network, 0, match.start()):
+                        sns[network].add((network + b'.com/' + handle).decode('ascii'))
+                        break
+                continue
+            encoded = match.group(1)
+            if encoded != None:
+                if content.endswith(b'data-cfemail', 0, match.start()):
+                    emails.add(self.decode_email(encoded.decode('ascii')).lower())
+                continue
+
+            # email: expand the local part left of the '@' and match the domain right of it
+            at = match.start()
+            start = at
+            while start > 0 and content[start - 1] in local_chars:
+                start -= 1
+            if start == at or (start == 0 and continued):
+                continue
+            domain = domain_match(content, at + 1)
+            if domain != None:
+                emails.add(content[start : domain.end()].decode('ascii'))
+
+    @staticmethod
+    def decode_email(email):
+        """Decodes an email encoded by Cloudflare.
+
+        Pre:
+            email: hexadecimal encoded email, starting with the key
+        Post:
+            None
+        Return:
+            decoded: decoded email
+        """
+
+        decoded = ''
+        key = int(email[:2], 16)
+
+        for i in range(2, len(email)-1, 2):
+            decoded += chr(int(email[i:i+2], 16)^key)   # ^ stands for XOR
+
+        return decoded
+
+def legacy_extract(html):
+    """Extracts the contacts of a webpage with the separate scans used before the ContactExtractor module,
+    as a baseline for the benchmark.
+
+    Pre:
+        html: decoded HTML of the webpage
+    Post:
+        None
+    Return:
+        emails, facebooks, instagrams, twitters, linkedins: sets of normalized contacts
+    """
+
+    emails = set()
+    for email in re.findall('[a-z0-9-_]+@[a-z0-9-_]+.com', html, re.IGNORECASE):
+        emails.add(email.lower())
+    for email in re.findall("data-cfemail=\"[a-z0-9]{38}\"", html):
+        emails.add(ContactExtractor.decode_email(email[-39:-1]).lower())
+
+    networks = []
+    for network in ['facebook', 'instagram', 'twitter', 'linkedin']:
+        contacts = set()
+        for contact in re.findall(network + '.com/[@a-z0-9-_]+/?\"', html, re.IGNORECASE):
+            if (contact[-2 : -1] == '/'):
+                contacts.add(contact.lower()[:-2])
+            else:
+                contacts.add(contact.lower()[:-1])
+        networks.append(contacts)
+
+    return emails, networks[0], networks[1], networks[2], networks[3]
+
+def generate_page(size):
+    """Generates an HTML page with contacts scattered through filler text, for the benchmark.
+
+    Pre:
+        size: approximate size of the page in bytes
+    Post:
+        None
+    Return:
+        page: bytes of the page
+    """
+
+    words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', '<div class="post">', '</div>',
+             '<a href="/blog/page">read more</a>', '<img src="/images/photo@2x.png">', 'style="color: #fff"']
+    chunks = []
+    length = 0
+    count = 0
+    rng = random.Random(0)
+    while length < size:
+        count += 1
+        if count % 500 == 0:
+            chunk = '<a href="mailto:Writer{0}@Blog{0}.com">Writer{0}@Blog{0}.com</a>'.format(count)
+        elif count % 701 == 0:
+            chunk = '<a href="https://www.Facebook.com/page{}/">fb</a> <a href="https://instagram.com/insta{}">ig</a>'.format(count, count)
+        elif count % 907 == 0:
+            chunk = '<a href="https://twitter.com/tw{}">tw</a> <a href="https://www.linkedin.com/in{}/">in</a>'.format(count, count)
+        elif count % 1103 == 0:
+            chunk = '<a class="__cf_email__" data-cfemail="{}">[email protected]</a>'.format(''.join(rng.choice('0123456789abcdef') for i in range(38)))
+        else:
+            chunk = rng.choice(words)
+        chunks.append(chunk)
+        length += len(chunk) + 1
+    return ' '.join(chunks).encode('utf-8')
+
+if __name__ == '__main__':
+    extractor = ContactExtractor()
+    print('Contact extraction benchmark (best of 5 runs)')
+    print('---------------------------------------------')
+    for megabytes in [1, 4, 16]:
+        page = generate_page(megabytes * 1024 * 1024)
+
+        legacy_secs = float('inf')
+        for i in range(5):
+            start = time.perf_counter()
+            legacy_result = legacy_extract(page.decode('utf-8'))
+            legacy_secs = min(legacy_secs, time.perf_counter() - start)
+
+        secs = float('inf')
+        for i in range(5):
+            start = time.perf_counter()
+            result = extractor.extract(page)
+            secs = min(secs, time.perf_counter() - start)
+
+        chunks = [page[i : i + 65536] for i in range(0, len(page), 65536)]
+        chunked_result = extractor.extract_chunks(chunks)
+
+        print('{:>3} MB: legacy {:8.1f} ms, single pass {:8.1f} ms, {:5.1f}x faster, same contacts: {}, same contacts in 64 KB chunks: {}'.format(
+              megabytes, legacy_secs * 1000, secs * 1000, legacy_secs / secs, result == legacy_result, chunked_result == legacy_result))
@@ -0,0 +1,309 @@
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from ContactRecord import ContactRecord
+from DomainResolver import get_resolver
+
+class BloomFilter:
+    """A Bloom filter of strings, whose bits can be saved and loaded again."""
+
+    def __init__(self, capacity, error_rate, bits=None, count=0):
+        """Creates a filter.
+
+        Pre:
+            capacity: number of items the filter holds at the given error rate
+            error_rate: probability that an item not added is reported as added
+            bits: saved bits of a filter of the same capacity and error rate, empty if None
+            count: number of items added to the saved bits
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.count = count
+        self._size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(-math.log2(error_rate)))
+        if bits == None:
+            bits = bytes((self._size + 7) // 8)
+        self._bits = bytearray(bits)
+
+    def __positions(self, item):
+        # double hashing: the positions are h1, h1 + h2, h1 + 2 h2, ... of one stable 128-bit digest
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self._size
+        return [(h1 + i * h2) % size for i in range(self._hashes)]
+
+    def __contains__(self, item):
+        bits = self._bits
+        for position in self.__positions(item):
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, item):
+        """Adds an item.
+
+        Pre:
+            item: string
+        Post:
+            bits of the item set, count increased if the item was not in the filter
+        Return:
+            True if the item was not in the filter, False otherwise
+        """
+
+        bits = self._bits
+        added = False
+        for position in self.__positions(item):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                added = True
+        if added:
+            self.count += 1
+        return added
+
+    def to_bytes(self):
+        return bytes(self._bits)
+
+class ContactIndex:
+    """
+    The ContactIndex module remembers every contact found over all runs and the websites it was found on, so
+    that a contact shared by many websites, such as the email of an agency, can be written once instead of
+    once per website, and so that the websites of a contact can be looked up. Sightings are kept in a local
+    SQLite file by normalized contact and registrable domain. An in-memory Bloom filter of the contacts sits
+    in front of it, so checking a contact that was never seen, which is most of them, costs no query.
+    """
+
+    # contacts the Bloom filter holds before it is rebuilt twice as large
+    capacity = 1000000
+    # probability that the Bloom filter sends a contact never seen to the database
+    error_rate = 0.01
+    # seconds between two reads of the sightings added by other processes
+    refresh_seconds = 1.0
+
+    def __init__(self, path='ContactIndex.sqlite3'):
+        """Opens the index, creating the file if needed, and loads its Bloom filter.
+
+        Pre:
+            path: path of the SQLite file of the index
+        Post:
+            the tables are created if they do not exist
+        Return:
+            None
+        """
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # every website is a transaction; in WAL mode this only risks the last ones on a power loss
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS sightings (
+                            contact TEXT, domain TEXT, url TEXT, seen_at REAL,
+                            PRIMARY KEY (contact, domain))''')
+        # Bloom filter saved on close, with the last sighting it holds
+        self._db.execute('''CREATE TABLE IF NOT EXISTS bloom (
+                            id INTEGER PRIMARY KEY CHECK (id = 0), capacity INTEGER, error_rate REAL,
+                            count INTEGER, last_rowid INTEGER, bits BLOB)''')
+        row = self._db.execute('SELECT capacity, error_rate, count, last_rowid, bits FROM bloom').fetchone()
+        if row != None and row[0] >= self.capacity and row[1] == self.error_rate:
+            self._bloom = BloomFilter(row[0], row[1], row[4], row[2])
+            self._last_rowid = row[3]
+            self.__refresh()
+        else:
+            self.__rebuild(self.capacity)
+
+    @staticmethod
+    def normalize_contact(contact):
+        """Normalizes a contact so that different spellings of it share one key.
+
+        Pre:
+            contact: email or SNS link, e.g. 'Info@Example.com' or 'https://www.instagram.com/name/'
+        Post:
+            None
+        Return:
+            the contact in lowercase, without scheme, 'www.' and trailing '/'
+        """
+
+        contact = contact.strip().lower()
+        if '://' in contact:
+            contact = contact[contact.find('://') + 3:]
+        if contact.startswith('www.'):
+            contact = contact[4:]
+        return contact.rstrip('/')
+
+    def __rebuild(self, capacity):
+        """Builds the Bloom filter again from every contact of the database.
+
+        Pre:
+            capacity: capacity of the new filter
+        Post:
+            Bloom filter replaced
+        Return:
+            None
+        """
+
+        count = self._db.execute('SELECT COUNT(DISTINCT contact) FROM sightings').fetchone()[0]
+        while count * 2 > capacity:
+            capacity *= 2
+        self._bloom = BloomFilter(capacity, self.error_rate)
+        self._last_rowid = 0
+        self.__refresh()
+
+    def __refresh(self):
+        """Adds the sightings stored since the last refresh, e.g. by other processes, to the Bloom filter.
+
+        Pre:
+            None
+        Post:
+            Bloom filter up to date with the database
+        Return:
+            None
+        """
+
+        self._refreshed_at = time.monotonic()
+        for rowid, contact in self._db.execute('SELECT rowid, contact FROM sightings WHERE rowid > ? ORDER BY rowid', (self._last_rowid,)):
+            self._bloom.add(contact)
+            self._last_rowid = rowid
+        if self._bloom.count > self._bloom.capacity:
+            self.__rebuild(self._bloom.capacity * 2)
+
+    def __refresh_if_due(self):
+        if time.monotonic() - self._refreshed_at >= self.refresh_seconds:
+            self.__refresh()
+
+    def __seen_elsewhere(self, contact, domain):
+        if contact not in self._bloom:
+            return False
+        return self._db.execute('SELECT 1 FROM sightings WHERE contact = ? AND domain != ? LIMIT 1', (contact, domain)).fetchone() != None
+
+    def seen(self, contact, url=None):
+        """Checks whether a contact was found before.
+
+        Pre:
+            contact: email or SNS link
+            url: URL of a website whose own sightings do not count, all sightings count if None
+        Post:
+            None
+        Return:
+            True if the contact was found on a website, other than the given one if any, False otherwise
+        """
+
+        domain = ''
+        if url != None:
+            domain = get_resolver().domain(url)
+        contact = self.normalize_contact(contact)
+        with self._lock:
+            self.__refresh_if_due()
+            return self.__seen_elsewhere(contact, domain)
+
+    def sites(self, contact):
+        """Looks up the websites a contact was found on.
+
+        Pre:
+            contact: email or SNS link
+        Post:
+            None
+        Return:
+            list of the URLs of the websites, in the order the contact was first found on them
+        """
+
+        contact = self.normalize_contact(contact)
+        with self._lock:
+            self.__refresh_if_due()
+            if contact not in self._bloom:
+                return []
+            return [row[0] for row in self._db.execute('SELECT url FROM sightings WHERE contact = ? ORDER BY seen_at, rowid', (contact,))]
+
+    def add(self, record):
+        """Adds the contacts of a website to the index.
+
+        Pre:
+            record: ContactRecord object of the website
+        Post:
+            a sighting of every contact on the registrable domain of the website stored, in one transaction
+        Return:
+            ContactRecord object of the website with only the contacts not found on another website before
+        """
+
+        domain = get_resolver().domain(record.url)
+        now = time.time()
+        new_contacts = []
+        sightings = []
+        with self._lock:
+            self.__refresh()
+            for field in record.fields:
+                contacts = []
+                for contact in record.contacts(field):
+                    key = self.normalize_contact(contact)
+                    if not self.__seen_elsewhere(key, domain):
+                        contacts.append(contact)
+                    sightings.append((key, domain, record.url, now))
+                new_contacts.append(contacts)
+            if len(sightings) > 0:
+                self._db.execute('BEGIN')
+                self._db.executemany('INSERT OR IGNORE INTO sightings VALUES (?, ?, ?, ?)', sightings)
+                self._db.execute('COMMIT')
+                self.__refresh()
+        return ContactRecord(record.url, *new_contacts).freeze()
+
+    def close(self):
+        """Saves the Bloom filter, so the next run does not read every contact again, and closes the index."""
+
+        with self._lock:
+            self.__refresh()
+            self._db.execute('INSERT OR REPLACE INTO bloom VALUES (0, ?, ?, ?, ?, ?)',
+                             (self._bloom.capacity, self._bloom.error_rate, self._bloom.count, self._last_rowid, self._bloom.to_bytes()))
+            self._db.close()
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    print('ContactIndex benchmark')
+    print('----------------------')
+    for websites in [10000, 100000]:
+        path = os.path.join(tempfile.mkdtemp(), 'ContactIndex.sqlite3')
+        index = ContactIndex(path)
+        # every website has its own contacts, and one in ten also lists the contacts of one of 100 agencies
+        start = time.perf_counter()
+        written = 0
+        for i in range(websites):
+            emails = ['info@site{}.com'.format(i), 'team@site{}.com'.format(i)]
+            instagrams = ['instagram.com/site{}'.format(i)]
+            if i % 10 == 0:
+                emails.append('hello@agency{}.com'.format(i % 1000 // 10))
+                instagrams.append('instagram.com/agency{}'.format(i % 1000 // 10))
+            written += len(index.add(ContactRecord('https://site{}.com/'.format(i), emails, (), instagrams)))
+        add_secs = time.perf_counter() - start
+        contacts = websites * 3 + websites // 10 * 2
+
+        lookups = 100000
+        start = time.perf_counter()
+        unseen = sum(1 for i in range(lookups) if index.seen('info@other{}.com'.format(i)))
+        unseen_secs = time.perf_counter() - start
+        start = time.perf_counter()
+        seen = sum(1 for i in range(lookups) if index.seen('info@site{}.com'.format(i % websites)))
+        seen_secs = time.perf_counter() - start
+        start = time.perf_counter()
+        agency_sites = len(index.sites('hello@agency7.com'))
+        reverse_secs = time.perf_counter() - start
+        index.close()
+
+        start = time.perf_counter()
+        index = ContactIndex(path)
+        open_secs = time.perf_counter() - start
+        index.close()
+
+        print('{:>6} websites: {:8.0f} contacts/s added, {} of {} contacts written once deduplicated'.format(
+              websites, contacts / add_secs, written, contacts))
+        print('{:>6} websites: seen before? {:5.1f} us if never seen ({} false positives), {:5.1f} us if seen ({} of {})'.format(
+              websites, unseen_secs / lookups * 1000000, unseen, seen_secs / lookups * 1000000, seen, lookups))
+        print('{:>6} websites: reverse lookup of an agency on {} websites in {:.2f} ms, reopened in {:.1f} ms'.format(
+              websites, agency_sites, reverse_secs * 1000, open_secs * 1000))
@@ -0,0 +1,326 @@
+import time
+
+class ContactRecord:
+    """
+    The ContactRecord module holds the contacts of one website or webpage with as little memory as possible.
+    Contacts are kept in plain sets while they are being found, and sorted once into tuples when the record
+    is frozen. The formatted row and text are built on first use and cached until the contacts change, so
+    reading the same record many times costs nothing after the first read.
+    """
+
+    # kinds of contacts, in the order of the columns after the url
+    fields = ('emails', 'facebooks', 'instagrams', 'twitters', 'linkedins')
+    __slots__ = ('_url', '_contacts', '_frozen', '_row', '_text')
+
+    def __init__(self, url='', emails=(), facebooks=(), instagrams=(), twitters=(), linkedins=()):
+        """Creates a record.
+
+        Pre:
+            url: URL of the website or webpage
+            emails, facebooks, instagrams, twitters, linkedins: iterables of the contacts of each kind
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self.url = url
+        # a set per kind while unfrozen, a sorted tuple per kind once frozen, empty kinds are () either way
+        self._contacts = [()] * 5
+        self._frozen = False
+        self._row = None
+        self._text = None
+        self.update(emails, facebooks, instagrams, twitters, linkedins)
+
+    def __thaw(self):
+        """Makes the contacts modifiable again, dropping the cached formatting.
+
+        Pre:
+            None
+        Post:
+            record unfrozen
+        Return:
+            None
+        """
+
+        if self._frozen:
+            self._contacts = [set(contacts) if len(contacts) > 0 else () for contacts in self._contacts]
+            self._frozen = False
+        self._row = None
+        self._text = None
+
+    def update(self, emails=(), facebooks=(), instagrams=(), twitters=(), linkedins=()):
+        """Adds contacts to the record.
+
+        Pre:
+            emails, facebooks, instagrams, twitters, linkedins: iterables of the contacts of each kind
+        Post:
+            contacts added, record unfrozen if any were given
+        Return:
+            None
+        """
+
+        new_contacts = (emails, facebooks, instagrams, twitters, linkedins)
+        for i in range(5):
+            if not new_contacts[i]:
+                continue
+            self.__thaw()
+            if len(self._contacts[i]) == 0:
+                self._contacts[i] = set(new_contacts[i])
+            else:
+                self._contacts[i].update(new_contacts[i])
+
+    def merge(self, other):
+        """Adds the contacts of another record.
+
+        Pre:
+            other: ContactRecord object
+        Post:
+            contacts of other added
+        Return:
+            None
+        """
+
+        self.update(*other._contacts)
+
+    def freeze(self):
+        """Sorts the contacts once. Reading a record freezes it, and adding contacts unfreezes it.
+
+        Pre:
+            None
+        Post:
+            contacts of each kind stored as a sorted tuple
+        Return:
+            the record
+        """
+
+        if not self._frozen:
+            self._contacts = [tuple(sorted(contacts)) if len(contacts) > 0 else () for contacts in self._contacts]
+            self._frozen = True
+        return self
+
+    def contacts(self, field):
+        """Returns the sorted contacts of a kind.
+
+        Pre:
+            field: one of fields
+        Post:
+            record frozen
+        Return:
+            tuple of the sorted contacts
+        """
+
+        self.freeze()
+        return self._contacts[self.fields.index(field)]
+
+    def __len__(self):
+        return sum(len(contacts) for contacts in self._contacts)
+
+    def to_row(self):
+        """Returns the row of the record, as written to Sheet1.
+
+        Pre:
+            None
+        Post:
+            record frozen and its row cached
+        Return:
+            row: list of the url and the contacts of each kind separated by ', '
+        """
+
+        if self._row == None:
+            self.freeze()
+            self._row = (self.url,) + tuple([', '.join(contacts) for contacts in self._contacts])
+        return list(self._row)
+
+    def to_dict(self):
+        """Returns the record as a dictionary.
+
+        Pre:
+            None
+        Post:
+            record frozen
+        Return:
+            dictionary of the url and the sorted tuple of the contacts of each kind
+        """
+
+        self.freeze()
+        return {'url': self.url, 'emails': self._contacts[0], 'facebooks': self._contacts[1], 'instagrams': self._contacts[2],
+                'twitters': self._contacts[3], 'linkedins': self._contacts[4]}
+
+    def __format(self, i):
+        if self._row == None:
+            self.to_row()
+        return self._row[i]
+
+    def __set(self, i, contacts):
+        self.__thaw()
+        contacts = set(contacts)
+        self._contacts[i] = contacts if len(contacts) > 0 else ()
+
+    @property
+    def url(self):
+        return self._url
+
+    @url.setter
+    def url(self, url):
+        # the url is the first cell of the cached row and the first line of the cached text
+        self._url = url
+        self._row = None
+        self._text = None
+
+    @property
+    def emails(self):
+        return self.__format(1)
+
+    @emails.setter
+    def emails(self, emails):
+        self.__set(0, emails)
+
+    @property
+    def facebooks(self):
+        return self.__format(2)
+
+    @facebooks.setter
+    def facebooks(self, facebooks):
+        self.__set(1, facebooks)
+
+    @property
+    def instagrams(self):
+        return self.__format(3)
+
+    @instagrams.setter
+    def instagrams(self, instagrams):
+        self.__set(2, instagrams)
+
+    @property
+    def twitters(self):
+        return self.__format(4)
+
+    @twitters.setter
+    def twitters(self, twitters):
+        self.__set(3, twitters)
+
+    @property
+    def linkedins(self):
+        return self.__format(5)
+
+    @linkedins.setter
+    def linkedins(self, linkedins):
+        self.__set(4, linkedins)
+
+    def __getstate__(self):
+        return (self.url, self._contacts, self._frozen)
+
+    def __setstate__(self, state):
+        self.url, self._contacts, self._frozen = state
+        self._row = None
+        self._text = None
+
+    def __repr__(self):
+        self.freeze()
+        return 'ContactRecord({!r}, {}, {}, {}, {}, {})'.format(self.url, *self._contacts)
+
+    def __str__(self):
+        """All contacts in the record formatted to a string, one contact per line.
+
+        Pre:
+            None
+        Post:
+            record frozen and its text cached
+        Return:
+            text of the record
+        """
+
+        if self._text == None:
+            self.freeze()
+            parts = ['URL: ' + self.url + '\n']
+            titles = ('Email(s)', 'Facebook(s)', 'Instagram(s)', 'Twitter(s)', 'LinkedIn(s)')
+            for i in range(5):
+                if len(self._contacts[i]) == 0:
+                    lines = 'None\n'
+                else:
+                    lines = ''.join([contact + '\n' for contact in self._contacts[i]])
+                parts.append(titles[i] + ':\n' + lines)
+                if i < 4:
+                    parts.append('\n')
+            self._text = ''.join(parts)
+        return self._text
+
+class LegacyContacts:
+    """The contacts of a website as WebsiteContacts held them before ContactRecord, for the benchmark."""
+
+    def __init__(self, url, emails, facebooks, instagrams, twitters, linkedins):
+        from sortedcontainers import SortedSet
+        self._url = url
+        self._emails = SortedSet(emails)
+        self._facebooks = SortedSet(facebooks)
+        self._instagrams = SortedSet(instagrams)
+        self._twitters = SortedSet(twitters)
+        self._linkedins = SortedSet(linkedins)
+
+    def sorted_set_to_string(self, convert_set):
+        returnStr = ''
+        for i in range(len(convert_set)):
+            returnStr += convert_set[i] + ', '
+        returnStr = returnStr[:len(returnStr)-2]
+        return returnStr
+
+    def to_row(self):
+        return [self._url, self.sorted_set_to_string(self._emails), self.sorted_set_to_string(self._facebooks),
+                self.sorted_set_to_string(self._instagrams), self.sorted_set_to_string(self._twitters),
+                self.sorted_set_to_string(self._linkedins)]
+
+def generate_contacts(websites):
+    """Generates the contacts of websites, most with a few contacts and some with many, for the benchmark.
+
+    Pre:
+        websites: number of websites
+    Post:
+        None
+    Return:
+        list of (url, emails, facebooks, instagrams, twitters, linkedins) of the websites
+    """
+
+    contacts = []
+    for i in range(websites):
+        emails = ['person{}@site{}.com'.format(j, i) for j in range(1 + (i % 4) + (40 if i % 50 == 0 else 0))]
+        facebooks = ['facebook.com/site{}'.format(i)] if i % 2 == 0 else []
+        instagrams = ['instagram.com/site{}'.format(i)] if i % 3 == 0 else []
+        twitters = ['twitter.com/site{}'.format(i)] if i % 2 == 1 else []
+        linkedins = []
+        contacts.append(('https://site{}.com/'.format(i), emails, facebooks, instagrams, twitters, linkedins))
+    return contacts
+
+if __name__ == '__main__':
+    import tracemalloc
+
+    print('Contact record benchmark')
+    print('------------------------')
+    for websites in [1000, 20000]:
+        contacts = generate_contacts(websites)
+        results = []
+        for name, build in [('SortedSets', lambda c: LegacyContacts(*c)), ('ContactRecord', lambda c: ContactRecord(*c).freeze())]:
+            start = time.perf_counter()
+            records = [build(c) for c in contacts]
+            build_secs = time.perf_counter() - start
+
+            # rows are read several times, e.g. by the sheet, the journal and the output
+            start = time.perf_counter()
+            for i in range(3):
+                rows = [record.to_row() for record in records]
+            row_secs = time.perf_counter() - start
+            del records
+
+            # memory is measured separately as tracing slows the build down
+            tracemalloc.start()
+            records = [build(c) for c in contacts]
+            memory = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del records
+            results.append((name, memory, build_secs, row_secs, rows))
+
+        for name, memory, build_secs, row_secs, rows in results:
+            print('{:>6} websites, {:>13}: {:7.1f} MB, built in {:6.1f} ms, 3 reads of every row in {:6.1f} ms'.format(
+                  websites, name, memory / 1024 / 1024, build_secs * 1000, row_secs * 1000))
+        print('{:>6} websites: {:.1f}x less memory, {:.1f}x faster reads, same rows: {}'.format(
+              websites, results[0][1] / results[1][1], results[0][3] / results[1][3], results[0][4] == results[1][4]))
@@ -0,0 +1,80 @@
+from abc import ABC, abstractmethod
+
+class ContactStore(ABC):
+    """
+    The ContactStore module is the interface between the scrape operations of the WebContactSheetManager
+    module and where their inputs are read from and their contacts are written to. The SheetsStore keeps
+    them in a Google Sheets file, or in a FakeSheets stand-in of one, and the SQLiteStore keeps them in a
+    local SQLite file. Rows of contacts are buffered with upsert() and written with flush(), so a store can
+    batch its writes.
+    """
+
+    # operations of the WebContactSheetManager, each reading its own list of inputs
+    operations = ('web_of_web_search_scrape', 'web_search_scrape', 'web_scrape')
+    # columns of a row of contacts
+    header = ['url', 'emails', 'facebooks', 'instagrams', 'twitters', 'linkedins']
+
+    @abstractmethod
+    def inputs(self, operation):
+        """Returns the inputs of an operation.
+
+        Pre:
+            operation: one of operations
+        Post:
+            None
+        Return:
+            list of the keyphrases of the search operations, or of the websites of 'web_scrape'
+        """
+
+    @abstractmethod
+    def set_statuses(self, operation, status):
+        """Sets the status of every input of an operation.
+
+        Pre:
+            operation: one of operations
+            status: status of the inputs, e.g. 'to scrape' or 'scraped'
+        Post:
+            statuses written
+        Return:
+            None
+        """
+
+    @abstractmethod
+    def __contains__(self, url):
+        """Checks whether the contacts of a website are stored, including buffered rows."""
+
+    @abstractmethod
+    def __len__(self):
+        """Returns the number of websites stored, including buffered rows."""
+
+    @property
+    @abstractmethod
+    def num_pending(self):
+        """Returns the number of buffered rows not written yet."""
+
+    @abstractmethod
+    def upsert(self, row):
+        """Buffers a row of contacts, replacing the stored row of the same website on the next flush.
+
+        Pre:
+            row: url, emails, Facebooks, Instagrams, Twitters and LinkedIns of a website
+        Post:
+            row buffered
+        Return:
+            None
+        """
+
+    @abstractmethod
+    def flush(self):
+        """Writes the buffered rows.
+
+        Pre:
+            None
+        Post:
+            buffered rows written
+        Return:
+            None
+        """
+
+    def close(self):
+        pass
@@ -0,0 +1,155 @@
+import re
+import heapq
+from urllib.parse import urlparse
+
+class CrawlFrontier:
+    """
+    The CrawlFrontier module orders the pages of a website so that the pages most likely to list contacts
+    are fetched first. Each discovered link is scored by its URL path and anchor text, and only links with a
+    positive score are fetched. Links are followed up to a maximum depth from the homepage, so contact pages
+    linked from an about page are found as well.
+    """
+
+    # pages whose URL or anchor text match are searched for contacts
+    contact_pattern = re.compile('(contact|about|our team|our-team|board of|board-of|get in touch|get-in-touch|reach us|reach-us|impressum|who we are|who-we-are|staff|leadership)')
+    # (pattern, score) of words in the path or anchor text of a link that hint at a contact page
+    keywords = ((re.compile('contact|get in touch|get-in-touch|impressum'), 10),
+                (re.compile('about'), 8),
+                (re.compile('our team|our-team|team|who we are|who-we-are'), 6),
+                (re.compile('board of|board-of|staff|leadership'), 5),
+                (re.compile('people|meet|connect|reach us|reach-us'), 3),
+                (re.compile('company|info'), 2))
+    # (pattern, score) of parts of a path that hint at a page without contacts
+    penalties = ((re.compile(r'\.(jpe?g|png|gif|svg|webp|pdf|zip|mp3|mp4|css|js|xml|rss)$'), -100),
+                 (re.compile('/(tag|tags|category|categories|page|author|feed|wp-content|wp-json|cart|login|search)/'), -6),
+                 (re.compile(r'\?(replytocom|share|s)='), -6))
+
+    def __init__(self, max_pages=200, max_depth=2):
+        """Sets up an empty frontier.
+
+        Pre:
+            max_pages: number of pages after which the frontier stops handing out pages
+            max_depth: number of links between the homepage and the deepest page fetched
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._max_pages = max_pages
+        self._max_depth = max_depth
+        # (-score, order, url, anchor text, depth) of the pages to fetch
+        self._heap = []
+        self._seen = set()
+        self._popped = 0
+
+    def __len__(self):
+        if self._popped >= self._max_pages:
+            return 0
+        return len(self._heap)
+
+    @property
+    def max_depth(self):
+        return self._max_depth
+
+    def score(self, url, text=''):
+        """Scores how likely a link is to lead to a contact page.
+
+        Pre:
+            url: absolute URL of the link
+            text: anchor text of the link
+        Post:
+            None
+        Return:
+            score: sum of the keyword scores of the path and anchor text, minus the penalties and one point
+                   per path segment beyond the second
+        """
+
+        parsed = urlparse(url)
+        path = parsed.path.lower()
+        if parsed.query != '':
+            path += '?' + parsed.query.lower()
+        text = text.lower()
+
+        score = 0
+        for pattern, keyword_score in self.keywords:
+            if pattern.search(path) != None:
+                score += keyword_score
+            if pattern.search(text) != None:
+                score += keyword_score
+        for pattern, penalty in self.penalties:
+            if pattern.search(path) != None:
+                score += penalty
+        segments = len([segment for segment in path.split('/') if segment != ''])
+        if segments > 2:
+            score -= segments - 2
+        return score
+
+    def is_contact_page(self, url, text=''):
+        """Checks whether a page should be searched for contacts.
+
+        Pre:
+            url: URL of the page
+            text: anchor text of the link to the page
+        Post:
+            None
+        Return:
+            True if the URL or the anchor text matches contact_pattern, False otherwise
+        """
+
+        return self.contact_pattern.search(url) != None or self.contact_pattern.search(text.lower()) != None
+
+    def push(self, url, text='', depth=0):
+        """Adds a page to the frontier if it has not been seen, is not too deep and has a positive score. The
+        homepage, at depth 0, is always added.
+
+        Pre:
+            url: absolute URL of the page
+            text: anchor text of the link to the page
+            depth: number of links between the homepage and the page
+        Post:
+            page added to the frontier and marked as seen
+        Return:
+            True if the page was added, False otherwise
+        """
+
+        if url in self._seen or depth > self._max_depth:
+            return False
+        score = self.score(url, text)
+        if depth > 0 and score <= 0:
+            return False
+        self._seen.add(url)
+        heapq.heappush(self._heap, (-score, len(self._seen), url, text, depth))
+        return True
+
+    def skip(self, url):
+        """Marks a page as fetched without handing it out, e.g. a page fetched before the crawl was interrupted.
+
+        Pre:
+            url: absolute URL of the page
+        Post:
+            page marked as seen and counted as fetched
+        Return:
+            None
+        """
+
+        if url not in self._seen:
+            self._seen.add(url)
+            self._popped += 1
+
+    def pop(self):
+        """Removes the page with the highest score from the frontier, the earliest discovered on ties.
+
+        Pre:
+            the frontier is not empty
+        Post:
+            page removed from the frontier
+        Return:
+            url: URL of the page
+            text: anchor text of the link to the page
+            depth: number of links between the homepage and the page
+        """
+
+        score, order, url, text, depth = heapq.heappop(self._heap)
+        self._popped += 1
+        return url, text, depth
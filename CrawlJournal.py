@@ -0,0 +1,233 @@
+import sqlite3
+import json
+import time
+import threading
+
+class CrawlJournal:
+    """
+    The CrawlJournal module records the progress of a scrape operation in a local SQLite file as it happens:
+    the websites found for each keyphrase, each website to scrape, each page fetched and the row of contacts
+    of each scraped website. If the program stops before the operation finishes, running the operation again
+    resumes from the journal, so searches, websites and pages that were already done are not repeated.
+    """
+
+    def __init__(self, path='CrawlJournal.sqlite3'):
+        """Opens the journal, creating the file if needed.
+
+        Pre:
+            path: path of the SQLite file of the journal
+        Post:
+            the journal tables are created if they do not exist
+        Return:
+            None
+        """
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS searches (
+                            operation TEXT, keyphrase TEXT, websites TEXT, searched_at REAL,
+                            PRIMARY KEY (operation, keyphrase))''')
+        # status of a website is 'pending', 'scraped' once its row is known, or 'written' once on the sheet
+        self._db.execute('''CREATE TABLE IF NOT EXISTS websites (
+                            operation TEXT, url TEXT, status TEXT, row TEXT, updated_at REAL,
+                            PRIMARY KEY (operation, url))''')
+        # contacts and links of each page fetched of a website not scraped yet, so that an interrupted crawl
+        # goes on from its outstanding pages
+        self._db.execute('''CREATE TABLE IF NOT EXISTS pages (
+                            website TEXT, url TEXT, depth INTEGER, contact_page INTEGER, contacts TEXT, links TEXT,
+                            fetched_at REAL, PRIMARY KEY (website, url))''')
+
+    def __execute(self, sql, parameters=()):
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def is_resuming(self, operation):
+        """Checks whether an earlier run of an operation stopped before finishing.
+
+        Pre:
+            operation: name of the scrape operation
+        Post:
+            None
+        Return:
+            True if the journal has progress of the operation, False otherwise
+        """
+
+        searches = self.__execute('SELECT COUNT(*) FROM searches WHERE operation = ?', (operation,))[0][0]
+        websites = self.__execute('SELECT COUNT(*) FROM websites WHERE operation = ?', (operation,))[0][0]
+        return searches + websites > 0
+
+    def search_result(self, operation, keyphrase):
+        """Returns the websites recorded for a keyphrase.
+
+        Pre:
+            operation: name of the scrape operation
+            keyphrase: keyphrase of the search
+        Post:
+            None
+        Return:
+            list of the websites found for the keyphrase, or None if the search was not recorded
+        """
+
+        rows = self.__execute('SELECT websites FROM searches WHERE operation = ? AND keyphrase = ?', (operation, keyphrase))
+        if len(rows) == 0:
+            return None
+        return json.loads(rows[0][0])
+
+    def record_search(self, operation, keyphrase, websites):
+        """Records the websites found for a keyphrase.
+
+        Pre:
+            operation: name of the scrape operation
+            keyphrase: keyphrase of the search
+            websites: websites found for the keyphrase
+        Post:
+            search recorded
+        Return:
+            None
+        """
+
+        self.__execute('INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?)',
+                       (operation, keyphrase, json.dumps(list(websites)), time.time()))
+
+    def add_websites(self, operation, urls):
+        """Records the websites an operation has to scrape. Websites that are already recorded keep their status.
+
+        Pre:
+            operation: name of the scrape operation
+            urls: URLs of the websites
+        Post:
+            new websites recorded as pending
+        Return:
+            None
+        """
+
+        now = time.time()
+        with self._lock:
+            self._db.execute('BEGIN')
+            for url in urls:
+                self._db.execute('INSERT OR IGNORE INTO websites VALUES (?, ?, ?, ?, ?)', (operation, url, 'pending', None, now))
+            self._db.execute('COMMIT')
+
+    def websites(self, operation, status):
+        """Returns the websites of an operation with a status.
+
+        Pre:
+            operation: name of the scrape operation
+            status: 'pending', 'scraped' or 'written'
+        Post:
+            None
+        Return:
+            list of (url, row) of the websites, row is None for pending websites
+        """
+
+        rows = self.__execute('SELECT url, row FROM websites WHERE operation = ? AND status = ? ORDER BY url', (operation, status))
+        return [(url, json.loads(row) if row != None else None) for url, row in rows]
+
+    def status(self, operation, url):
+        """Returns the status of a website of an operation.
+
+        Pre:
+            operation: name of the scrape operation
+            url: URL of the website
+        Post:
+            None
+        Return:
+            'pending', 'scraped' or 'written', or None if the website is not recorded
+        """
+
+        rows = self.__execute('SELECT status FROM websites WHERE operation = ? AND url = ?', (operation, url))
+        if len(rows) == 0:
+            return None
+        return rows[0][0]
+
+    def record_page(self, website, url, depth, contact_page, page, links):
+        """Records a page of a website that was fetched.
+
+        Pre:
+            website: root URL of the website
+            url: URL of the page
+            depth: number of links between the homepage and the page
+            contact_page: whether the page was fetched as a contact page
+            page: ContactRecord object with the contacts of the page
+            links: dictionary of the URLs of the links of the page to their anchor text
+        Post:
+            page recorded
+        Return:
+            None
+        """
+
+        contacts = page.to_dict()
+        del contacts['url']
+        self.__execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                       (website, url, depth, int(contact_page), json.dumps(contacts), json.dumps(links), time.time()))
+
+    def pages(self, website):
+        """Returns the pages of a website recorded before its crawl was interrupted.
+
+        Pre:
+            website: root URL of the website
+        Post:
+            None
+        Return:
+            list of (url, depth, contact_page, contacts, links) of the pages in the order they were fetched,
+            contacts being a dictionary of the contacts of each kind, see ContactRecord.to_dict()
+        """
+
+        rows = self.__execute('SELECT url, depth, contact_page, contacts, links FROM pages WHERE website = ? ORDER BY fetched_at', (website,))
+        return [(url, depth, contact_page == 1, json.loads(contacts), json.loads(links)) for url, depth, contact_page, contacts, links in rows]
+
+    def record_result(self, operation, url, row):
+        """Records the row of contacts of a scraped website.
+
+        Pre:
+            operation: name of the scrape operation
+            url: URL of the website
+            row: row of contacts of the website
+        Post:
+            website recorded as scraped, and its pages forgotten
+        Return:
+            None
+        """
+
+        with self._lock:
+            self._db.execute('BEGIN')
+            self._db.execute('INSERT OR REPLACE INTO websites VALUES (?, ?, ?, ?, ?)',
+                             (operation, url, 'scraped', json.dumps(row), time.time()))
+            self._db.execute('DELETE FROM pages WHERE website = ?', (url,))
+            self._db.execute('COMMIT')
+
+    def mark_written(self, operation):
+        """Records that the rows of all scraped websites of an operation are on the sheet.
+
+        Pre:
+            operation: name of the scrape operation
+        Post:
+            scraped websites recorded as written
+        Return:
+            None
+        """
+
+        self.__execute("UPDATE websites SET status = 'written', updated_at = ? WHERE operation = ? AND status = 'scraped'",
+                       (time.time(), operation))
+
+    def finish(self, operation):
+        """Forgets the progress of an operation that finished.
+
+        Pre:
+            operation: name of the scrape operation
+        Post:
+            searches, websites and pages of the operation deleted
+        Return:
+            None
+        """
+
+        with self._lock:
+            self._db.execute('BEGIN')
+            self._db.execute('DELETE FROM pages WHERE website IN (SELECT url FROM websites WHERE operation = ?)', (operation,))
+            self._db.execute('DELETE FROM searches WHERE operation = ?', (operation,))
+            self._db.execute('DELETE FROM websites WHERE operation = ?', (operation,))
+            self._db.execute('COMMIT')
+
+    def close(self):
+        self._db.close()
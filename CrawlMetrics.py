@@ -0,0 +1,356 @@
+import sys
+import json
+import time
+import atexit
+import threading
+import contextlib
+from datetime import datetime, timezone
+
+class CrawlMetrics:
+    """
+    The CrawlMetrics module records where the time of a run goes, across the HttpClient, the scrapers and the
+    contact stores. Every stage (search_wait, search, expansion, discover, schedule, fetch, parse, extract, site
+    and sheets_write) has a histogram of its durations, and counters keep the bytes downloaded, the status codes,
+    the errors of each stage and the Sheets API calls. The metrics of a run can be written as a Prometheus text file, and
+    when tracing is on, as a JSON trace of the spans of each website. A run can also be profiled with
+    cProfile and tracemalloc.
+    """
+
+    # upper bounds in seconds of the buckets of the stage histograms
+    buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+    # help text of each metric, in the order they are exported
+    descriptions = (('stage_seconds', 'histogram', 'Seconds spent in each stage of the crawl.'),
+                    ('websites_total', 'counter', 'Websites crawled.'),
+                    ('bytes_downloaded_total', 'counter', 'Bytes of pages downloaded.'),
+                    ('http_responses_total', 'counter', 'HTTP responses by status code.'),
+                    ('cache_hits_total', 'counter', 'Pages served from the response cache, by whether they were revalidated.'),
+                    ('search_cache_hits_total', 'counter', 'Searches answered from the search cache.'),
+                    ('errors_total', 'counter', 'Errors by stage.'),
+                    ('sheets_api_calls_total', 'counter', 'Google Sheets API calls by method.'))
+    # prefix of the exported metric names
+    namespace = 'webcontact_'
+    # lines of the tracemalloc report
+    memory_lines = 25
+
+    def __init__(self, metrics_path=None, trace_path=None, profile_path=None, memory_path=None):
+        """Sets up empty metrics.
+
+        Pre:
+            metrics_path: Prometheus text file the metrics are written to by finish(), not written if None
+            trace_path: JSON file the spans are written to by finish(), spans not kept if None
+            profile_path: file the cProfile statistics are written to by finish(), not profiled if None
+            memory_path: file the top allocations traced by tracemalloc are written to by finish(), not traced if None
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._metrics_path = metrics_path
+        self._trace_path = trace_path
+        self._profile_path = profile_path
+        self._memory_path = memory_path
+        self._lock = threading.Lock()
+        # (name, sorted label items) -> value
+        self._counters = {}
+        # stage -> [count of each bucket, count above the last bucket, sum, count]
+        self._histograms = {}
+        # site -> list of spans, spans of no website under None
+        self._spans = {}
+        self._started_at = datetime.now(timezone.utc)
+        self._start = time.perf_counter()
+        self._profilers = []
+        self._finished = False
+
+    @property
+    def tracing(self):
+        return self._trace_path != None
+
+    def start(self):
+        """Starts profiling the run, in every thread started from now on as well.
+
+        Pre:
+            None
+        Post:
+            cProfile and tracemalloc started if their paths are set
+        Return:
+            the metrics
+        """
+
+        if self._memory_path != None:
+            import tracemalloc
+            tracemalloc.start()
+        if self._profile_path != None:
+            import cProfile
+            self._profilers.append(cProfile.Profile())
+            self._profilers[0].enable()
+            # before Python 3.12, a profiler only sees the thread that enabled it, so every new thread enables
+            # its own the first time it calls a function
+            if sys.version_info < (3, 12):
+                def profile_thread(frame, event, arg):
+                    sys.setprofile(None)
+                    profiler = cProfile.Profile()
+                    with self._lock:
+                        if self._finished:
+                            return
+                        self._profilers.append(profiler)
+                    profiler.enable()
+                threading.setprofile(profile_thread)
+        return self
+
+    def count(self, name, amount=1, **labels):
+        """Adds to a counter.
+
+        Pre:
+            name: name of the counter, one of descriptions without the '_total'
+            amount: amount added
+            labels: labels of the counter, e.g. status='200'
+        Post:
+            counter increased
+        Return:
+            None
+        """
+
+        key = (name + '_total', tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, stage, seconds):
+        """Adds a duration to the histogram of a stage.
+
+        Pre:
+            stage: name of the stage
+            seconds: duration of the stage
+        Post:
+            histogram of the stage updated
+        Return:
+            None
+        """
+
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram == None:
+                histogram = self._histograms[stage] = [0] * (len(self.buckets) + 3)
+            for i in range(len(self.buckets)):
+                if seconds <= self.buckets[i]:
+                    histogram[i] += 1
+                    break
+            else:
+                histogram[len(self.buckets)] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def add_span(self, name, start, seconds, site=None, **attributes):
+        """Keeps a span in the trace of a website, if tracing is on.
+
+        Pre:
+            name: name of the span, usually its stage
+            start: time.perf_counter() at the start of the span
+            seconds: duration of the span
+            site: URL of the website the span belongs to, or None
+            attributes: details of the span, e.g. the URL of a page
+        Post:
+            span kept
+        Return:
+            None
+        """
+
+        if self._trace_path == None:
+            return
+        span = {'name': name, 'start': round(start - self._start, 6), 'seconds': round(seconds, 6), 'thread': threading.current_thread().name}
+        span.update(attributes)
+        with self._lock:
+            self._spans.setdefault(site, []).append(span)
+
+    @contextlib.contextmanager
+    def span(self, stage, site=None, **attributes):
+        """Times a block as a stage, counting an error of the stage if it raises.
+
+        Pre:
+            stage: name of the stage
+            site: URL of the website the block works on, or None
+            attributes: details of the span
+        Post:
+            duration added to the histogram of the stage and kept as a span
+        Return:
+            None
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.count('errors', stage=stage)
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            self.observe(stage, seconds)
+            self.add_span(stage, start, seconds, site, **attributes)
+
+    def stage_summary(self, stage):
+        """Returns the count, total and mean seconds of a stage."""
+
+        with self._lock:
+            histogram = self._histograms.get(stage, [0] * (len(self.buckets) + 3))
+            count, total = histogram[-1], histogram[-2]
+        return {'count': count, 'seconds': total, 'mean_seconds': total / count if count > 0 else 0.0}
+
+    def __labels(self, items):
+        if len(items) == 0:
+            return ''
+        return '{' + ','.join('{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"')) for name, value in items) + '}'
+
+    def to_prometheus(self):
+        """Formats the metrics in the Prometheus text exposition format.
+
+        Pre:
+            None
+        Post:
+            None
+        Return:
+            text of the metrics
+        """
+
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {stage: list(histogram) for stage, histogram in self._histograms.items()}
+
+        lines = []
+        for name, kind, description in self.descriptions:
+            full_name = self.namespace + name
+            lines.append('# HELP {} {}'.format(full_name, description))
+            lines.append('# TYPE {} {}'.format(full_name, kind))
+            if kind == 'histogram':
+                for stage in sorted(histograms):
+                    histogram = histograms[stage]
+                    cumulative = 0
+                    for i in range(len(self.buckets)):
+                        cumulative += histogram[i]
+                        lines.append('{}_bucket{} {}'.format(full_name, self.__labels([('stage', stage), ('le', self.buckets[i])]), cumulative))
+                    lines.append('{}_bucket{} {}'.format(full_name, self.__labels([('stage', stage), ('le', '+Inf')]), histogram[-1]))
+                    lines.append('{}_sum{} {}'.format(full_name, self.__labels([('stage', stage)]), repr(float(histogram[-2]))))
+                    lines.append('{}_count{} {}'.format(full_name, self.__labels([('stage', stage)]), histogram[-1]))
+                continue
+            for (counter, labels), value in sorted(counters.items()):
+                if counter == name:
+                    lines.append('{}{} {}'.format(full_name, self.__labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+    def to_trace(self):
+        """Returns the spans of the run, grouped by website.
+
+        Pre:
+            None
+        Post:
+            None
+        Return:
+            dictionary of the start and duration of the run, the spans of each website, and the spans of no
+            website; span starts are seconds since the start of the run
+        """
+
+        with self._lock:
+            spans = {site: list(site_spans) for site, site_spans in self._spans.items()}
+        return {'started_at': self._started_at.isoformat(), 'seconds': round(time.perf_counter() - self._start, 6),
+                'sites': {site: site_spans for site, site_spans in spans.items() if site != None},
+                'spans': spans.get(None, [])}
+
+    def finish(self):
+        """Stops profiling and writes the files of the run. Does nothing if the run is already finished.
+
+        Pre:
+            None
+        Post:
+            the metrics, trace, profile and memory report written to their paths
+        Return:
+            None
+        """
+
+        with self._lock:
+            if self._finished:
+                return
+            self._finished = True
+
+        if len(self._profilers) > 0:
+            import pstats
+            threading.setprofile(None)
+            self._profilers[0].disable()
+            stats = pstats.Stats(self._profilers[0])
+            for profiler in self._profilers[1:]:
+                # profilers of threads still running are disabled by their own thread only
+                try:
+                    profiler.create_stats()
+                    stats.add(profiler)
+                except Exception:
+                    pass
+            stats.dump_stats(self._profile_path)
+
+        if self._memory_path != None:
+            import tracemalloc
+            if tracemalloc.is_tracing():
+                current, peak = tracemalloc.get_traced_memory()
+                statistics = tracemalloc.take_snapshot().statistics('lineno')
+                tracemalloc.stop()
+                with open(self._memory_path, 'w') as memory_file:
+                    memory_file.write('Traced memory: {:.1f} MB now, {:.1f} MB at peak\n'.format(current / 1024 / 1024, peak / 1024 / 1024))
+                    memory_file.write('Top {} allocations by line:\n'.format(self.memory_lines))
+                    for statistic in statistics[:self.memory_lines]:
+                        memory_file.write(str(statistic) + '\n')
+
+        if self._metrics_path != None:
+            with open(self._metrics_path, 'w') as metrics_file:
+                metrics_file.write(self.to_prometheus())
+        if self._trace_path != None:
+            with open(self._trace_path, 'w') as trace_file:
+                json.dump(self.to_trace(), trace_file, indent=1)
+
+# metrics shared by all modules
+_metrics = None
+
+def get_metrics():
+    """Returns the metrics of the current run, creating metrics that are not written anywhere on first use.
+
+    Pre:
+        None
+    Post:
+        the shared metrics are created if they do not exist
+    Return:
+        the shared CrawlMetrics
+    """
+
+    global _metrics
+    if _metrics == None:
+        _metrics = CrawlMetrics()
+    return _metrics
+
+def start_run(metrics_path=None, trace_path=None, profile_path=None, memory_path=None):
+    """Replaces the shared metrics with empty metrics for a new run and starts profiling it. The files of the
+    run are written by finish(), or at exit if the run is interrupted.
+
+    Pre:
+        see CrawlMetrics()
+    Post:
+        the previous run is finished and the shared metrics replaced
+    Return:
+        the new shared CrawlMetrics
+    """
+
+    global _metrics
+    if _metrics != None:
+        _metrics.finish()
+    _metrics = CrawlMetrics(metrics_path, trace_path, profile_path, memory_path).start()
+    atexit.register(_metrics.finish)
+    return _metrics
+
+if __name__ == '__main__':
+    print('Metrics overhead benchmark')
+    print('--------------------------')
+    for tracing in [False, True]:
+        metrics = CrawlMetrics(trace_path='trace.json' if tracing else None)
+        operations = 200000
+        start = time.perf_counter()
+        for i in range(operations):
+            with metrics.span('fetch', 'https://site{}.com/'.format(i % 100), url='https://site.com/about/'):
+                pass
+            metrics.count('bytes_downloaded', 1024)
+        secs = time.perf_counter() - start
+        print('tracing {:>5}: {:6.2f} us per span and counter'.format(str(tracing), secs / operations * 1000000))
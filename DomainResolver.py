@@ -0,0 +1,310 @@
+import functools
+
+# rules of the Public Suffix List bundled with the program, in its format: '*.' rules match any label and '!'
+# rules are exceptions to them; a host under none of the rules has its last label as public suffix
+bundled_rules = '''
+// generic top level domains
+com net org edu gov mil int info biz name pro mobi app dev io co ai me tv cc ws fm am ly gg to xyz
+online site store shop blog tech club live news life world space website page
+// country top level domains
+ac ae ar at au be bg br by ca ch cl cn cz de dk ee eg es eu fi fr gr hk hr hu id ie il in ir is it jp ke kr
+lt lu lv ma mx my ng nl no nz pe ph pk pl pt ro rs ru sa se sg si sk th tr tw ua uk us vn za
+// second level domains of country top level domains
+co.uk org.uk me.uk ltd.uk plc.uk net.uk sch.uk ac.uk gov.uk nhs.uk police.uk
+com.au net.au org.au edu.au gov.au asn.au id.au
+co.nz net.nz org.nz ac.nz govt.nz school.nz geek.nz kiwi.nz
+co.jp ne.jp or.jp ac.jp go.jp ad.jp ed.jp gr.jp lg.jp
+com.br net.br org.br gov.br edu.br art.br blog.br
+com.cn net.cn org.cn gov.cn edu.cn ac.cn
+co.in net.in org.in firm.in gen.in ind.in ac.in edu.in gov.in res.in
+co.za org.za net.za gov.za ac.za web.za
+com.mx net.mx org.mx gob.mx edu.mx
+com.ar net.ar org.ar gob.ar edu.ar
+com.sg net.sg org.sg edu.sg gov.sg
+com.hk net.hk org.hk edu.hk gov.hk
+com.tw net.tw org.tw edu.tw gov.tw
+co.kr or.kr ne.kr ac.kr go.kr
+com.my net.my org.my edu.my gov.my
+co.id or.id ac.id go.id web.id
+co.th or.th ac.th go.th in.th
+com.vn net.vn org.vn edu.vn gov.vn
+com.ph net.ph org.ph edu.ph gov.ph
+com.tr net.tr org.tr edu.tr gov.tr
+co.il org.il net.il ac.il gov.il
+co.ae net.ae org.ae ac.ae gov.ae
+com.sa net.sa org.sa edu.sa gov.sa
+com.eg net.eg org.eg edu.eg gov.eg
+com.ng net.ng org.ng edu.ng gov.ng
+co.ke or.ke ac.ke go.ke
+com.pk net.pk org.pk edu.pk gov.pk
+com.pe net.pe org.pe edu.pe gob.pe
+com.es nom.es org.es edu.es gob.es
+com.pl net.pl org.pl edu.pl gov.pl
+com.ua net.ua org.ua edu.ua gov.ua
+co.at or.at ac.at gv.at
+com.gr net.gr org.gr edu.gr gov.gr
+com.pt org.pt edu.pt gov.pt
+com.ru net.ru org.ru
+com.co net.co org.co edu.co gov.co
+co.us
+// wildcard rules and their exceptions
+*.ck !www.ck
+*.bd
+*.np
+*.kawasaki.jp !city.kawasaki.jp
+*.compute.amazonaws.com
+// hosting domains whose subdomains are separate websites
+blogspot.com wordpress.com tumblr.com weebly.com wixsite.com substack.com github.io gitlab.io
+herokuapp.com appspot.com netlify.app vercel.app pages.dev web.app firebaseapp.com azurewebsites.net
+cloudfront.net
+'''
+
+class DomainResolver:
+    """
+    The DomainResolver module finds the registrable domain and the origin of URLs, so the scrapers can tell
+    which links belong to the website being scraped. The registrable domain is the public suffix of the host,
+    such as 'com' or 'co.uk', plus one label, found by walking a trie of the Public Suffix List rules from the
+    last label of the host. The same hosts come up again and again over a crawl, so results are memoized per
+    host in a bounded LRU cache.
+    """
+
+    # hosts whose results are memoized
+    cache_size = 65536
+
+    def __init__(self, rules=None, cache_size=None):
+        """Builds the trie of the rules.
+
+        Pre:
+            rules: text of the rules in the format of the Public Suffix List, the bundled rules if None
+            cache_size: hosts whose results are memoized, class default if None
+        Post:
+            None
+        Return:
+            None
+        """
+
+        if rules == None:
+            rules = bundled_rules
+        if cache_size != None:
+            self.cache_size = cache_size
+        # label -> child node, '$' marks the end of a rule, '!' holds the labels of exception rules
+        self._trie = {}
+        for line in rules.splitlines():
+            line = line.strip()
+            if line.startswith('//'):
+                continue
+            for rule in line.split():
+                self.__add_rule(rule.lower())
+        self.__lookup = functools.lru_cache(maxsize=self.cache_size)(self.__resolve)
+
+    @classmethod
+    def from_file(cls, path):
+        """Builds a resolver from a copy of the full Public Suffix List, e.g. public_suffix_list.dat.
+
+        Pre:
+            cls: DomainResolver class
+            path: path of the list
+        Post:
+            None
+        Return:
+            DomainResolver object of the rules of the list
+        """
+
+        with open(path, encoding='utf-8') as rules_file:
+            return cls(rules_file.read())
+
+    def __add_rule(self, rule):
+        exception = rule.startswith('!')
+        labels = rule.lstrip('!').split('.')
+        node = self._trie
+        for label in reversed(labels[1:] if exception else labels):
+            node = node.setdefault(label, {})
+        if exception:
+            node.setdefault('!', set()).add(labels[0])
+        else:
+            node['$'] = True
+
+    def __public_suffix_length(self, labels):
+        """Returns the number of labels of the public suffix of a host.
+
+        Pre:
+            labels: labels of the host
+        Post:
+            None
+        Return:
+            number of the last labels of the host making up its public suffix, at least 1
+        """
+
+        length = 1
+        node = self._trie
+        for k in range(1, len(labels) + 1):
+            label = labels[-k]
+            if label in node.get('!', ()):
+                return k - 1
+            child = node.get(label)
+            if child == None:
+                child = node.get('*')
+                if child == None:
+                    break
+            if '$' in child:
+                length = k
+            node = child
+        return length
+
+    def __resolve(self, scheme, netloc):
+        """Resolves the scheme and network location of a URL, see resolve()."""
+
+        host = netloc[netloc.rfind('@') + 1:]
+        if host.startswith('['):
+            # IPv6 address, with or without a port
+            host, port = host[:host.find(']') + 1], host[host.find(']') + 2:]
+        elif ':' in host:
+            host, port = host.split(':', 1)
+        else:
+            port = ''
+        host = host.rstrip('.')
+        if (scheme == 'http' and port == '80') or (scheme == 'https' and port == '443'):
+            port = ''
+
+        origin = scheme + '://' + host
+        if port != '':
+            origin += ':' + port
+        if host == '' or host.startswith('[') or host.replace('.', '').isdigit():
+            # IP addresses have no public suffix
+            return host, origin
+        labels = host.split('.')
+        length = self.__public_suffix_length(labels)
+        if length >= len(labels):
+            # the host is a public suffix itself
+            return host, origin
+        return '.'.join(labels[-length - 1:]), origin
+
+    def resolve(self, url):
+        """Finds the registrable domain and the origin of a URL.
+
+        Pre:
+            url: absolute URL
+        Post:
+            result memoized for the scheme and host of the URL
+        Return:
+            domain: registrable domain of the host in lowercase, e.g. 'example.co.uk' for
+                    'https://www.example.co.uk/about/', the host itself for IP addresses and public suffixes
+            origin: scheme, host and non-default port of the URL, e.g. 'https://www.example.co.uk'
+        """
+
+        scheme_end = url.find('://')
+        if scheme_end < 0:
+            return '', ''
+        netloc_end = len(url)
+        for separator in '/?#':
+            i = url.find(separator, scheme_end + 3)
+            if 0 <= i < netloc_end:
+                netloc_end = i
+        return self.__lookup(url[:scheme_end].lower(), url[scheme_end + 3 : netloc_end].lower())
+
+    def domain(self, url):
+        return self.resolve(url)[0]
+
+    def origin(self, url):
+        return self.resolve(url)[1]
+
+    def same_site(self, url, domain):
+        """Checks whether a URL is on the website of a registrable domain, over HTTP or HTTPS.
+
+        Pre:
+            url: absolute URL
+            domain: registrable domain of the website, see resolve()
+        Post:
+            None
+        Return:
+            True if the URL is a web page with the given registrable domain, False otherwise
+        """
+
+        return url.startswith(('http://', 'https://')) and self.resolve(url)[0] == domain
+
+    def cache_info(self):
+        return self.__lookup.cache_info()
+
+# resolver shared by all scrapers
+_resolver = None
+
+def get_resolver():
+    """Returns the shared DomainResolver, built from the bundled rules on first use.
+
+    Pre:
+        None
+    Post:
+        the shared resolver is created if it does not exist
+    Return:
+        the shared DomainResolver
+    """
+
+    global _resolver
+    if _resolver == None:
+        _resolver = DomainResolver()
+    return _resolver
+
+def legacy_root(url):
+    """The root WebsiteContacts searched links under before the DomainResolver, for the benchmark."""
+
+    domain_start = 0
+    for i in range(len(url)-1, 0, -1):
+        if url[i] == ".":
+            domain_start = i
+            break
+    domain_end = 0
+    for i in range(len(url)-1, domain_start, -1):
+        if url[i] == '/':
+            domain_end = i
+            break
+    if domain_end == 0:
+        domain_end = len(url)-1
+    domain = url[domain_start : domain_end]
+    return url[:url.find(domain)+4]
+
+if __name__ == '__main__':
+    import time
+    import random
+
+    print('Domain resolver')
+    print('---------------')
+    examples = [('https://www.example.co.uk/about/', 'https://shop.example.co.uk/contact/'),
+                ('https://www.example.co.uk/about/', 'https://www.other.co.uk/contact/'),
+                ('https://blog.example.com/', 'https://example.com/contact/'),
+                ('https://example.com/files/v1.2/', 'https://example.com/contact/'),
+                ('https://example.com/', 'https://example.com.evil.net/contact/'),
+                ('http://fitlittlecookie.wordpress.com/', 'http://otherblog.wordpress.com/about/')]
+    resolver = get_resolver()
+    print('{:>40} {:>40} {:>7} {:>7}'.format('website', 'link', 'before', 'now'))
+    for website, link in examples:
+        print('{:>40} {:>40} {:>7} {:>7}'.format(website, link, str(link.startswith(legacy_root(website))),
+                                                 str(resolver.same_site(link, resolver.domain(website)))))
+
+    # links of a crawl, where a few thousand hosts come up again and again
+    rng = random.Random(0)
+    suffixes = ['com', 'co.uk', 'org', 'com.au', 'io', 'de', 'blogspot.com']
+    hosts = ['{}site{}.{}'.format(rng.choice(['', 'www.', 'blog.']), i, rng.choice(suffixes)) for i in range(5000)]
+    urls = ['https://{}/page-{}/'.format(rng.choice(hosts), i) for i in range(200000)]
+
+    start = time.perf_counter()
+    for url in urls:
+        legacy_root(url)
+    legacy_secs = time.perf_counter() - start
+
+    uncached = DomainResolver(cache_size=0)
+    start = time.perf_counter()
+    for url in urls:
+        uncached.resolve(url)
+    trie_secs = time.perf_counter() - start
+
+    resolver = DomainResolver()
+    start = time.perf_counter()
+    for url in urls:
+        resolver.resolve(url)
+    memoized_secs = time.perf_counter() - start
+
+    print()
+    print('{} URLs of {} hosts'.format(len(urls), len(hosts)))
+    for name, secs in [('backward scan, before', legacy_secs), ('trie without memoization', trie_secs), ('trie with LRU cache', memoized_secs)]:
+        print('{:>26}: {:10.0f} lookups/s'.format(name, len(urls) / secs))
+    print('{:>26}: {}'.format('LRU cache', resolver.cache_info()))
@@ -0,0 +1,262 @@
+import re
+import time
+from collections import Counter
+
+class FakeWorksheet:
+    """
+    The FakeWorksheet module is a worksheet of a FakeSpreadsheet, holding its cells as a list of rows.
+    """
+
+    def __init__(self, spreadsheet, title, rows=None):
+        self._spreadsheet = spreadsheet
+        self.title = title
+        if rows == None:
+            rows = []
+        self.rows = [list(row) for row in rows]
+
+    def set_cells(self, row_number, col_number, values):
+        """Writes rows of values with their top left cell at the given row and column, growing the sheet.
+
+        Pre:
+            row_number: row of the top left cell, starting at 1
+            col_number: column of the top left cell, starting at 1
+            values: rows of values
+        Post:
+            cells written
+        Return:
+            None
+        """
+
+        for i in range(len(values)):
+            while len(self.rows) < row_number + i:
+                self.rows.append([])
+            row = self.rows[row_number + i - 1]
+            for j in range(len(values[i])):
+                while len(row) < col_number + j:
+                    row.append('')
+                row[col_number + j - 1] = values[i][j]
+
+    def get_cells(self, first_row=1, first_col=1, last_row=None, last_col=None):
+        """Reads a range of cells the way the Sheets API returns it, without trailing empty rows and cells.
+
+        Pre:
+            first_row, first_col: top left cell of the range, starting at 1
+            last_row, last_col: bottom right cell of the range, the end of the sheet if None
+        Post:
+            None
+        Return:
+            rows of values of the range
+        """
+
+        if last_row == None:
+            last_row = len(self.rows)
+        values = []
+        for row in self.rows[first_row - 1 : last_row]:
+            if last_col == None:
+                row = row[first_col - 1:]
+            else:
+                row = row[first_col - 1 : last_col]
+            while len(row) > 0 and row[-1] == '':
+                row = row[:-1]
+            values.append(list(row))
+        while len(values) > 0 and len(values[-1]) == 0:
+            values.pop()
+        return values
+
+    def col_values(self, col):
+        self._spreadsheet.client.count('col_values')
+        return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+    def get_all_values(self):
+        self._spreadsheet.client.count('get_all_values')
+        return self.get_cells()
+
+    def update(self, range_name, values, **kwargs):
+        self._spreadsheet.client.count('update')
+        first_row, first_col, last_row, last_col = parse_cells(range_name)
+        self.set_cells(first_row, first_col, values)
+
+    def append_rows(self, values, value_input_option='RAW', insert_data_option=None, table_range=None, **kwargs):
+        """Appends rows after the last non-empty row of the sheet.
+
+        Pre:
+            values: rows to append
+        Post:
+            rows written below the last non-empty row
+        Return:
+            response with the updatedRange of the appended rows, as the Sheets API returns it
+        """
+
+        self._spreadsheet.client.count('append_rows')
+        last = 0
+        for i in range(len(self.rows)):
+            if any(cell != '' for cell in self.rows[i]):
+                last = i + 1
+        self.set_cells(last + 1, 1, values)
+        width = max([len(row) for row in values] + [1])
+        updated_range = "'{}'!A{}:{}{}".format(self.title, last + 1, column_letters(width), last + len(values))
+        return {'updates': {'updatedRange': updated_range, 'updatedRows': len(values)}}
+
+class FakeSpreadsheet:
+    """
+    The FakeSpreadsheet module is a spreadsheet of a FakeSheetsClient, with the batched value requests of a
+    gspread Spreadsheet.
+    """
+
+    def __init__(self, client, title, sheets):
+        self.client = client
+        self.title = title
+        self._worksheets = [FakeWorksheet(self, sheet_title, rows) for sheet_title, rows in sheets]
+
+    def __worksheet(self, range_name):
+        title = range_name[:range_name.rfind('!')]
+        if title.startswith("'"):
+            title = title[1:-1].replace("''", "'")
+        for worksheet in self._worksheets:
+            if worksheet.title == title:
+                return worksheet
+        raise KeyError(title)
+
+    def worksheets(self):
+        self.client.count('worksheets')
+        return list(self._worksheets)
+
+    def get_worksheet(self, index):
+        self.client.count('get_worksheet')
+        return self._worksheets[index]
+
+    def values_batch_get(self, ranges, **kwargs):
+        self.client.count('values_batch_get')
+        value_ranges = []
+        for range_name in ranges:
+            values = self.__worksheet(range_name).get_cells(*parse_cells(range_name))
+            value_range = {'range': range_name}
+            if len(values) > 0:
+                value_range['values'] = values
+            value_ranges.append(value_range)
+        return {'valueRanges': value_ranges}
+
+    def values_batch_update(self, body):
+        self.client.count('values_batch_update')
+        for data in body['data']:
+            first_row, first_col, last_row, last_col = parse_cells(data['range'])
+            self.__worksheet(data['range']).set_cells(first_row, first_col, data['values'])
+        return {'totalUpdatedCells': sum(len(row) for data in body['data'] for row in data['values'])}
+
+class FakeSheetsClient:
+    """
+    The FakeSheetsClient module is an in-process stand-in for a gspread client, so that the Google Sheets
+    workflow can run and be performance-tested offline. It supports the worksheet reads and writes the
+    SheetsStore makes, and counts every call that would be a round trip to the Sheets API. Each call can
+    optionally sleep to simulate the latency of the API.
+    """
+
+    def __init__(self, latency=0):
+        """Sets up a client without any file.
+
+        Pre:
+            latency: seconds each API call sleeps
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._latency = latency
+        self._files = {}
+        # API method name -> number of calls
+        self.api_calls = Counter()
+
+    def count(self, method):
+        self.api_calls[method] += 1
+        if self._latency > 0:
+            time.sleep(self._latency)
+
+    @property
+    def num_api_calls(self):
+        return sum(self.api_calls.values())
+
+    def add_spreadsheet(self, title, sheets):
+        """Creates a file without counting an API call.
+
+        Pre:
+            title: name of the file
+            sheets: list of (title, rows) of the worksheets
+        Post:
+            file created, replacing a file of the same name
+        Return:
+            FakeSpreadsheet object of the file
+        """
+
+        self._files[title] = FakeSpreadsheet(self, title, sheets)
+        return self._files[title]
+
+    def open(self, title):
+        self.count('open')
+        return self._files[title]
+
+def column_letters(col):
+    """Converts a column number, starting at 1, to its letters in A1 notation."""
+
+    letters = ''
+    while col > 0:
+        col, remainder = divmod(col - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+def parse_cells(range_name):
+    """Parses the cells of a range in A1 notation, e.g. "'Sheet1'!A2:F", 'A:B' or 'B7'.
+
+    Pre:
+        range_name: range in A1 notation, with or without the sheet title
+    Post:
+        None
+    Return:
+        first_row, first_col: top left cell of the range, starting at 1
+        last_row, last_col: bottom right cell of the range, None for the end of the sheet
+    """
+
+    cells = range_name[range_name.rfind('!') + 1:]
+    bounds = []
+    for part in cells.split(':'):
+        match = re.match('([A-Z]*)([0-9]*)$', part.upper())
+        col = None
+        if match.group(1) != '':
+            col = 0
+            for letter in match.group(1):
+                col = col * 26 + ord(letter) - ord('A') + 1
+        row = None
+        if match.group(2) != '':
+            row = int(match.group(2))
+        bounds.append((row, col))
+    first_row, first_col = bounds[0]
+    if len(bounds) == 1:
+        # a single cell only bounds the top left corner of written values
+        last_row, last_col = None, None
+    else:
+        last_row, last_col = bounds[1]
+    return first_row or 1, first_col or 1, last_row, last_col
+
+if __name__ == '__main__':
+    from SheetsStore import SheetsStore
+
+    print('Sheets API round trips of a SheetsStore')
+    print('---------------------------------------')
+    for websites in [10, 1000, 10000]:
+        client = FakeSheetsClient()
+        existing = [['url', 'emails'], ['https://site0.com', 'old@site0.com']]
+        inputs = [['website', 'status']] + [['https://site{}.com'.format(i)] for i in range(websites)]
+        client.add_spreadsheet('Contacts', [('Sheet1', existing), ('Sheet2', []), ('Sheet3', []), ('Sheet4', inputs)])
+
+        store = SheetsStore('Contacts', client=client, interactive=False)
+        opened = client.num_api_calls
+        for website in store.inputs('web_scrape'):
+            store.upsert([website, 'info@' + website[8:], '', '', '', ''])
+            if store.num_pending >= 200:
+                store.flush()
+        store.flush()
+        store.set_statuses('web_scrape', 'scraped')
+        sheet1 = client.open('Contacts').get_worksheet(0).get_cells()
+
+        print('{:>6} websites: {} calls to open, {} calls to write, {} rows on Sheet1, calls: {}'.format(
+              websites, opened, client.num_api_calls - opened - 2, len(sheet1) - 1, dict(client.api_calls)))
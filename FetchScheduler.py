@@ -0,0 +1,231 @@
+import time
+import threading
+from collections import deque
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+class FetchScheduler:
+    """
+    The FetchScheduler module decides when each fetch of the HttpClient may start, so that many websites
+    can be scraped at once without overloading any one of them. Every host has a token bucket limiting its
+    request rate and a limit on its requests in flight, a host that answers with Retry-After is paused for
+    that long, and free slots of the global in-flight limit are handed to waiting hosts in turn so that one
+    busy host cannot starve the others.
+    """
+
+    def __init__(self, host_rate=4.0, host_burst=8, host_in_flight=4, max_in_flight=64, backoff=10):
+        """Sets up the scheduler without any host.
+
+        Pre:
+            host_rate: requests per second each host is allowed on average
+            host_burst: requests a host is allowed at once after being idle
+            host_in_flight: requests in flight per host
+            max_in_flight: requests in flight over all hosts
+            backoff: seconds a host is paused after a 429 or 503 response without Retry-After
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._host_rate = host_rate
+        self._host_burst = host_burst
+        self._host_in_flight = host_in_flight
+        self._max_in_flight = max_in_flight
+        self._backoff = backoff
+        self._in_flight = 0
+        # host -> [tokens, time of the last refill, requests in flight, paused until, waiting tickets]
+        self._hosts = {}
+        # number of hosts at which the idle hosts are dropped, doubled after each sweep
+        self._sweep_at = 64
+        # hosts with waiting fetches, in the order they get their next turn
+        self._turns = deque()
+        self._condition = threading.Condition()
+
+    def __host(self, url):
+        return urlparse(url).netloc.lower()
+
+    def __refill(self, state, now):
+        """Adds the tokens earned by a host since its last refill.
+
+        Pre:
+            state: state of the host
+            now: current monotonic time
+        Post:
+            tokens of the host refilled up to the burst
+        Return:
+            None
+        """
+
+        state[0] = min(self._host_burst, state[0] + (now - state[1]) * self._host_rate)
+        state[1] = now
+
+    def __wait_time(self, state, now):
+        """Returns how long a host has to wait before it may start a fetch, ignoring the in-flight limits.
+
+        Pre:
+            state: refilled state of the host
+            now: current monotonic time
+        Post:
+            None
+        Return:
+            seconds until the host has a token and is no longer paused, 0 if it may start now
+        """
+
+        wait = max(0, state[3] - now)
+        if state[0] < 1:
+            wait = max(wait, (1 - state[0]) / self._host_rate)
+        return wait
+
+    def __idle(self, state, now):
+        """Returns whether a host can be forgotten, because a new state of the host would be the same.
+
+        Pre:
+            state: state of the host
+            now: current monotonic time
+        Post:
+            tokens of the host refilled
+        Return:
+            True if the host has nothing in flight, nothing waiting, a full bucket and no pause
+        """
+
+        self.__refill(state, now)
+        return state[2] == 0 and len(state[4]) == 0 and state[0] >= self._host_burst and state[3] <= now
+
+    def __sweep(self, now):
+        """Drops the state of the idle hosts, so that a long scrape of many websites does not keep every host.
+
+        Pre:
+            the lock is held
+            now: current monotonic time
+        Post:
+            idle hosts removed, and the next sweep set for when the number of hosts doubled
+        Return:
+            None
+        """
+
+        for host in [host for host, state in self._hosts.items() if self.__idle(state, now)]:
+            del self._hosts[host]
+        self._sweep_at = max(64, 2 * len(self._hosts))
+
+    def __next_host(self, now):
+        """Finds the host whose turn it is to start a fetch.
+
+        Pre:
+            the lock is held
+            now: current monotonic time
+        Post:
+            tokens of the waiting hosts refilled
+        Return:
+            host: first host in turn order that may start a fetch now, None if there is none
+            wait: seconds until a waiting host may be ready, None if no host is waiting on time
+        """
+
+        if self._in_flight >= self._max_in_flight:
+            return None, None
+        wait = None
+        for host in self._turns:
+            state = self._hosts[host]
+            if state[2] >= self._host_in_flight:
+                continue
+            self.__refill(state, now)
+            host_wait = self.__wait_time(state, now)
+            if host_wait == 0:
+                return host, None
+            if wait == None or host_wait < wait:
+                wait = host_wait
+        return None, wait
+
+    def acquire(self, url):
+        """Waits until a fetch of the URL may start.
+
+        Pre:
+            url: URL to fetch
+        Post:
+            a token and an in-flight slot of the host of the URL are taken, to be given back with release()
+        Return:
+            None
+        """
+
+        host = self.__host(url)
+        ticket = object()
+        with self._condition:
+            if host not in self._hosts:
+                if len(self._hosts) >= self._sweep_at:
+                    self.__sweep(time.monotonic())
+                self._hosts[host] = [self._host_burst, time.monotonic(), 0, 0, deque()]
+            state = self._hosts[host]
+            state[4].append(ticket)
+            if host not in self._turns:
+                self._turns.append(host)
+
+            while True:
+                next_host, wait = self.__next_host(time.monotonic())
+                if next_host == host and state[4][0] is ticket:
+                    break
+                self._condition.wait(wait)
+
+            state[0] -= 1
+            state[2] += 1
+            self._in_flight += 1
+            state[4].popleft()
+            # the host goes to the back of the turn order, or leaves it if nothing else is waiting
+            self._turns.remove(host)
+            if len(state[4]) > 0:
+                self._turns.append(host)
+            self._condition.notify_all()
+
+    def release(self, url, status_code=None, retry_after=None):
+        """Gives back the in-flight slot of a finished fetch, pausing the host if it asked to slow down.
+
+        Pre:
+            url: URL that was fetched
+            status_code: status code of the response, None if the fetch failed
+            retry_after: Retry-After header of the response, None if it has none
+        Post:
+            the in-flight slot of the host is free, and the host is paused if the response asked for it
+        Return:
+            seconds the host is paused for, 0 if it is not paused
+        """
+
+        pause = 0
+        if retry_after != None:
+            pause = self.parse_retry_after(retry_after)
+        if pause == 0 and status_code in (429, 503):
+            pause = self._backoff
+
+        with self._condition:
+            host = self.__host(url)
+            state = self._hosts[host]
+            state[2] -= 1
+            self._in_flight -= 1
+            now = time.monotonic()
+            if pause > 0:
+                state[3] = max(state[3], now + pause)
+            if self.__idle(state, now):
+                del self._hosts[host]
+            self._condition.notify_all()
+        return pause
+
+    @staticmethod
+    def parse_retry_after(retry_after):
+        """Parses a Retry-After header.
+
+        Pre:
+            retry_after: value of the header, in seconds or as an HTTP date
+        Post:
+            None
+        Return:
+            seconds to wait, 0 if the value is invalid or in the past
+        """
+
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return int(retry_after)
+        try:
+            date = parsedate_to_datetime(retry_after)
+        except (TypeError, ValueError):
+            return 0
+        if date == None:
+            return 0
+        return max(0, date.timestamp() - time.time())
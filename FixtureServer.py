@@ -0,0 +1,416 @@
+import gzip
+import random
+import socket
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+class FixtureServer:
+    """
+    The FixtureServer module serves generated websites, directory websites listing them and search result
+    pages from a local HTTP server, so the scrapers can be benchmarked offline. Every website has its own host
+    under the reserved .test domain, e.g. site3.test, and all hosts are served by one server on 127.0.0.1 that
+    tells them apart by the Host header; install_resolver() makes the .test hosts resolve to 127.0.0.1. The
+    pages are generated from a seed, so the contacts every website should yield are known in advance.
+    """
+
+    # top level domain of the generated hosts
+    domain = 'test'
+    # keyphrases of the search result pages
+    keyphrase_format = 'benchmark topic {}'
+
+    def __init__(self, sites=40, pages=12, fan_out=6, page_kb=16, slow=0.1, failing=0.05, delay=0.2, directories=4, port=0, seed=0, sitemaps=0.0):
+        """Generates the websites, without serving them until start() is called.
+
+        Pre:
+            sites: number of websites with contacts
+            pages: number of member pages of each website, which are crawled but have no contacts
+            fan_out: number of links from each page to member pages of the same website
+            page_kb: size of every page in kilobytes, padded with text
+            slow: fraction of the websites that answer every request after delay seconds
+            failing: fraction of the websites that drop the connection when their homepage is requested
+            delay: seconds a slow website waits before answering
+            directories: number of directory websites, each listing a share of the websites
+            port: port to serve on, a free port if 0
+            seed: seed of the generated content
+            sitemaps: fraction of the websites, none of them failing, that list their pages in a gzip-compressed
+                      sitemap under a sitemap index named by robots.txt
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self.sites = sites
+        self.pages = pages
+        self.fan_out = fan_out
+        self.page_kb = page_kb
+        self.delay = delay
+        self.directories = directories
+        self.port = port
+        self._seed = seed
+
+        # the slow and failing websites are distinct, chosen at random
+        order = list(range(sites))
+        random.Random(seed).shuffle(order)
+        num_failing = int(round(sites * failing))
+        self._failing = frozenset(order[:num_failing])
+        self._slow = frozenset(order[num_failing : num_failing + int(round(sites * slow))])
+        self._sitemaps = frozenset(order[num_failing:][:int(round(sites * sitemaps))])
+
+        # text padding the pages up to page_kb
+        rng = random.Random(seed)
+        words = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do',
+                 'eiusmod', 'tempor', 'incididunt', 'ut', 'labore', 'et', 'dolore', 'magna', 'aliqua']
+        self._filler = ' '.join(rng.choice(words) for i in range(page_kb * 256))
+
+        # (host, path) -> (status, body) of the generated pages
+        self._pages = {}
+        self._lock = threading.Lock()
+        self.requests_served = 0
+        self.bytes_served = 0
+        self._server = None
+
+    def start(self):
+        """Serves the websites from a background thread.
+
+        Pre:
+            None
+        Post:
+            server listening on 127.0.0.1, port set to the port it listens on
+        Return:
+            the server
+        """
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), FixtureHandler)
+        self._server.daemon_threads = True
+        self._server.fixture = self
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server != None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    @staticmethod
+    def install_resolver():
+        """Makes the .test hosts resolve to 127.0.0.1 in this process, leaving every other host as it was.
+
+        Pre:
+            None
+        Post:
+            socket.getaddrinfo wrapped, once however many times it is called
+        Return:
+            None
+        """
+
+        getaddrinfo = socket.getaddrinfo
+        if getattr(getaddrinfo, 'fixture', False):
+            return
+        def resolve(host, *args, **kwargs):
+            if isinstance(host, bytes):
+                host = host.decode('ascii')
+            if isinstance(host, str) and host.endswith('.' + FixtureServer.domain):
+                host = '127.0.0.1'
+            return getaddrinfo(host, *args, **kwargs)
+        resolve.fixture = True
+        socket.getaddrinfo = resolve
+
+    def url(self, host, path='/'):
+        return 'http://{}.{}:{}{}'.format(host, self.domain, self.port, path)
+
+    @property
+    def search_url(self):
+        """URL of the search page, followed by the query, to set as GoogleSearch.search_url."""
+
+        return self.url('serp', '/search?q=')
+
+    @property
+    def websites(self):
+        return [self.url('site{}'.format(n)) for n in range(self.sites)]
+
+    def keyphrases(self, count=None):
+        """Returns keyphrases whose search results list the directory websites.
+
+        Pre:
+            count: number of keyphrases, one per directory website if None
+        Post:
+            None
+        Return:
+            list of keyphrases
+        """
+
+        if count == None:
+            count = self.directories
+        return [self.keyphrase_format.format(i) for i in range(count)]
+
+    def __search_directories(self, keyphrase):
+        try:
+            i = int(keyphrase.rsplit(' ', 1)[1])
+        except (IndexError, ValueError):
+            return []
+        return sorted(set([i % self.directories, (i + 1) % self.directories]))
+
+    def search_urls(self, keyphrase):
+        """Returns the URLs the search result page of a keyphrase lists, as GoogleSearch.url_list should."""
+
+        return [self.url('dir{}'.format(k), '/list/') for k in self.__search_directories(keyphrase)]
+
+    def search_websites(self, keyphrase):
+        """Returns the websites listed by the search results of a keyphrase, as GoogleSearch.website_list should."""
+
+        websites = []
+        for k in self.__search_directories(keyphrase):
+            websites += [self.url('site{}'.format(n)) for n in range(k, self.sites, self.directories)]
+        return sorted(websites)
+
+    def __site_contacts(self, n):
+        """Returns the contacts of each contact page of a website.
+
+        Pre:
+            n: number of the website
+        Post:
+            None
+        Return:
+            dictionary of the path of each contact page to its emails, Cloudflare-encoded emails, facebooks,
+            instagrams, twitters and linkedins
+        """
+
+        domain = 'site{}.com'.format(n)
+        # a Cloudflare-encoded email has 18 characters
+        local = 'cf' + 'x' * (15 - len(domain))
+        return {'/about/': (['team{}@{}'.format(n, domain), 'press{}@{}'.format(n, domain)], [],
+                            ['facebook.com/site{}'.format(n)], [], ['twitter.com/site{}news'.format(n)], []),
+                '/contact/': (['hello{}@{}'.format(n, domain)], [local + '@' + domain],
+                              [], ['instagram.com/site{}'.format(n)], [], ['linkedin.com/site{}'.format(n)]),
+                '/company/reach-us/': (['deep{}@{}'.format(n, domain)], [], [], [], [], [])}
+
+    def __directory_contacts(self, k):
+        return {'/contact/': (['editor{}@dir{}.com'.format(k, k)], [], [], [], ['twitter.com/dir{}'.format(k)], [])}
+
+    def expected(self, url):
+        """Returns the contacts a website should yield when it is scraped.
+
+        Pre:
+            url: root URL of a website, or the URL a search result page lists for a directory website
+        Post:
+            None
+        Return:
+            emails, facebooks, instagrams, twitters, linkedins: sets of the contacts, empty if the website fails
+            or is not one of the generated websites
+        """
+
+        host = urlsplit(url).hostname or ''
+        name = host[:-len(self.domain) - 1]
+        contacts = ()
+        if name.startswith('site') and name[4:].isdigit() and int(name[4:]) not in self._failing:
+            contacts = self.__site_contacts(int(name[4:])).values()
+        elif name.startswith('dir') and name[3:].isdigit():
+            contacts = self.__directory_contacts(int(name[3:])).values()
+
+        expected = [set(), set(), set(), set(), set()]
+        for emails, cfemails, facebooks, instagrams, twitters, linkedins in contacts:
+            expected[0].update(emails + cfemails)
+            expected[1].update(facebooks)
+            expected[2].update(instagrams)
+            expected[3].update(twitters)
+            expected[4].update(linkedins)
+        return tuple(expected)
+
+    def counters(self):
+        with self._lock:
+            return self.requests_served, self.bytes_served
+
+    def __pad(self, parts):
+        """Joins the parts of a page, padding it with text up to page_kb."""
+
+        size = sum(len(part) for part in parts)
+        padding = max(0, self.page_kb * 1024 - size - 20)
+        return '<html><body>' + ''.join(parts) + '<p>' + self._filler[:padding] + '</p></body></html>'
+
+    def __contact_parts(self, contacts):
+        emails, cfemails, facebooks, instagrams, twitters, linkedins = contacts
+        parts = []
+        for email in emails:
+            parts.append('<p>Write to <a href="mailto:{0}">{0}</a></p>'.format(email))
+        for email in cfemails:
+            key = random.Random(email).randrange(1, 256)
+            encoded = '{:02x}'.format(key) + ''.join('{:02x}'.format(ord(c) ^ key) for c in email)
+            parts.append('<p><a href="/cdn-cgi/l/email-protection" class="__cf_email__" data-cfemail="{}">[email&#160;protected]</a></p>'.format(encoded))
+        for sns in facebooks + instagrams + twitters + linkedins:
+            parts.append('<a href="https://{}">Follow us</a> '.format(sns))
+        return parts
+
+    def __member_links(self, rng):
+        return ['<a href="/people/member-{0}/">People {0}</a> '.format(k) for k in rng.sample(range(self.pages), min(self.fan_out, self.pages))]
+
+    def __site_file(self, n, path):
+        """Generates robots.txt and the sitemaps of a website that has them.
+
+        Pre:
+            n: number of the website
+            path: path of the file
+        Post:
+            None
+        Return:
+            status, body: HTTP status and content of the file, or None if the path is not one of the files
+        """
+
+        if path == '/robots.txt':
+            return 200, 'User-agent: *\nDisallow: /people/\n\nSitemap: {}\n'.format(self.url('site{}'.format(n), '/sitemap_index.xml'))
+        if path == '/sitemap_index.xml':
+            sitemaps = ''.join('<sitemap><loc>{}</loc></sitemap>'.format(self.url('site{}'.format(n), name))
+                               for name in ['/post-sitemap.xml', '/page-sitemap.xml.gz'])
+            return 200, '<?xml version="1.0" encoding="UTF-8"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{}</sitemapindex>'.format(sitemaps)
+        if path in ('/post-sitemap.xml', '/page-sitemap.xml.gz'):
+            if path == '/post-sitemap.xml':
+                paths = ['/blog/post-{}/'.format(j) for j in range(self.fan_out)]
+            else:
+                paths = ['/'] + list(self.__site_contacts(n)) + ['/people/member-{}/'.format(k) for k in range(self.pages)]
+            urls = ''.join('<url><loc>{}</loc></url>'.format(self.url('site{}'.format(n), path)) for path in paths)
+            xml = '<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{}</urlset>'.format(urls)
+            if path.endswith('.gz'):
+                return 200, gzip.compress(xml.encode('utf-8'))
+            return 200, xml
+        return None
+
+    def __site_page(self, n, path):
+        """Generates a page of a website.
+
+        Pre:
+            n: number of the website
+            path: path of the page
+        Post:
+            None
+        Return:
+            status, body: HTTP status and HTML of the page
+        """
+
+        rng = random.Random('{} {} {}'.format(self._seed, n, path))
+        posts = ['<a href="/blog/post-{0}/">Post {0}</a> '.format(j) for j in range(self.fan_out)]
+        contacts = self.__site_contacts(n)
+        if path == '/':
+            parts = ['<nav><a href="/about/">About us</a> <a href="/contact/">Contact</a></nav>']
+            return 200, self.__pad(parts + self.__member_links(rng) + posts)
+        if path in contacts:
+            parts = self.__contact_parts(contacts[path])
+            if path == '/about/':
+                parts.append('<a href="/company/reach-us/">Get in touch</a>')
+            return 200, self.__pad(parts + posts)
+        if path.startswith('/people/member-'):
+            # one member page in twenty is broken
+            if rng.random() < 0.05:
+                return 500, '<html><body>Internal Server Error</body></html>'
+            return 200, self.__pad(self.__member_links(rng) + posts)
+        if path.startswith('/blog/post-'):
+            return 200, self.__pad(posts)
+        return 404, '<html><body>Not Found</body></html>'
+
+    def __directory_page(self, k, path):
+        if path == '/list/':
+            parts = ['<a href="{}">Website {}</a> '.format(self.url('site{}'.format(n)), n) for n in range(k, self.sites, self.directories)]
+            # links the search scrape skips: the directory itself and SNS websites
+            parts.append('<a href="{}">Contact</a> <a href="https://facebook.com/dir{}">Facebook</a>'.format(self.url('dir{}'.format(k), '/contact/'), k))
+            return 200, self.__pad(parts)
+        contacts = self.__directory_contacts(k)
+        if path in contacts:
+            return 200, self.__pad(self.__contact_parts(contacts[path]))
+        return 404, '<html><body>Not Found</body></html>'
+
+    def __search_page(self, query):
+        keyphrase = parse_qs(query).get('q', [''])[0]
+        parts = ['<a href="/search?q=more&amp;start=10">Next</a> <a href="https://maps.google.com/maps?q=x">Maps</a>',
+                 '<a href="/url?q=https://support.google.com/websearch&amp;sa=U&amp;ved=0">Help</a>']
+        for url in self.search_urls(keyphrase):
+            parts.append('<div><a href="/url?q={}&amp;sa=U&amp;ved=2ahUKEwi">Result</a></div>'.format(url))
+        return 200, self.__pad(parts)
+
+    def page(self, host, path):
+        """Returns a page, generating it on first request.
+
+        Pre:
+            host: host of the request, without the port
+            path: path and query of the request
+        Post:
+            None
+        Return:
+            status: HTTP status of the page, or None to drop the connection
+            body: HTML of the page, or content of a file of a website, bytes if it is compressed
+            delay: seconds to wait before answering
+        """
+
+        name = host[:-len(self.domain) - 1] if host.endswith('.' + self.domain) else ''
+        if name.startswith('site') and name[4:].isdigit() and int(name[4:]) < self.sites:
+            n = int(name[4:])
+            delay = self.delay if n in self._slow else 0
+            if n in self._failing and path == '/':
+                return None, '', delay
+            key = (host, path)
+            if key not in self._pages:
+                page = None
+                if n in self._sitemaps:
+                    page = self.__site_file(n, path)
+                if page == None:
+                    page = self.__site_page(n, path)
+                self._pages[key] = page
+            return self._pages[key] + (delay,)
+        if name.startswith('dir') and name[3:].isdigit() and int(name[3:]) < self.directories:
+            return self.__directory_page(int(name[3:]), path) + (0,)
+        if name == 'serp':
+            split = urlsplit(path)
+            if split.path == '/search':
+                return self.__search_page(split.query) + (0,)
+        return 404, '<html><body>Not Found</body></html>', 0
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    """Answers the requests of a FixtureServer over keep-alive connections."""
+
+    protocol_version = 'HTTP/1.1'
+    # (suffix of the path, content type) of the files of the websites that are not pages
+    file_types = (('.txt', 'text/plain; charset=utf-8'), ('.xml', 'application/xml'), ('.gz', 'application/x-gzip'))
+
+    def do_GET(self):
+        fixture = self.server.fixture
+        host = (self.headers.get('Host') or '').split(':')[0].lower()
+        status, body, delay = fixture.page(host, self.path)
+        if delay > 0:
+            time.sleep(delay)
+        if status == None:
+            # the connection is dropped without an answer
+            self.close_connection = True
+            self.connection.shutdown(socket.SHUT_RDWR)
+            return
+
+        content = body
+        if isinstance(body, str):
+            content = body.encode('utf-8')
+        content_type = 'text/html; charset=utf-8'
+        if status == 200:
+            for suffix, file_type in FixtureHandler.file_types:
+                if self.path.endswith(suffix):
+                    content_type = file_type
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        with fixture._lock:
+            fixture.requests_served += 1
+            fixture.bytes_served += len(content)
+
+    def log_message(self, format, *args):
+        pass
+
+if __name__ == '__main__':
+    fixture = FixtureServer().start()
+    print('Serving', fixture.sites, 'websites on 127.0.0.1 port', fixture.port, '- hit <CTRL-C> to stop.')
+    print('Search page:', fixture.search_url + fixture.keyphrases()[0].replace(' ', '+'))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        fixture.stop()
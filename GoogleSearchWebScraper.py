@@ -6,19 +6,35 @@ Created on Fri Jul 17 12:59:24 2020
 @author: kevinjin
 """
 
-import requests
-from bs4 import BeautifulSoup
+from HttpClient import get_client
+from LinkExtractor import LinkExtractor
+from CrawlMetrics import get_metrics
+from SearchCache import SearchCache
+from SearchLimiter import SearchLimiter
+from DomainResolver import get_resolver
 import re
-from urllib.parse import urlparse
-from datetime import datetime, timedelta
-from sortedcontainers import SortedSet
+import time
 
 class GoogleSearch:
     """
     The GoogleSearch class visits sites from a GoogleSearch to extract relevant sites for the WebContactScraper
-    module to scrape contact information.
+    module to scrape contact information. The results of each search are kept in a SearchCache, so a keyphrase
+    searched again is not sent to Google, and searches of all processes are queued by a SearchLimiter.
     """
     
+    # links to other websites
+    __absolute_pattern = re.compile("https?://")
+    # URL of the search page, followed by the query
+    search_url = "https://google.com/search?q="
+    # seconds between two searches of any process, to prevent overloading of Google's servers
+    search_interval = 10 * 60
+    # file holding the time of the last search slot, shared by all processes
+    search_time_path = 'PrevSearchTime.txt'
+    # SQLite file of the results of earlier searches, searches not cached if None
+    cache_path = 'SearchCache.sqlite3'
+    # seconds the results of a search are reused
+    cache_ttl = 7 * 24 * 60 * 60
+    
     def __init__(self, query):
         """Sets up the Google Search.
         
@@ -26,58 +42,76 @@ class GoogleSearch:
             query: keywords to be searched
         Post:
             The Google Search URL is built from the query, replacing whitespace with '+'. The member
-            variable _url_list is assigned values from the __extract_urls() function.
+            variable _url_list is assigned values from the __extract_search_urls() function, or from the cache
+            if the query was searched within cache_ttl. The websites listed on the results are only extracted
+            when they are first read, see websites().
         Return:
             None
         """
         self._query = query
         append_query = self._query.replace(' ', '+')
-        self._search_url = "https://google.com/search?q=" + append_query
-        self._url_list = self.__extract_search_urls()
-        self._website_list = self.__extract_websites()
+        self._search_url = self.search_url + append_query
+        # websites listed on the results, None until they are extracted
+        self._website_list = None
+        
+        cache = self.__open_cache()
+        try:
+            cached = None
+            if cache != None:
+                cached = cache.lookup(self.search_url, self._query)
+            if cached == None:
+                self.__wait_for_search()
+                # another process may have searched the same query while this one waited
+                if cache != None:
+                    cached = cache.lookup(self.search_url, self._query)
+            if cached != None:
+                get_metrics().count('search_cache_hits')
+                self._url_list, self._website_list = cached
+            else:
+                self._url_list = self.__extract_search_urls()
+                # a results page without results, e.g. a captcha, is not cached
+                if cache != None and len(self._url_list) > 0:
+                    cache.store(self.search_url, self._query, self._url_list, None)
+        finally:
+            if cache != None:
+                cache.close()
         #for url in self._url_list:
             #print(url)
-        #for website in self._website_list:
-            #print(website)
+
+    def __open_cache(self):
+        if self.cache_path == None:
+            return None
+        return SearchCache(self.cache_path, self.cache_ttl)
 
     @property
     def website_list(self):
+        if self._website_list == None:
+            for website in self.websites():
+                pass
         return self._website_list
     
     @property
     def url_list(self):
         return self._url_list
 
-    def __file_search_limit(self):
-        """Limits the program to one search every 10 minutes to prevent overloading of Google's servers.
+    def __wait_for_search(self):
+        """Waits for the next free slot of the SearchLimiter, one every search_interval seconds over all
+        processes, to prevent overloading of Google's servers.
         
         Pre:
             None
         Post:
-            The last time read is written to the PrevSearchTime.txt file.
+            If the slot is not free yet, the program will print the number of minutes until it will begin
+            scraping again and sleep until then.
         Return:
-            10: indicates that the last search was at least 10 minutes ago
-            diff_time: amount of time since the last time searched
-        
+            None
         """
         
-        curr_time = datetime.now()
-        #print(curr_time)
-        
-        with open('PrevSearchTime.txt', 'r') as reader:
-            prev_time_str = reader.read()
-            if prev_time_str == '':
-                with open('PrevSearchTime.txt', 'w') as writer:
-                    writer.write(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
-                return 10
-            prev_time = datetime.strptime(prev_time_str, '%d/%m/%Y %H:%M:%S')
-            diff_time = curr_time - prev_time
-            if diff_time > timedelta(minutes = 10):
-                with open('PrevSearchTime.txt', 'w') as writer:
-                    writer.write(datetime.now().strftime("%d/%m/%Y %H:%M:%S"))
-                return 10
-            else:
-                return diff_time
+        wait_secs = SearchLimiter(self.search_time_path, self.search_interval).reserve()
+        if wait_secs > 0:
+            print('The program will automatically scrape in {:.1f} minutes. Please wait.'.format(wait_secs/60))
+            with get_metrics().span('search_wait', self._search_url):
+                time.sleep(wait_secs)
 
     def __extract_search_urls(self):
         """Extracts all URLs on the first page of the Google Search.
@@ -85,87 +119,95 @@ class GoogleSearch:
         Pre:
             None
         Post:
-            If the file search limit is not met, the program will print the number of minutes until it
-            will begin scraping again. The program will set a timer so that it will continue to run 10
-            minutes after the last search.
+            None
         Return:
             urls: a list of urls extracted from the Google Search page
 
         """
         
-        # find the time remaining and put a timer to that amount of time
-        file_search_limit = self.__file_search_limit()
-        if file_search_limit != 10:
-            remaining_secs = (10 * 60) - int(file_search_limit.total_seconds())
-            print('The program will automatically scrape in {} minutes. Please wait.'.format(round(remaining_secs/60)))
-            #time.sleep(remaining_secs)
-        
-        html = requests.get(self._search_url).text        
-        soup = BeautifulSoup(html, 'lxml')
-        
-        # TODO: find way to traverse pages in Google Search
-        urls = SortedSet()
-        #pages = []
-        for a in soup.find_all('a', href=True):
-            if '/url?q=' in a['href'] and 'google.com' not in a['href']:
-                url_end = a['href'].find('&sa=U')
-                urls.add(a['href'][7:url_end])
+        with get_metrics().span('search', self._search_url, query=self._query):
+            html = get_client().fetch_html(self._search_url, search=True)
+            
+            # TODO: find way to traverse pages in Google Search
+            urls = set()
+            #pages = []
+            for href in LinkExtractor.extract(html):
+                if '/url?q=' in href and 'google.com' not in href:
+                    url_end = href.find('&sa=U')
+                    urls.add(href[7:url_end])
         #for a in soup.find_all('a', aria-label=True, href=True):
             #if '/search?q=' in a['href']:
                 #pages.add(a['href'])
         
-        return urls
+        return sorted(urls)
     
-    def __extract_domain(self, url):
-        # find domain end given URL
-        domain_name_end = 0
-        for i in range(len(url)-1, 0, -1):
-            if url[i] == '.':
-                domain_name_end = i
-                break
-        # find domain start given URL
-        domain_name_start = 0
-        for i in range(domain_name_end-1, 0, -1):
-            if url[i] == "/" or url[i] == ".":
-                domain_name_start = i+1
-                break
-        return url[domain_name_start : domain_name_end]
-    
-    def __extract_websites(self):
-        """Extracts all websites listed on the website from the _url_list.
+    def websites(self):
+        """Extracts the websites listed on the results of the Google Search, one results page at a time.
         
         Pre:
             None
         Post:
-            None
+            once every results page is read, website_list is set and stored in the cache
         Return:
-            
+            generator of the websites, without duplicates, as soon as the results page listing them is read
         """
         
-        url_websites = SortedSet()
+        if self._website_list != None:
+            for website in self._website_list:
+                yield website
+            return
         
+        found = set()
         for url in self._url_list:
-            
-            domain = self.__extract_domain(url)
-            
+            for website in self.expand(url):
+                if website not in found:
+                    found.add(website)
+                    yield website
+        self._website_list = sorted(found)
+        
+        cache = self.__open_cache()
+        if cache != None and len(self._url_list) > 0:
             try:
-                html = requests.get(url, headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.80 Safari/537.36"}).text
-                soup = BeautifulSoup(html, 'lxml')
-            except:
-                print('The HTML from', url, 'could not be extracted.')
-                # if HTML was not extracted, continue to next iteration
+                cache.store(self.search_url, self._query, self._url_list, self._website_list)
+            finally:
+                cache.close()
+    
+    def expand(self, url):
+        """Extracts all websites listed on a results page of the Google Search.
+        
+        Pre:
+            url: URL of the results page, one of url_list
+        Post:
+            a message is printed if the page could not be fetched
+        Return:
+            sorted list of the root URLs of the websites the page links to, other than SNS and the page's own
+        """
+        
+        resolver = get_resolver()
+        url_websites = set()
+        domain = resolver.domain(url)
+        
+        try:
+            with get_metrics().span('expansion', url, url=url):
+                links = LinkExtractor()
+                for chunk in get_client().stream(url):
+                    links.feed(chunk)
+                hrefs = links.close()
+        except:
+            print('The HTML from', url, 'could not be extracted.')
+            return []
+        
+        # appends all urls from the website
+        for href in hrefs:
+            if self.__absolute_pattern.search(href) == None:
+                continue
+            if 'http' not in href or resolver.domain(href) == domain or len(re.findall('(facebook|twitter|instagram|linkedin|youtube|pinterest|tumblr|itunes)', href)) != 0:
                 continue
+            root_link = resolver.origin(href) + '/'
             
-            # appends all urls from the website
-            for link in soup.find_all('a', attrs={'href': re.compile("https?://")}):
-                if domain in link['href'] or 'http' not in link['href'] or len(re.findall('(facebook|twitter|instagram|linkedin|youtube|pinterest|tumblr|itunes)', link['href'])) != 0:
-                    continue
-                parsed_link = urlparse(link['href'])
-                root_link = '{uri.scheme}://{uri.netloc}/'.format(uri=parsed_link)
-                
-                url_websites.add(str(root_link))
+            url_websites.add(str(root_link))
                 
-        return url_websites
+        return sorted(url_websites)
     
 if __name__ == '__main__':
     google = GoogleSearch('top 100 fitness blogs')
\ No newline at end of file
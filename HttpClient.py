@@ -0,0 +1,431 @@
+import time
+import threading
+from ResponseCache import ResponseCache
+from FetchScheduler import FetchScheduler
+from CrawlMetrics import get_metrics
+
+# requests is imported by the first HttpClient, as importing it takes longer than the rest of the scraper
+requests = None
+
+class HttpClient:
+    """
+    The HttpClient module is the single HTTP layer shared by the WebContactScraper and GoogleSearchWebScraper
+    modules. Connections are kept alive in a pool per host, so consecutive pages of the same website reuse
+    the same TCP/TLS connection instead of repeating the handshake. If httpx and h2 are installed, requests
+    can optionally be multiplexed over HTTP/2. Responses of websites are kept in an on-disk ResponseCache
+    and revalidated with conditional GETs, so pages that did not change are not downloaded again. Pages can
+    be streamed in chunks, skipping anything that is not HTML and cutting off pages above a byte budget.
+    Every request waits for its turn in a FetchScheduler, which limits the rate and concurrency per host.
+    The wait, the status codes and the bytes downloaded are recorded in the CrawlMetrics of the run.
+    """
+
+    # User-Agent sent when fetching websites
+    user_agent = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.80 Safari/537.36"
+    # User-Agent sent to Google, which only serves the plain HTML results page to non-browser agents, the
+    # requests default if None
+    search_user_agent = None
+    # content types streamed as HTML, a response without a content type is assumed to be HTML
+    html_content_types = ('text/html', 'application/xhtml+xml')
+    # bytes read at a time when streaming
+    chunk_size = 64 * 1024
+    # times a request answered with 429 or 503 is retried, once the host's pause is over
+    retries = 1
+    # seconds of Retry-After above which a request is not retried
+    max_retry_after = 120
+
+    def __init__(self, user_agent=None, search_user_agent=None, pool_hosts=32, pool_size=16, timeout=30, http2=False,
+                 cache_path='ResponseCache.sqlite3', cache_ttl=12 * 60 * 60, cache_max_bytes=512 * 1024 * 1024,
+                 max_bytes=2 * 1024 * 1024, host_rate=4.0, host_burst=8, host_in_flight=4, max_in_flight=64):
+        """Sets up the connection pools.
+
+        Pre:
+            user_agent: User-Agent sent when fetching websites, class default if None
+            search_user_agent: User-Agent sent when fetching search pages, class default if None
+            pool_hosts: number of hosts whose connections are kept alive
+            pool_size: number of connections kept alive per host
+            timeout: seconds to wait for the server before a fetch fails
+            http2: whether to use HTTP/2 when httpx and h2 are installed
+            cache_path: path of the response cache, responses are not cached if None
+            cache_ttl: seconds a cached response is used without revalidation
+            cache_max_bytes: size of the response cache above which the least recently used responses are evicted
+            max_bytes: bytes of a streamed page after which the rest of the page is cut off
+            host_rate: requests per second each host is allowed on average
+            host_burst: requests a host is allowed at once after being idle
+            host_in_flight: requests in flight per host
+            max_in_flight: requests in flight over all hosts
+        Post:
+            The underlying requests Session, or httpx Client when HTTP/2 is used, is created, the response
+            cache is opened and the fetch scheduler is set up.
+        Return:
+            None
+        """
+
+        if user_agent != None:
+            self.user_agent = user_agent
+        global requests
+        if requests == None:
+            import requests
+        if search_user_agent != None:
+            self.search_user_agent = search_user_agent
+        elif self.search_user_agent == None:
+            self.search_user_agent = requests.utils.default_user_agent()
+        self._timeout = timeout
+        self._max_bytes = max_bytes
+        self._http2 = False
+
+        # httpx is optional, only needed for HTTP/2 and only imported then
+        httpx = None
+        if http2:
+            try:
+                import httpx
+            except ImportError:
+                httpx = None
+            if httpx == None or not self.__h2_installed():
+                print('HTTP/2 requires the httpx and h2 packages. Falling back to HTTP/1.1.')
+            else:
+                self._http2 = True
+
+        if self._http2:
+            limits = httpx.Limits(max_connections=pool_hosts * pool_size, max_keepalive_connections=pool_hosts * pool_size)
+            self._session = httpx.Client(http2=True, limits=limits, timeout=timeout, follow_redirects=True,
+                                         headers={'User-Agent': self.user_agent})
+        else:
+            adapter = requests.adapters.HTTPAdapter(pool_connections=pool_hosts, pool_maxsize=pool_size)
+            self._session = requests.Session()
+            self._session.mount('http://', adapter)
+            self._session.mount('https://', adapter)
+            self._session.headers['User-Agent'] = self.user_agent
+
+        self._scheduler = FetchScheduler(host_rate, host_burst, host_in_flight, max_in_flight)
+        self._cache = None
+        if cache_path != None:
+            self._cache = ResponseCache(cache_path, cache_ttl, cache_max_bytes)
+
+    def __h2_installed(self):
+        try:
+            import h2
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def http2(self):
+        return self._http2
+
+    def __send(self, url, headers, stream):
+        """Sends a GET request once the fetch scheduler allows it, retrying after the pause the host asked for
+        if it answers 429 or 503.
+
+        Pre:
+            url: URL to fetch
+            headers: headers of the request in addition to the session headers, or None
+            stream: whether to leave the body of the response unread
+        Post:
+            the in-flight slot of the host is held until __finish() is called with the response
+        Return:
+            response: requests or httpx response
+        """
+
+        metrics = get_metrics()
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            self._scheduler.acquire(url)
+            metrics.observe('schedule', time.perf_counter() - start)
+            try:
+                if self._http2:
+                    response = self._session.send(self._session.build_request('GET', url, headers=headers), stream=stream)
+                else:
+                    response = self._session.get(url, headers=headers, timeout=self._timeout, stream=stream)
+            except Exception:
+                self._scheduler.release(url)
+                metrics.count('errors', stage='http')
+                raise
+            metrics.count('http_responses', status=response.status_code)
+            if response.status_code not in (429, 503) or attempt >= self.retries:
+                return response
+            retry_after = response.headers.get('Retry-After')
+            if retry_after != None and FetchScheduler.parse_retry_after(retry_after) > self.max_retry_after:
+                return response
+
+            # give the slot back, pausing the host, and retry once the pause is over
+            response.close()
+            self._scheduler.release(url, response.status_code, retry_after)
+            attempt += 1
+
+    def __finish(self, url, response):
+        """Closes a response of __send() and gives its in-flight slot back to the fetch scheduler.
+
+        Pre:
+            url: URL that was fetched
+            response: response returned by __send()
+        Post:
+            the response is closed, and its host is paused if the response asked for it
+        Return:
+            None
+        """
+
+        response.close()
+        self._scheduler.release(url, response.status_code, response.headers.get('Retry-After'))
+
+    def get(self, url, search=False):
+        """Fetches a URL over a pooled connection. Websites are served from the response cache while fresh and
+        revalidated with a conditional GET once stale. Search pages are never cached.
+
+        Pre:
+            url: URL to fetch
+            search: whether the URL is a search page, in which case the search User-Agent is sent
+        Post:
+            the response is stored in the response cache if it can be cached
+        Return:
+            response: requests, httpx or cached response, all of which have text, content, status_code and headers
+        """
+
+        cached = None
+        headers = None
+        if search:
+            headers = {'User-Agent': self.search_user_agent}
+        elif self._cache != None:
+            cached, fresh = self._cache.lookup(url)
+            if cached != None:
+                if fresh:
+                    get_metrics().count('cache_hits', revalidated='false')
+                    return cached
+                headers = self._cache.validators(cached)
+
+        response = self.__send(url, headers, False)
+        self.__finish(url, response)
+        if cached != None and response.status_code == 304:
+            get_metrics().count('cache_hits', revalidated='true')
+            self._cache.refresh(url)
+            return cached
+        get_metrics().count('bytes_downloaded', len(response.content))
+        if not search and self._cache != None:
+            self._cache.store(url, response)
+        return response
+
+    def stream(self, url, search=False):
+        """Streams the HTML of a URL in chunks over a pooled connection. Nothing is read if the response is not
+        HTML, and the page is cut off after max_bytes, so a single page never holds more than max_bytes in
+        memory. Websites go through the response cache like get(); cut off pages are not cached.
+
+        Pre:
+            url: URL to fetch
+            search: whether the URL is a search page, in which case the search User-Agent is sent
+        Post:
+            the response is stored in the response cache if it can be cached and was read completely
+        Return:
+            generator of raw bytes of consecutive parts of the page, empty if the response is not HTML
+        """
+
+        return self.__stream(url, search, self.html_content_types, False)
+
+    def stream_file(self, url, content_types):
+        """Streams a file of a website that is not a page, such as robots.txt or a sitemap, like stream().
+
+        Pre:
+            url: URL to fetch
+            content_types: content types streamed, a response without a content type is streamed as well
+        Post:
+            see stream()
+        Return:
+            generator of raw bytes of consecutive parts of the file, empty if the response is not 200 or not
+            of the given content types
+        """
+
+        return self.__stream(url, False, content_types, True)
+
+    def __stream(self, url, search, content_types, ok_only):
+        """Streams a URL, see stream().
+
+        Pre:
+            url: URL to fetch
+            search: whether the URL is a search page
+            content_types: content types streamed
+            ok_only: whether nothing is streamed unless the response is 200
+        Post:
+            see stream()
+        Return:
+            see stream()
+        """
+
+        cached = None
+        headers = None
+        if search:
+            headers = {'User-Agent': self.search_user_agent}
+        elif self._cache != None:
+            cached, fresh = self._cache.lookup(url)
+            if cached != None:
+                if fresh:
+                    get_metrics().count('cache_hits', revalidated='false')
+                    if self.__has_type(cached.headers, content_types):
+                        yield cached.content[:self._max_bytes]
+                    return
+                headers = self._cache.validators(cached)
+
+        response = self.__send(url, headers, True)
+        if self._http2:
+            chunks = response.iter_bytes(self.chunk_size)
+        else:
+            chunks = response.iter_content(self.chunk_size)
+
+        size = 0
+        try:
+            if cached != None and response.status_code == 304:
+                get_metrics().count('cache_hits', revalidated='true')
+                self._cache.refresh(url)
+                if self.__has_type(cached.headers, content_types):
+                    yield cached.content[:self._max_bytes]
+                return
+            if (ok_only and response.status_code != 200) or not self.__has_type(response.headers, content_types):
+                self.__drain(response, chunks)
+                return
+
+            # the body is kept for the cache only, and is within the byte budget
+            body = []
+            for chunk in chunks:
+                if size + len(chunk) > self._max_bytes:
+                    chunk = chunk[:self._max_bytes - size]
+                    size += len(chunk)
+                    yield chunk
+                    return
+                size += len(chunk)
+                if not search and self._cache != None:
+                    body.append(chunk)
+                yield chunk
+
+            if not search and self._cache != None:
+                self._cache.store(url, response, b''.join(body))
+        finally:
+            get_metrics().count('bytes_downloaded', size)
+            self.__finish(url, response)
+
+    def fetch_html(self, url, search=False):
+        """Fetches the HTML of a URL within the byte budget, see stream().
+
+        Pre:
+            url: URL to fetch
+            search: whether the URL is a search page, in which case the search User-Agent is sent
+        Post:
+            see stream()
+        Return:
+            raw bytes of the page, empty if the response is not HTML
+        """
+
+        return b''.join(self.stream(url, search))
+
+    def __drain(self, response, chunks):
+        """Reads the rest of a response that is not streamed if it is small, e.g. a 404 page, as a response
+        closed before its end also closes its connection instead of giving it back to the pool.
+
+        Pre:
+            response: response returned by __send()
+            chunks: iterator of the body of the response
+        Post:
+            body read if it is at most chunk_size bytes
+        Return:
+            None
+        """
+
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) <= self.chunk_size:
+            for chunk in chunks:
+                pass
+
+    def __has_type(self, headers, content_types):
+        """Checks whether the content type of a response is one of the given content types.
+
+        Pre:
+            headers: headers of the response
+            content_types: content types, e.g. html_content_types
+        Post:
+            None
+        Return:
+            True if the content type is one of the content types or missing, False otherwise
+        """
+
+        content_type = ''
+        for name, value in headers.items():
+            if name.lower() == 'content-type':
+                content_type = value.lower()
+        if content_type == '':
+            return True
+        for expected in content_types:
+            if content_type.startswith(expected):
+                return True
+        return False
+
+    def close(self):
+        """Closes all pooled connections.
+
+        Pre:
+            None
+        Post:
+            the connections and the response cache of the client are closed
+        Return:
+            None
+        """
+
+        self._session.close()
+        if self._cache != None:
+            self._cache.close()
+
+# client shared by all scrapers
+_client = None
+# keyword arguments the shared client was created with
+_settings = {}
+# guards the creation and replacement of the shared client, which scraper threads ask for concurrently
+_client_lock = threading.Lock()
+
+def get_client():
+    """Returns the shared HttpClient, creating it with the default settings on first use.
+
+    Pre:
+        None
+    Post:
+        the shared client is created if it does not exist
+    Return:
+        the shared HttpClient
+    """
+
+    global _client
+    # checked again under the lock, so that threads asking at once share one client instead of leaking others
+    client = _client
+    if client == None:
+        with _client_lock:
+            if _client == None:
+                _client = HttpClient()
+            client = _client
+    return client
+
+def configure(**kwargs):
+    """Replaces the shared HttpClient with one created from the given settings.
+
+    Pre:
+        kwargs: keyword arguments of HttpClient()
+    Post:
+        the previous shared client is closed and replaced
+    Return:
+        the new shared HttpClient
+    """
+
+    global _client, _settings
+    with _client_lock:
+        if _client != None:
+            _client.close()
+        _client = HttpClient(**kwargs)
+        _settings = dict(kwargs)
+        return _client
+
+def settings():
+    """Returns the settings of the shared HttpClient, so that another process can create the same client.
+
+    Pre:
+        None
+    Post:
+        None
+    Return:
+        dictionary of the keyword arguments given to configure(), empty for the default settings
+    """
+
+    return dict(_settings)
@@ -0,0 +1,280 @@
+import sqlite3
+import json
+import time
+import threading
+
+class JobQueue:
+    """
+    The JobQueue module hands out the websites of a scrape to worker processes through a local SQLite file,
+    which processes on other machines can share through a common filesystem. A worker claims a website with
+    a lease that it renews with heartbeats while scraping it, and stores the contacts of the website in the
+    queue when it is done. When a worker dies, its leases run out and the websites are claimed again by the
+    other workers, up to max_attempts times. Results get a sequence number when they are stored, so one
+    process can merge the results of every worker into one output, in the order they were stored. Every job
+    belongs to the run of one scrape, so scrapes sharing the file never see each other's websites.
+    """
+
+    # seconds a claimed website stays with its worker without a heartbeat
+    lease_seconds = 60
+    # claims of a website after which it is given up as failed
+    max_attempts = 3
+
+    def __init__(self, path='JobQueue.sqlite3', run=''):
+        """Opens the queue of a run, creating the file if needed.
+
+        Pre:
+            path: path of the SQLite file of the queue
+            run: id of the run of the scrape whose jobs are added, claimed and read
+        Post:
+            the tables are created if they do not exist
+        Return:
+            None
+        """
+
+        self._run = run
+        self._lock = threading.Lock()
+        # other processes may hold the write lock for a moment, so writes wait for it instead of failing
+        self._db = sqlite3.connect(path, timeout=60, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        # every claim and result is a transaction; in WAL mode this only risks the last ones on a power loss
+        self._db.execute('PRAGMA synchronous=NORMAL')
+        # status of a job is 'pending', 'leased' by a worker until lease_until, 'done' with its result, or 'failed'
+        self._db.execute('''CREATE TABLE IF NOT EXISTS jobs (
+                            run TEXT, url TEXT, position INTEGER, status TEXT, worker TEXT, lease_until REAL,
+                            attempts INTEGER, result TEXT, done_seq INTEGER, updated_at REAL, PRIMARY KEY (run, url))''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_status ON jobs (run, status, position)')
+        self._db.execute('CREATE INDEX IF NOT EXISTS jobs_done_seq ON jobs (run, done_seq)')
+        # whether every job of a run has been added, so idle workers can stop; a run not in the table is over
+        self._db.execute('CREATE TABLE IF NOT EXISTS runs (run TEXT PRIMARY KEY, sealed INTEGER, started_at REAL)')
+
+    def __write(self, statements):
+        """Runs statements in one transaction that holds the write lock from its start.
+
+        Pre:
+            statements: function running the statements on the connection and returning their result
+        Post:
+            statements committed, or rolled back if they raise
+        Return:
+            result of statements
+        """
+
+        with self._lock:
+            self._db.execute('BEGIN IMMEDIATE')
+            try:
+                result = statements(self._db)
+            except BaseException:
+                self._db.execute('ROLLBACK')
+                raise
+            self._db.execute('COMMIT')
+            return result
+
+    @property
+    def run(self):
+        return self._run
+
+    def __read(self, sql, parameters=()):
+        with self._lock:
+            return self._db.execute(sql, parameters).fetchall()
+
+    def add(self, urls):
+        """Adds websites to scrape after the websites already in the queue, unsealing the queue.
+
+        Pre:
+            urls: URLs of the websites
+        Post:
+            websites not in the run yet added as pending
+        Return:
+            number of websites added
+        """
+
+        urls = list(urls)
+        now = time.time()
+        def statements(db):
+            position = db.execute('SELECT COALESCE(MAX(position), 0) FROM jobs WHERE run = ?', (self._run,)).fetchone()[0]
+            before = db.total_changes
+            db.executemany('INSERT OR IGNORE INTO jobs VALUES (?, ?, ?, ?, NULL, NULL, 0, NULL, NULL, ?)',
+                           [(self._run, url, position + i + 1, 'pending', now) for i, url in enumerate(urls)])
+            added = db.total_changes - before
+            db.execute('INSERT INTO runs VALUES (?, 0, ?) ON CONFLICT (run) DO UPDATE SET sealed = 0', (self._run, now))
+            return added
+        return self.__write(statements)
+
+    def seal(self):
+        """Marks that every website of the run has been added, so workers stop once the run is done."""
+
+        self.__write(lambda db: db.execute('UPDATE runs SET sealed = 1 WHERE run = ?', (self._run,)))
+
+    @property
+    def sealed(self):
+        rows = self.__read('SELECT sealed FROM runs WHERE run = ?', (self._run,))
+        return len(rows) == 0 or rows[0][0] == 1
+
+    def claim(self, worker):
+        """Claims the first website of the run that is pending or whose lease ran out.
+
+        Pre:
+            worker: name of the worker claiming the website, unique over all machines
+        Post:
+            website leased to the worker for lease_seconds, websites whose lease ran out for the last time failed
+        Return:
+            URL of the claimed website, or None if no website can be claimed now
+        """
+
+        now = time.time()
+        def statements(db):
+            db.execute("UPDATE jobs SET status = 'failed', worker = NULL, updated_at = ? WHERE run = ? AND status = 'leased' AND lease_until < ? AND attempts >= ?",
+                       (now, self._run, now, self.max_attempts))
+            row = db.execute('''SELECT url FROM jobs WHERE run = ? AND (status = 'pending' OR (status = 'leased' AND lease_until < ?))
+                                ORDER BY status = 'leased', position LIMIT 1''', (self._run, now)).fetchone()
+            if row == None:
+                return None
+            db.execute("UPDATE jobs SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? WHERE run = ? AND url = ?",
+                       (worker, now + self.lease_seconds, now, self._run, row[0]))
+            return row[0]
+        return self.__write(statements)
+
+    def heartbeat(self, worker, urls):
+        """Renews the leases of the websites a worker is scraping.
+
+        Pre:
+            worker: name of the worker
+            urls: URLs of the websites the worker is scraping
+        Post:
+            leases the worker still holds renewed for lease_seconds
+        Return:
+            None
+        """
+
+        now = time.time()
+        self.__write(lambda db: db.executemany("UPDATE jobs SET lease_until = ?, updated_at = ? WHERE run = ? AND url = ? AND worker = ? AND status = 'leased'",
+                                               [(now + self.lease_seconds, now, self._run, url, worker) for url in urls]))
+
+    def complete(self, url, worker, result):
+        """Stores the result of a website. The first result stored for a website is kept.
+
+        Pre:
+            url: URL of the website
+            worker: name of the worker that scraped it
+            result: JSON-serializable result of the website
+        Post:
+            website done, with the next sequence number of the results of the run
+        Return:
+            None
+        """
+
+        now = time.time()
+        def statements(db):
+            sequence = db.execute('SELECT COALESCE(MAX(done_seq), 0) + 1 FROM jobs WHERE run = ?', (self._run,)).fetchone()[0]
+            db.execute("UPDATE jobs SET status = 'done', worker = ?, result = ?, done_seq = ?, updated_at = ? WHERE run = ? AND url = ? AND status != 'done'",
+                       (worker, json.dumps(result), sequence, now, self._run, url))
+        self.__write(statements)
+
+    def release(self, url, worker):
+        """Gives back a website a worker could not scrape, so that another worker tries it again.
+
+        Pre:
+            url: URL of the website
+            worker: name of the worker holding its lease
+        Post:
+            website pending again, or failed if it was claimed max_attempts times
+        Return:
+            None
+        """
+
+        now = time.time()
+        self.__write(lambda db: db.execute('''UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                                              worker = NULL, lease_until = NULL, updated_at = ? WHERE run = ? AND url = ? AND worker = ? AND status = 'leased' ''',
+                                           (self.max_attempts, now, self._run, url, worker)))
+
+    def results(self, after=0):
+        """Returns the results stored after a sequence number.
+
+        Pre:
+            after: sequence number of the last result already read, 0 for all results
+        Post:
+            None
+        Return:
+            list of (sequence number, URL, result) of the results, in the order they were stored
+        """
+
+        rows = self.__read("SELECT done_seq, url, result FROM jobs WHERE run = ? AND done_seq > ? ORDER BY done_seq", (self._run, after))
+        return [(sequence, url, json.loads(result)) for sequence, url, result in rows]
+
+    def counts(self):
+        """Returns the number of websites of the run of each status."""
+
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for status, count in self.__read('SELECT status, COUNT(*) FROM jobs WHERE run = ? GROUP BY status', (self._run,)):
+            counts[status] = count
+        return counts
+
+    def failed(self):
+        """Returns the URLs of the websites of the run given up as failed."""
+
+        return [row[0] for row in self.__read("SELECT url FROM jobs WHERE run = ? AND status = 'failed' ORDER BY position", (self._run,))]
+
+    def unfinished(self):
+        """Returns the number of websites of the run pending or leased, which may still get a result."""
+
+        return self.__read("SELECT COUNT(*) FROM jobs WHERE run = ? AND status IN ('pending', 'leased')", (self._run,))[0][0]
+
+    def clear(self):
+        """Forgets every website of the run, which is then sealed so its idle workers stop."""
+
+        def statements(db):
+            db.execute('DELETE FROM jobs WHERE run = ?', (self._run,))
+            db.execute('DELETE FROM runs WHERE run = ?', (self._run,))
+        self.__write(statements)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+if __name__ == '__main__':
+    import os
+    import sys
+    import tempfile
+    import subprocess
+
+    if len(sys.argv) == 4:
+        # child process claiming and completing jobs until the queue is empty
+        queue = JobQueue(sys.argv[1])
+        queue.lease_seconds = float(sys.argv[2])
+        worker = sys.argv[3]
+        while True:
+            url = queue.claim(worker)
+            if url == None:
+                break
+            if worker == 'dying':
+                # a worker that dies holding its lease
+                os._exit(1)
+            queue.complete(url, worker, {'url': url})
+        sys.exit(0)
+
+    print('JobQueue across processes')
+    print('-------------------------')
+    jobs = 5000
+    for processes in [1, 4]:
+        path = os.path.join(tempfile.mkdtemp(), 'JobQueue.sqlite3')
+        queue = JobQueue(path)
+        queue.add('https://site{}.com/'.format(i) for i in range(jobs))
+        queue.seal()
+        start = time.perf_counter()
+        children = [subprocess.Popen([sys.executable, __file__, path, '60', 'worker{}'.format(i)]) for i in range(processes)]
+        for child in children:
+            child.wait()
+        secs = time.perf_counter() - start
+        results = queue.results()
+        print('{} processes: {:6.0f} jobs/s claimed and completed, {} results for {} jobs, {} distinct'.format(
+              processes, jobs / secs, len(results), jobs, len(set(url for sequence, url, result in results))))
+        queue.close()
+
+    # a worker dies with a lease, which another worker claims again once it runs out
+    path = os.path.join(tempfile.mkdtemp(), 'JobQueue.sqlite3')
+    queue = JobQueue(path)
+    queue.add(['https://site{}.com/'.format(i) for i in range(10)])
+    subprocess.call([sys.executable, __file__, path, '0.5', 'dying'])
+    print('After a worker died: {}'.format(queue.counts()))
+    time.sleep(0.5)
+    subprocess.call([sys.executable, __file__, path, '0.5', 'worker'])
+    print('After its lease ran out and another worker ran: {}'.format(queue.counts()))
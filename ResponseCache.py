@@ -0,0 +1,207 @@
+import sqlite3
+import json
+import time
+import threading
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+class CachedResponse:
+    """
+    The CachedResponse module is a response read from the ResponseCache. It has the text, content,
+    status_code, headers and url of the requests and httpx responses it stands in for.
+    """
+
+    def __init__(self, url, status_code, headers, content, encoding):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self.encoding = encoding
+        self.from_cache = True
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding or 'utf-8', errors='replace')
+
+class ResponseCache:
+    """
+    The ResponseCache module stores HTTP responses on disk so that re-running the same keyphrases or
+    websites does not download the same pages again. Responses are keyed by canonical URL. A response
+    younger than the TTL is served without any request, and an older response is revalidated with a
+    conditional GET using its ETag or Last-Modified header, so an unchanged page costs a 304. Once the
+    cache grows past its size limit, the least recently used responses are evicted.
+    """
+
+    def __init__(self, path='ResponseCache.sqlite3', ttl=12 * 60 * 60, max_bytes=512 * 1024 * 1024):
+        """Opens the cache, creating the file if needed.
+
+        Pre:
+            path: path of the SQLite file of the cache
+            ttl: seconds a response is served without revalidation
+            max_bytes: total size of the stored bodies above which responses are evicted
+        Post:
+            the cache table is created if it does not exist
+        Return:
+            None
+        """
+
+        self._ttl = ttl
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS responses (
+                            key TEXT PRIMARY KEY, url TEXT, status INTEGER, headers TEXT, body BLOB,
+                            encoding TEXT, etag TEXT, last_modified TEXT, stored_at REAL, accessed_at REAL,
+                            size INTEGER)''')
+        self._db.execute('CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)')
+        self._size = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    @staticmethod
+    def canonical_url(url):
+        """Canonicalizes a URL so that equivalent spellings share one cache entry.
+
+        Pre:
+            url: URL of the request
+        Post:
+            None
+        Return:
+            the URL with lowercase scheme and host, no default port, no fragment and sorted query parameters
+        """
+
+        parsed = urlparse(url.strip())
+        scheme = parsed.scheme.lower()
+        netloc = parsed.netloc.lower()
+        if (scheme == 'http' and netloc.endswith(':80')) or (scheme == 'https' and netloc.endswith(':443')):
+            netloc = netloc[:netloc.rfind(':')]
+        path = parsed.path
+        if path == '':
+            path = '/'
+        query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+        return urlunparse((scheme, netloc, path, parsed.params, query, ''))
+
+    def lookup(self, url):
+        """Looks up the stored response of a URL.
+
+        Pre:
+            url: URL of the request
+        Post:
+            the access time of the response is updated for the LRU eviction
+        Return:
+            response: CachedResponse object, or None if the URL is not cached
+            fresh: whether the response is younger than the TTL and can be used without revalidation
+        """
+
+        key = self.canonical_url(url)
+        with self._lock:
+            row = self._db.execute('SELECT url, status, headers, body, encoding, stored_at FROM responses WHERE key = ?',
+                                   (key,)).fetchone()
+            if row == None:
+                return None, False
+            self._db.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (time.time(), key))
+        response = CachedResponse(row[0], row[1], json.loads(row[2]), row[3], row[4])
+        return response, time.time() - row[5] < self._ttl
+
+    def validators(self, response):
+        """Returns the headers of a conditional GET revalidating a stored response.
+
+        Pre:
+            response: CachedResponse object
+        Post:
+            None
+        Return:
+            headers: If-None-Match and/or If-Modified-Since headers, empty if the response has no validators
+        """
+
+        headers = {}
+        for name, value in response.headers.items():
+            if name.lower() == 'etag':
+                headers['If-None-Match'] = value
+            elif name.lower() == 'last-modified':
+                headers['If-Modified-Since'] = value
+        return headers
+
+    def refresh(self, url):
+        """Marks a stored response as fresh again after the server answered 304 Not Modified.
+
+        Pre:
+            url: URL of the request
+        Post:
+            the storage time of the response is reset
+        Return:
+            None
+        """
+
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE responses SET stored_at = ?, accessed_at = ? WHERE key = ?',
+                             (now, now, self.canonical_url(url)))
+
+    def store(self, url, response, body=None):
+        """Stores a response, evicting the least recently used responses if the cache is full.
+
+        Pre:
+            url: URL of the request
+            response: requests or httpx response
+            body: body of the response if it was streamed, response.content if None
+        Post:
+            successful responses that do not forbid storage are stored
+        Return:
+            None
+        """
+
+        if response.status_code != 200:
+            return
+        headers = dict(response.headers)
+        cache_control = ''
+        for name, value in headers.items():
+            if name.lower() == 'cache-control':
+                cache_control = value.lower()
+        if 'no-store' in cache_control:
+            return
+
+        etag = None
+        last_modified = None
+        for name, value in headers.items():
+            if name.lower() == 'etag':
+                etag = value
+            elif name.lower() == 'last-modified':
+                last_modified = value
+
+        if body == None:
+            body = response.content
+        now = time.time()
+        key = self.canonical_url(url)
+        with self._lock:
+            previous = self._db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if previous != None:
+                self._size -= previous[0]
+            self._db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                             (key, str(response.url), response.status_code, json.dumps(headers), body,
+                              response.encoding, etag, last_modified, now, now, len(body)))
+            self._size += len(body)
+            self.__evict()
+
+    def __evict(self):
+        """Deletes the least recently used responses until the cache is within its size limit.
+
+        Pre:
+            the lock is held
+        Post:
+            responses deleted until the total size is at most max_bytes
+        Return:
+            None
+        """
+
+        while self._size > self._max_bytes:
+            rows = self._db.execute('SELECT key, size FROM responses ORDER BY accessed_at LIMIT 100').fetchall()
+            if len(rows) == 0:
+                self._size = 0
+                break
+            for key, size in rows:
+                self._db.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._size -= size
+                if self._size <= self._max_bytes:
+                    break
+
+    def close(self):
+        self._db.close()
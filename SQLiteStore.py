@@ -0,0 +1,154 @@
+import sqlite3
+import time
+from ContactStore import ContactStore
+from SheetMirror import SheetMirror
+
+class SQLiteStore(ContactStore):
+    """
+    The SQLiteStore module keeps the inputs and contacts of the scrape operations in a local SQLite file, for
+    runs too large for Google Sheets. Contacts are indexed by normalized URL, so checking whether a website
+    was already scraped is a single index lookup without loading the table, and buffered rows are written in
+    one transaction per flush.
+    """
+
+    def __init__(self, path='Contacts.sqlite3'):
+        """Opens the store, creating the file if needed.
+
+        Pre:
+            path: path of the SQLite file of the store
+        Post:
+            the tables are created if they do not exist, and the status of every input is set to 'to scrape'
+        Return:
+            None
+        """
+
+        # websites may be looked up from the thread reading them, under the lock of the WebContactSheet
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS contacts (
+                            key TEXT PRIMARY KEY, url TEXT, emails TEXT, facebooks TEXT, instagrams TEXT,
+                            twitters TEXT, linkedins TEXT, updated_at REAL)''')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS inputs (
+                            operation TEXT, position INTEGER, value TEXT, status TEXT,
+                            PRIMARY KEY (operation, position))''')
+        self._db.execute("UPDATE inputs SET status = 'to scrape'")
+        self._size = self._db.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+        # normalized URL -> buffered row
+        self._pending = {}
+        # normalized URLs of buffered rows of websites that are not stored yet
+        self._new = set()
+
+    def add_inputs(self, operation, values):
+        """Adds inputs to an operation, after its existing inputs.
+
+        Pre:
+            operation: one of operations
+            values: keyphrases of the search operations, or websites of 'web_scrape'
+        Post:
+            inputs stored with the status 'to scrape'
+        Return:
+            None
+        """
+
+        position = self._db.execute('SELECT COALESCE(MAX(position), 0) FROM inputs WHERE operation = ?', (operation,)).fetchone()[0]
+        self._db.execute('BEGIN')
+        for value in values:
+            position += 1
+            self._db.execute('INSERT INTO inputs VALUES (?, ?, ?, ?)', (operation, position, value, 'to scrape'))
+        self._db.execute('COMMIT')
+
+    def inputs(self, operation):
+        return [row[0] for row in self._db.execute('SELECT value FROM inputs WHERE operation = ? ORDER BY position', (operation,))]
+
+    def set_statuses(self, operation, status):
+        self._db.execute('UPDATE inputs SET status = ? WHERE operation = ?', (status, operation))
+
+    def __stored(self, key):
+        return self._db.execute('SELECT 1 FROM contacts WHERE key = ?', (key,)).fetchone() != None
+
+    def __contains__(self, url):
+        key = SheetMirror.normalize_url(url)
+        return key in self._pending or self.__stored(key)
+
+    def __len__(self):
+        return self._size + len(self._new)
+
+    @property
+    def num_pending(self):
+        return len(self._pending)
+
+    def upsert(self, row):
+        key = SheetMirror.normalize_url(row[0])
+        if key not in self._pending and not self.__stored(key):
+            self._new.add(key)
+        row = list(row) + [''] * (len(self.header) - len(row))
+        self._pending[key] = row
+
+    def flush(self):
+        """Writes the buffered rows in a single transaction.
+
+        Pre:
+            None
+        Post:
+            buffered rows stored, replacing the stored rows of the same websites
+        Return:
+            None
+        """
+
+        if len(self._pending) == 0:
+            return
+        now = time.time()
+        self._db.execute('BEGIN')
+        # rows are updated in place so that a website keeps its position
+        self._db.executemany('''INSERT INTO contacts VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (key) DO UPDATE SET
+                                url = excluded.url, emails = excluded.emails, facebooks = excluded.facebooks,
+                                instagrams = excluded.instagrams, twitters = excluded.twitters,
+                                linkedins = excluded.linkedins, updated_at = excluded.updated_at''',
+                             [[key] + row[:6] + [now] for key, row in self._pending.items()])
+        self._db.execute('COMMIT')
+        self._size += len(self._new)
+        self._pending = {}
+        self._new = set()
+
+    def rows(self):
+        """Returns the stored rows of contacts.
+
+        Pre:
+            None
+        Post:
+            None
+        Return:
+            generator of the stored rows, in the order the websites were first stored
+        """
+
+        return (list(row) for row in self._db.execute('SELECT url, emails, facebooks, instagrams, twitters, linkedins FROM contacts ORDER BY rowid'))
+
+    def close(self):
+        self._db.close()
+
+if __name__ == '__main__':
+    import os
+    import tempfile
+
+    print('SQLiteStore benchmark')
+    print('---------------------')
+    for websites in [1000, 100000]:
+        path = os.path.join(tempfile.mkdtemp(), 'Contacts.sqlite3')
+        store = SQLiteStore(path)
+        store.add_inputs('web_scrape', ['https://site{}.com'.format(i) for i in range(websites)])
+
+        start = time.perf_counter()
+        for website in store.inputs('web_scrape'):
+            store.upsert([website, 'info@' + website[8:], '', '', '', ''])
+            if store.num_pending >= 200:
+                store.flush()
+        store.flush()
+        write_secs = time.perf_counter() - start
+
+        start = time.perf_counter()
+        found = sum(1 for i in range(websites) if 'http://www.site{}.com/'.format(i) in store)
+        lookup_secs = time.perf_counter() - start
+
+        print('{:>6} websites: {:8.0f} rows/s written, {:8.0f} lookups/s, {} of {} found, {} stored'.format(
+              websites, websites / write_secs, websites / lookup_secs, found, websites, len(store)))
+        store.close()
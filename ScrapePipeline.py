@@ -0,0 +1,226 @@
+import queue
+import threading
+from GoogleSearchWebScraper import GoogleSearch
+
+class ScrapePipeline:
+    """
+    The ScrapePipeline module finds the websites of the search operations as a pipeline of stages running at
+    the same time: the search stage searches the keyphrases one after the other, the expansion stage reads the
+    results pages of each search for the websites they list, and the websites are handed to the crawl as soon
+    as they are found. The stages are joined by bounded queues, so a stage that gets ahead waits for the next
+    one, and the crawl and its rows start with the first website found instead of after the last search.
+    """
+
+    # searches or websites waiting between two stages
+    queue_size = 64
+    # threads expanding the results pages of different searches at the same time
+    expansion_workers = 2
+    # seconds between two checks of whether the pipeline was stopped by a stage waiting on a full queue
+    stop_check_seconds = 0.5
+
+    def __init__(self, keyphrases, expand=True, journal=None, operation=None):
+        """Sets up the pipeline.
+
+        Pre:
+            keyphrases: iterable of the keyphrases to search
+            expand: whether the websites are the websites listed on the results pages, or the results pages
+            journal: CrawlJournal recording the websites found for each keyphrase, not recorded if None
+            operation: name of the scrape operation the journal records the searches of
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._keyphrases = keyphrases
+        self._expand = expand
+        self._journal = journal
+        self._operation = operation
+
+    def __put(self, stage_queue, item, stop):
+        """Puts an item in a queue, waiting while it is full.
+
+        Pre:
+            stage_queue: queue between two stages
+            item: item put
+            stop: event set when the pipeline is stopped
+        Post:
+            item put unless the pipeline was stopped
+        Return:
+            True if the item was put, False if the pipeline was stopped
+        """
+
+        while not stop.is_set():
+            try:
+                stage_queue.put(item, timeout=self.stop_check_seconds)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def __get(self, stage_queue, stop):
+        """Gets an item from a queue, waiting while it is empty.
+
+        Pre:
+            stage_queue: queue between two stages
+            stop: event set when the pipeline is stopped
+        Post:
+            item taken unless the pipeline was stopped
+        Return:
+            the item, or None if the pipeline was stopped
+        """
+
+        while not stop.is_set():
+            try:
+                return stage_queue.get(timeout=self.stop_check_seconds)
+            except queue.Empty:
+                pass
+        return None
+
+    def __search(self, searches, stop):
+        """Search stage: searches the keyphrases, or reads the websites the journal recorded for them.
+
+        Pre:
+            searches: queue of (keyphrase, GoogleSearch or None, recorded websites or None) the searches are put in
+            stop: event set when the pipeline is stopped
+        Post:
+            one end marker per expansion thread put after the last search, or the error of the stage
+        Return:
+            None
+        """
+
+        try:
+            for keyphrase in self._keyphrases:
+                if stop.is_set():
+                    return
+                # keyphrases searched before an interruption are not searched again
+                websites = None
+                if self._journal != None:
+                    websites = self._journal.search_result(self._operation, keyphrase)
+                search = None
+                if websites == None:
+                    search = GoogleSearch(keyphrase)
+                if not self.__put(searches, (keyphrase, search, websites), stop):
+                    return
+        except BaseException as error:
+            self.__put(searches, error, stop)
+        for i in range(self.expansion_workers):
+            self.__put(searches, None, stop)
+
+    def __expansion(self, searches, websites, stop):
+        """Expansion stage: finds the websites of each search, one results page at a time.
+
+        Pre:
+            searches: queue of the searches, see __search()
+            websites: queue the websites found are put in
+            stop: event set when the pipeline is stopped
+        Post:
+            websites of every search recorded in the journal, an end marker put after the last search, and the
+            error of a stage put if one failed
+        Return:
+            None
+        """
+
+        try:
+            while not stop.is_set():
+                # the search stage may stop without putting an end marker, so the wait is bounded by stop
+                item = self.__get(searches, stop)
+                if item == None or isinstance(item, BaseException):
+                    self.__put(websites, item, stop)
+                    return
+                keyphrase, search, recorded = item
+                if recorded == None:
+                    if self._expand:
+                        found = search.websites()
+                    else:
+                        found = search.url_list
+                    recorded = []
+                    for website in found:
+                        recorded.append(website)
+                        if not self.__put(websites, website, stop):
+                            return
+                    if self._journal != None:
+                        self._journal.record_search(self._operation, keyphrase, recorded)
+                else:
+                    for website in recorded:
+                        if not self.__put(websites, website, stop):
+                            return
+        except BaseException as error:
+            self.__put(websites, error, stop)
+
+    def websites(self):
+        """Runs the pipeline.
+
+        Pre:
+            None
+        Post:
+            keyphrases searched in the background, and their websites recorded in the journal
+        Return:
+            generator of the websites, without duplicates, as soon as they are found; closing it stops the
+            stages
+        """
+
+        searches = queue.Queue(self.queue_size)
+        websites = queue.Queue(self.queue_size)
+        stop = threading.Event()
+        stages = [threading.Thread(target=self.__search, args=(searches, stop), daemon=True)]
+        for i in range(self.expansion_workers):
+            stages.append(threading.Thread(target=self.__expansion, args=(searches, websites, stop), daemon=True))
+        for stage in stages:
+            stage.start()
+
+        # websites of different keyphrases are often the same
+        seen = set()
+        ended = 0
+        try:
+            while ended < self.expansion_workers:
+                website = websites.get()
+                if website == None:
+                    ended += 1
+                elif isinstance(website, BaseException):
+                    raise website
+                elif website not in seen:
+                    seen.add(website)
+                    yield website
+        finally:
+            stop.set()
+
+if __name__ == '__main__':
+    import os
+    import time
+    import contextlib
+    import HttpClient
+    from FixtureServer import FixtureServer
+    from WebContactScraper import WebsiteContacts
+
+    print('Phased operation vs. pipeline')
+    print('-----------------------------')
+    fixture = FixtureServer(sites=40, delay=0.05).start()
+    FixtureServer.install_resolver()
+    HttpClient.configure(cache_path=None, host_rate=1000, host_burst=1000)
+    GoogleSearch.search_url = fixture.search_url
+    GoogleSearch.cache_path = None
+    # searches are spaced out as they are against Google, at a shorter interval
+    GoogleSearch.search_interval = 0.5
+    GoogleSearch.search_time_path = 'PipelineSearchTime.txt'
+    keyphrases = fixture.keyphrases(6)
+
+    def phased():
+        websites = set()
+        for keyphrase in keyphrases:
+            websites.update(GoogleSearch(keyphrase).website_list)
+        return sorted(websites)
+
+    for name, websites in [('phased', phased), ('pipeline', lambda: ScrapePipeline(keyphrases).websites())]:
+        start = time.perf_counter()
+        first = None
+        count = 0
+        with contextlib.redirect_stdout(None):
+            for contacts in WebsiteContacts.scrape_many(websites(), workers=8):
+                if first == None:
+                    first = time.perf_counter() - start
+                count += 1
+        print('{:>8}: first row after {:5.2f} s, {} rows after {:5.2f} s'.format(name, first, count, time.perf_counter() - start))
+        time.sleep(GoogleSearch.search_interval)
+    fixture.stop()
+    os.remove(GoogleSearch.search_time_path)
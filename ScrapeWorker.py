@@ -0,0 +1,271 @@
+import os
+import sys
+import json
+import uuid
+import time
+import socket
+import argparse
+import threading
+import subprocess
+import HttpClient
+from JobQueue import JobQueue
+from ContactRecord import ContactRecord
+from WebContactScraper import WebsiteContacts
+
+class ScrapeWorker:
+    """
+    The ScrapeWorker module scrapes websites in several processes, so that parsing and extracting contacts
+    are not limited to one core by the GIL. The websites go through a JobQueue: worker processes, started
+    locally or on other machines sharing the file of the queue, claim websites from it, scrape them with
+    their own threads, and store their contacts in it. The process that started the scrape merges the
+    results of every worker into one stream, and starts a new worker whenever one dies.
+    """
+
+    # seconds between two heartbeats renewing the leases of the websites being scraped
+    heartbeat_seconds = 10
+    # seconds between two looks at the queue while other workers hold the remaining websites
+    poll_seconds = 0.5
+    # times the worker processes of a scrape are started again after dying, per process
+    max_restarts = 3
+    # SQLite file of the JobQueue of scrape_many(), on a filesystem shared with the workers of other machines
+    queue_path = 'JobQueue.sqlite3'
+    # id of the run of scrape_many() in the queue, given to resume a scrape stopped early; a new run, forgotten
+    # when the scrape stops, if None
+    run_id = None
+    # class attributes of WebsiteContacts given to the worker processes, so that they crawl like this process
+    website_settings = ('max_concurrency', 'max_pages', 'max_depth', 'contact_yield', 'use_sitemaps')
+
+    def __init__(self, queue, workers=8, parse_processes=0, max_concurrency=None):
+        """Sets up a worker.
+
+        Pre:
+            queue: JobQueue the websites are claimed from
+            workers: number of websites scraped at the same time
+            parse_processes: number of processes parsing fetched pages, parsed by the scraping threads if 0
+            max_concurrency: number of pages fetched at the same time per website, WebsiteContacts default if None
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._queue = queue
+        self._workers = workers
+        self._parse_processes = parse_processes
+        self._max_concurrency = max_concurrency
+        # unique over all machines sharing the queue
+        self._name = '{}-{}'.format(socket.gethostname(), os.getpid())
+        self._lock = threading.Lock()
+        # URLs of the websites leased to the worker and not done yet
+        self._held = set()
+
+    def __claim(self):
+        """Claims websites until none can be claimed now.
+
+        Pre:
+            None
+        Post:
+            claimed websites held by the worker
+        Return:
+            generator of the URLs of the claimed websites
+        """
+
+        while True:
+            url = self._queue.claim(self._name)
+            if url == None:
+                return
+            with self._lock:
+                self._held.add(url)
+            yield url
+
+    def __heartbeat(self, stop):
+        while not stop.wait(self.heartbeat_seconds):
+            with self._lock:
+                held = list(self._held)
+            try:
+                self._queue.heartbeat(self._name, held)
+            except Exception:
+                pass
+
+    def run(self):
+        """Scrapes websites of the queue until the queue is sealed and no website may still get a result.
+
+        Pre:
+            None
+        Post:
+            contacts of the scraped websites stored in the queue, websites that could not be scraped given
+            back to the queue
+        Return:
+            number of websites scraped
+        """
+
+        count = 0
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self.__heartbeat, args=(stop,), daemon=True)
+        heartbeat.start()
+        try:
+            while True:
+                for contacts in WebsiteContacts.scrape_many(self.__claim(), self._workers, self._parse_processes, self._max_concurrency):
+                    self._queue.complete(contacts.url, self._name, contacts.record.to_dict())
+                    with self._lock:
+                        self._held.discard(contacts.url)
+                    count += 1
+                # websites still held could not be scraped
+                with self._lock:
+                    failed, self._held = self._held, set()
+                for url in failed:
+                    self._queue.release(url, self._name)
+                if self._queue.sealed and self._queue.unfinished() == 0:
+                    return count
+                # the other workers hold the remaining websites, which come back if one of them dies
+                time.sleep(self.poll_seconds)
+        finally:
+            stop.set()
+            with self._lock:
+                held, self._held = self._held, set()
+            for url in held:
+                self._queue.release(url, self._name)
+
+    @classmethod
+    def settings(cls, workers=8, parse_processes=0, max_concurrency=None):
+        """Returns the settings a worker process needs to scrape like this process.
+
+        Pre:
+            see ScrapeWorker()
+        Post:
+            None
+        Return:
+            JSON-serializable dictionary of the settings of the workers, the shared HttpClient and WebsiteContacts
+        """
+
+        return {'workers': workers, 'parse_processes': parse_processes, 'max_concurrency': max_concurrency,
+                'client': HttpClient.settings(),
+                'website': {name: getattr(WebsiteContacts, name) for name in cls.website_settings}}
+
+    @classmethod
+    def scrape(cls, urls, processes, queue_path=None, settings=None, run=None):
+        """Scrapes websites in worker processes, adding them to the queue as they are read.
+
+        Pre:
+            cls: ScrapeWorker class
+            urls: iterable of the root URLs of the websites
+            processes: number of worker processes started on this machine, none if 0, in which case workers
+                       must be started on other machines with 'python3 ScrapeWorker.py queue_path --run run'
+            queue_path: path of the SQLite file of the JobQueue, class default if None
+            settings: settings of the workers, see settings(), the settings of this process if None
+            run: id of the run of the scrape in the queue, class default if None
+        Post:
+            worker processes started, started again when they die, and stopped when the scrape ends; the
+            websites of a new run are forgotten when the scrape stops, while the results of a given run stopped
+            early are kept in the queue and returned first by the next scrape of the same run
+        Return:
+            generator of ContactRecord objects of the websites, in the order the workers finish them
+        """
+
+        if queue_path == None:
+            queue_path = cls.queue_path
+        if settings == None:
+            settings = cls.settings()
+        if run == None:
+            run = cls.run_id
+        # only a run given by the user is resumed, other scrapes sharing the queue never see its websites
+        resume = run != None
+        if run == None:
+            run = uuid.uuid4().hex
+        queue = JobQueue(queue_path, run)
+        if processes == 0:
+            print('Start the workers with: python3 ScrapeWorker.py', queue_path, '--run', run, file=sys.stderr)
+        # unsealed before any worker starts, so that workers wait for the websites instead of stopping
+        queue.add([])
+        # the websites are read in a thread, as reading them may search Google and wait
+        feeder_errors = []
+        def feed():
+            try:
+                # added one at a time, so that the websites of a search are scraped while the next search waits
+                for url in urls:
+                    queue.add([url])
+                queue.seal()
+            except BaseException as error:
+                feeder_errors.append(error)
+        feeder = threading.Thread(target=feed, daemon=True)
+        feeder.start()
+
+        command = [sys.executable, os.path.abspath(__file__), queue_path, '--run', run, '--settings', json.dumps(settings)]
+        def start():
+            return subprocess.Popen(command, stdout=sys.stderr)
+        children = [start() for i in range(processes)]
+        restarts = 0
+        last = 0
+        finished = False
+        try:
+            while True:
+                done = not feeder.is_alive() and queue.sealed and queue.unfinished() == 0
+                for sequence, url, result in queue.results(last):
+                    last = sequence
+                    yield ContactRecord(result['url'], result['emails'], result['facebooks'], result['instagrams'],
+                                        result['twitters'], result['linkedins']).freeze()
+                if len(feeder_errors) > 0:
+                    raise feeder_errors[0]
+                if done:
+                    break
+                for i in range(len(children)):
+                    # workers only exit by themselves once the queue is done
+                    if children[i].poll() not in (None, 0):
+                        if restarts >= cls.max_restarts * processes:
+                            raise RuntimeError('The worker processes keep dying.')
+                        restarts += 1
+                        children[i] = start()
+                time.sleep(cls.poll_seconds)
+            finished = True
+        finally:
+            for child in children:
+                if child.poll() == None:
+                    child.terminate()
+            for child in children:
+                child.wait()
+            for url in queue.failed():
+                print('The website', url, 'could not be scraped.')
+            if finished or not resume:
+                queue.clear()
+            queue.close()
+
+def main(argv=None):
+    """Runs a worker process until the queue is done.
+
+    Pre:
+        argv: arguments without the program name, sys.argv[1:] if None
+    Post:
+        websites of the queue scraped
+    Return:
+        exit status of the program
+    """
+
+    parser = argparse.ArgumentParser(description='Scrape websites of a shared job queue, e.g. one on a shared filesystem.')
+    parser.add_argument('queue', nargs='?', default='JobQueue.sqlite3', help='path of the SQLite file of the queue (default: %(default)s)')
+    parser.add_argument('--run', default='', help='id of the run whose websites are scraped, printed by the process that started the scrape')
+    parser.add_argument('--workers', type=int, default=8, help='websites scraped at the same time (default: 8)')
+    parser.add_argument('--parse-processes', type=int, default=0, help='processes parsing fetched pages (default: 0, parsed by the scraping threads)')
+    parser.add_argument('--settings', help='JSON settings of the worker given by the process that started the scrape')
+    args = parser.parse_args(argv)
+
+    settings = {'workers': args.workers, 'parse_processes': args.parse_processes}
+    if args.settings != None:
+        settings = json.loads(args.settings)
+    if len(settings.get('client', {})) > 0:
+        HttpClient.configure(**settings['client'])
+    for name, value in settings.get('website', {}).items():
+        if name in ScrapeWorker.website_settings:
+            setattr(WebsiteContacts, name, value)
+
+    queue = JobQueue(args.queue, args.run)
+    worker = ScrapeWorker(queue, settings['workers'], settings.get('parse_processes', 0), settings.get('max_concurrency'))
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        queue.close()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
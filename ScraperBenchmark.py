@@ -0,0 +1,376 @@
+import sys
+import os
+import json
+import time
+import argparse
+import contextlib
+import subprocess
+import tempfile
+from FixtureServer import FixtureServer
+
+class ScraperBenchmark:
+    """
+    The ScraperBenchmark module measures how fast and how accurately the scrapers run against the generated
+    websites of a FixtureServer, without any network access. The server runs in this process, and every
+    scenario runs in a fresh child process so that its peak memory is its own. Results are compared with the
+    baselines stored in BenchmarkBaselines.json, so a change can be checked for regressions before it is merged.
+    """
+
+    # scenarios in the order they are run
+    scenarios = ('crawl', 'search', 'sheet-web', 'sheet-web-search', 'sheet-web-of-web')
+    # (name, format, whether a higher value is better) of the reported metrics
+    metrics = (('pages_per_sec', '{:8.1f}', True), ('page_p50_ms', '{:8.1f}', False), ('page_p99_ms', '{:8.1f}', False),
+               ('site_p50_ms', '{:8.1f}', False), ('site_p99_ms', '{:8.1f}', False), ('peak_rss_mb', '{:8.1f}', False),
+               ('precision', '{:8.3f}', True), ('recall', '{:8.3f}', True), ('api_calls', '{:8.0f}', False))
+    # relative change of a metric, for the worse, reported as a regression
+    tolerance = 0.15
+    # pages below which the latencies of a scenario are too noisy to be reported as regressions
+    min_pages = 50
+
+    def __init__(self, settings):
+        """Sets up the benchmark.
+
+        Pre:
+            settings: dictionary of the keyword arguments of FixtureServer() and of 'workers', 'host_rate' and
+                      'keyphrases'
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._settings = dict(settings)
+        self._fixture_settings = {key: value for key, value in settings.items() if key not in ('workers', 'host_rate', 'keyphrases')}
+
+    def run(self, scenarios=None):
+        """Runs scenarios, each in a child process, against one fixture server.
+
+        Pre:
+            scenarios: names of the scenarios to run, all scenarios if None
+        Post:
+            fixture server started and stopped
+        Return:
+            dictionary of the scenario names to their metrics
+        """
+
+        if scenarios == None:
+            scenarios = self.scenarios
+        fixture = FixtureServer(**self._fixture_settings).start()
+        results = {}
+        try:
+            for scenario in scenarios:
+                requests_before, bytes_before = fixture.counters()
+                command = [sys.executable, os.path.abspath(__file__), '--child', scenario, '--port', str(fixture.port),
+                           '--settings', json.dumps(self._settings)]
+                output = subprocess.run(command, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+                metrics = json.loads(output.strip().splitlines()[-1])
+                requests_after, bytes_after = fixture.counters()
+                metrics['pages'] = requests_after - requests_before
+                metrics['pages_per_sec'] = metrics['pages'] / metrics.pop('wall_secs')
+                metrics['mb_served'] = (bytes_after - bytes_before) / 1024 / 1024
+                results[scenario] = {name: round(value, 3) for name, value in metrics.items()}
+        finally:
+            fixture.stop()
+        return results
+
+    def run_child(self, scenario, port):
+        """Runs a scenario in this process, against the fixture server of the parent process.
+
+        Pre:
+            scenario: one of scenarios
+            port: port of the fixture server
+        Post:
+            the scrapers are set up to reach the fixture server, and run in a temporary directory
+        Return:
+            dictionary of the metrics of the scenario, with its wall time in seconds
+        """
+
+        import HttpClient
+        from WebContactScraper import WebsiteContacts
+        from GoogleSearchWebScraper import GoogleSearch
+
+        fixture = FixtureServer(port=port, **self._fixture_settings)
+        FixtureServer.install_resolver()
+        os.chdir(tempfile.mkdtemp())
+        client = HttpClient.configure(cache_path=None, host_rate=self._settings['host_rate'], host_burst=self._settings['host_rate'])
+        # every search reaches the fixture server without waiting
+        GoogleSearch.search_url = fixture.search_url
+        GoogleSearch.search_interval = 0
+        GoogleSearch.cache_path = None
+
+        # time every page, from the request until the page is read
+        page_secs = []
+        def timed_stream(stream):
+            def timed(url, search=False):
+                start = time.perf_counter()
+                try:
+                    for chunk in stream(url, search):
+                        yield chunk
+                finally:
+                    page_secs.append(time.perf_counter() - start)
+            return timed
+        client.stream = timed_stream(client.stream)
+
+        # time every website, from its homepage until its crawl is done
+        site_secs = []
+        find_contacts = WebsiteContacts.find_contacts
+        def timed_find_contacts(self):
+            start = time.perf_counter()
+            try:
+                find_contacts(self)
+            finally:
+                site_secs.append(time.perf_counter() - start)
+        WebsiteContacts.find_contacts = timed_find_contacts
+
+        keyphrases = fixture.keyphrases(self._settings['keyphrases'])
+        metrics = {}
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            if scenario == 'crawl':
+                found = {}
+                for contacts in WebsiteContacts.scrape_many(fixture.websites, workers=self._settings['workers']):
+                    record = contacts.record
+                    found[contacts.url] = tuple([set(record.contacts(field)) for field in record.fields])
+                expected = {url: fixture.expected(url) for url in fixture.websites}
+            elif scenario == 'search':
+                # every URL and website of the search results counts as a contact to find
+                found = {}
+                expected = {}
+                for keyphrase in keyphrases:
+                    google = GoogleSearch(keyphrase)
+                    found[keyphrase] = (set(google.url_list), set(google.website_list), set(), set(), set())
+                    expected[keyphrase] = (set(fixture.search_urls(keyphrase)), set(fixture.search_websites(keyphrase)), set(), set(), set())
+            else:
+                found, expected, metrics['api_calls'] = self.__run_sheet(scenario, fixture, keyphrases)
+        metrics['wall_secs'] = time.perf_counter() - start
+
+        metrics.update(self.accuracy(found, expected))
+        metrics.update(percentiles('page', page_secs))
+        metrics.update(percentiles('site', site_secs))
+        metrics['peak_rss_mb'] = peak_rss_mb()
+        return metrics
+
+    def __run_sheet(self, scenario, fixture, keyphrases):
+        """Runs an operation of a WebContactSheet on a FakeSheets file.
+
+        Pre:
+            scenario: 'sheet-web', 'sheet-web-search' or 'sheet-web-of-web'
+            fixture: FixtureServer of the websites
+            keyphrases: keyphrases of the search operations
+        Post:
+            operation run in the current directory
+        Return:
+            found: dictionary of the url of every row on Sheet1 to its contacts
+            expected: dictionary of the url of every website the operation should scrape to its contacts
+            api_calls: number of Sheets API calls of the operation
+        """
+
+        from FakeSheets import FakeSheetsClient
+        from SheetsStore import SheetsStore
+        from WebContactSheetManager import WebContactSheet
+
+        client = FakeSheetsClient()
+        keyphrase_rows = [['keyphrase', 'status']] + [[keyphrase] for keyphrase in keyphrases]
+        website_rows = [['website', 'status']] + [[website] for website in fixture.websites]
+        spreadsheet = client.add_spreadsheet('Contacts', [('Sheet1', []), ('Sheet2', keyphrase_rows), ('Sheet3', keyphrase_rows), ('Sheet4', website_rows)])
+
+        WebContactSheet.workers = self._settings['workers']
+        manager = WebContactSheet(store=SheetsStore('Contacts', client=client, interactive=False))
+        if scenario == 'sheet-web':
+            manager.web_scrape()
+            websites = fixture.websites
+        elif scenario == 'sheet-web-search':
+            manager.web_search_scrape()
+            websites = [url for keyphrase in keyphrases for url in fixture.search_urls(keyphrase)]
+        else:
+            manager.web_of_web_search_scrape()
+            websites = [website for keyphrase in keyphrases for website in fixture.search_websites(keyphrase)]
+        manager.flush_rows()
+
+        found = {}
+        for row in spreadsheet.get_worksheet(0).get_cells()[1:]:
+            row = row + [''] * (6 - len(row))
+            found[row[0]] = tuple([set(contacts.split(', ')) - {''} for contacts in row[1:6]])
+        expected = {website: fixture.expected(website) for website in websites}
+        return found, expected, client.num_api_calls
+
+    @staticmethod
+    def accuracy(found, expected):
+        """Compares the contacts found with the contacts expected.
+
+        Pre:
+            found: dictionary of keys to the 5 sets of contacts found
+            expected: dictionary of keys to the 5 sets of contacts expected
+        Post:
+            None
+        Return:
+            dictionary of the precision, the share of the contacts found that were expected, and the recall,
+            the share of the contacts expected that were found
+        """
+
+        true_positives = 0
+        num_found = 0
+        num_expected = 0
+        for key in set(found) | set(expected):
+            empty = (set(),) * 5
+            for found_contacts, expected_contacts in zip(found.get(key, empty), expected.get(key, empty)):
+                true_positives += len(found_contacts & expected_contacts)
+                num_found += len(found_contacts)
+                num_expected += len(expected_contacts)
+        return {'precision': true_positives / num_found if num_found > 0 else 1.0,
+                'recall': true_positives / num_expected if num_expected > 0 else 1.0}
+
+    def report(self, results, baselines=None):
+        """Prints the metrics of every scenario, with their change since the baselines.
+
+        Pre:
+            results: dictionary of the scenario names to their metrics
+            baselines: dictionary of the scenario names to their baseline metrics, or None
+        Post:
+            table printed
+        Return:
+            list of (scenario, metric, baseline, result) of the metrics that got worse by more than tolerance
+        """
+
+        regressions = []
+        print('{:>17} '.format('scenario') + ' '.join('{:>16}'.format(name) for name, format, higher in self.metrics))
+        for scenario, metrics in results.items():
+            cells = []
+            for name, format, higher in self.metrics:
+                if name not in metrics:
+                    cells.append('{:>16}'.format('-'))
+                    continue
+                cell = format.format(metrics[name])
+                baseline = None
+                if baselines != None and scenario in baselines:
+                    baseline = baselines[scenario].get(name)
+                if baseline != None and baseline != 0:
+                    change = (metrics[name] - baseline) / abs(baseline)
+                    cell += ' ({:+.0%})'.format(change)
+                    noisy = name.endswith('_ms') and metrics.get('pages', 0) < self.min_pages
+                    if not noisy and ((change < -self.tolerance) if higher else (change > self.tolerance)):
+                        regressions.append((scenario, name, baseline, metrics[name]))
+                cells.append('{:>16}'.format(cell))
+            print('{:>17} '.format(scenario) + ' '.join(cells))
+        return regressions
+
+def percentiles(name, secs):
+    """Returns the median and 99th percentile of durations in milliseconds.
+
+    Pre:
+        name: prefix of the metric names
+        secs: list of durations in seconds
+    Post:
+        None
+    Return:
+        dictionary of the metrics, empty if there are no durations
+    """
+
+    if len(secs) == 0:
+        return {}
+    secs = sorted(secs)
+    return {name + '_p50_ms': secs[len(secs) // 2] * 1000, name + '_p99_ms': secs[min(len(secs) - 1, int(len(secs) * 0.99))] * 1000}
+
+def peak_rss_mb():
+    """Returns the peak resident memory of this process in megabytes, or None where it cannot be read."""
+
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    if sys.platform == 'darwin':
+        peak /= 1024
+    return peak / 1024
+
+def parse_args(argv=None):
+    """Parses the command line.
+
+    Pre:
+        argv: arguments without the program name, sys.argv[1:] if None
+    Post:
+        usage printed and program exited if the arguments are invalid
+    Return:
+        argparse namespace of the arguments
+    """
+
+    parser = argparse.ArgumentParser(description='Benchmark the scrapers offline against generated websites served locally.')
+    parser.add_argument('scenarios', nargs='*', help='scenarios to run, of {} (default: all)'.format(', '.join(ScraperBenchmark.scenarios)))
+    parser.add_argument('--sites', type=int, default=40, help='generated websites (default: %(default)s)')
+    parser.add_argument('--pages', type=int, default=12, help='member pages per website, crawled without contacts (default: %(default)s)')
+    parser.add_argument('--fan-out', type=int, default=6, help='links from each page to member pages (default: %(default)s)')
+    parser.add_argument('--page-kb', type=int, default=16, help='size of every page in KB (default: %(default)s)')
+    parser.add_argument('--slow', type=float, default=0.1, help='fraction of slow websites (default: %(default)s)')
+    parser.add_argument('--failing', type=float, default=0.05, help='fraction of websites that drop the connection (default: %(default)s)')
+    parser.add_argument('--delay', type=float, default=0.2, help='seconds a slow website waits before answering (default: %(default)s)')
+    parser.add_argument('--sitemaps', type=float, default=0.0, help='fraction of websites listing their pages in sitemaps (default: %(default)s)')
+    parser.add_argument('--directories', type=int, default=4, help='directory websites listed by the search results (default: %(default)s)')
+    parser.add_argument('--keyphrases', type=int, default=2, help='keyphrases searched by the search scenarios (default: %(default)s)')
+    parser.add_argument('--workers', type=int, default=8, help='websites scraped at the same time (default: %(default)s)')
+    parser.add_argument('--host-rate', type=float, default=1000, help='requests per second per host (default: %(default)s)')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated websites (default: %(default)s)')
+    parser.add_argument('--baselines', default='BenchmarkBaselines.json', help='file of the stored baselines (default: %(default)s)')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baselines')
+    # used by the parent process to run a scenario in a child process
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--settings', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    for scenario in args.scenarios:
+        if scenario not in ScraperBenchmark.scenarios:
+            parser.error('unknown scenario: ' + scenario)
+    return args
+
+def main(argv=None):
+    """Runs the benchmark from the command line.
+
+    Pre:
+        argv: arguments without the program name, sys.argv[1:] if None
+    Post:
+        results printed and compared with the baselines, which are replaced if --save-baseline is given
+    Return:
+        exit status of the program, 1 if a metric regressed
+    """
+
+    args = parse_args(argv)
+    if args.child != None:
+        benchmark = ScraperBenchmark(json.loads(args.settings))
+        print(json.dumps(benchmark.run_child(args.child, args.port)))
+        return 0
+
+    settings = {'sites': args.sites, 'pages': args.pages, 'fan_out': args.fan_out, 'page_kb': args.page_kb, 'slow': args.slow,
+                'failing': args.failing, 'delay': args.delay, 'directories': args.directories, 'seed': args.seed,
+                'sitemaps': args.sitemaps, 'keyphrases': args.keyphrases, 'workers': args.workers, 'host_rate': args.host_rate}
+    baselines = None
+    try:
+        with open(args.baselines) as baseline_file:
+            stored = json.load(baseline_file)
+        if stored['settings'] == settings:
+            baselines = stored['results']
+        else:
+            print('The baselines were measured with other settings and are not compared:', stored['settings'])
+    except (OSError, ValueError, KeyError):
+        pass
+
+    benchmark = ScraperBenchmark(settings)
+    results = benchmark.run(list(args.scenarios) or None)
+    print('Scraper benchmark against {sites} generated websites, {workers} workers'.format(**settings))
+    print('-' * 66)
+    regressions = benchmark.report(results, baselines)
+    for scenario, name, baseline, result in regressions:
+        print('Regression in {}: {} went from {:.3f} to {:.3f}.'.format(scenario, name, baseline, result))
+
+    if args.save_baseline:
+        if baselines != None:
+            # scenarios that were not run keep their baselines
+            results = dict(baselines, **results)
+        with open(args.baselines, 'w') as baseline_file:
+            json.dump({'settings': settings, 'results': results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print('Baselines saved to', args.baselines + '.')
+        return 0
+    return 1 if len(regressions) > 0 else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,79 @@
+import sqlite3
+import json
+import time
+import threading
+
+class SearchCache:
+    """
+    The SearchCache module keeps the results of Google Searches in a local SQLite file, so that searching a
+    keyphrase again within the TTL costs no request and no wait for the search limit. The URLs of the results
+    page and the websites listed on them are stored per search page and keyphrase; keyphrases differing only
+    in case or whitespace share one entry.
+    """
+
+    def __init__(self, path='SearchCache.sqlite3', ttl=7 * 24 * 60 * 60):
+        """Opens the cache, creating the file if needed.
+
+        Pre:
+            path: path of the SQLite file of the cache
+            ttl: seconds the results of a search are reused
+        Post:
+            the cache table is created if it does not exist
+        Return:
+            None
+        """
+
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('''CREATE TABLE IF NOT EXISTS searches (
+                            search_url TEXT, query TEXT, url_list TEXT, website_list TEXT, searched_at REAL,
+                            PRIMARY KEY (search_url, query))''')
+
+    @staticmethod
+    def normalize_query(query):
+        return ' '.join(query.lower().split())
+
+    def lookup(self, search_url, query):
+        """Looks up the results of a search.
+
+        Pre:
+            search_url: URL of the search page, without the query
+            query: keyphrase searched
+        Post:
+            None
+        Return:
+            url_list, website_list: lists of the URLs of the results page and of the websites listed on them,
+            website_list None if the websites were not extracted yet, or None if the keyphrase was not
+            searched within the TTL
+        """
+
+        with self._lock:
+            row = self._db.execute('SELECT url_list, website_list, searched_at FROM searches WHERE search_url = ? AND query = ?',
+                                   (search_url, self.normalize_query(query))).fetchone()
+        if row == None or time.time() - row[2] >= self._ttl:
+            return None
+        return json.loads(row[0]), json.loads(row[1])
+
+    def store(self, search_url, query, url_list, website_list):
+        """Stores the results of a search, replacing earlier results of the keyphrase.
+
+        Pre:
+            search_url: URL of the search page, without the query
+            query: keyphrase searched
+            url_list: URLs of the results page
+            website_list: websites listed on the results, None if they are not extracted yet
+        Post:
+            results stored
+        Return:
+            None
+        """
+
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO searches VALUES (?, ?, ?, ?, ?)',
+                             (search_url, self.normalize_query(query), json.dumps(url_list), json.dumps(website_list), time.time()))
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,124 @@
+import os
+import time
+import threading
+from datetime import datetime
+
+# fcntl locks files on Unix and msvcrt on Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+class SearchLimiter:
+    """
+    The SearchLimiter module spaces out the Google Searches of every process on the machine, so parallel
+    workers share one search budget instead of each searching as often as it likes. The file of the limiter
+    holds the time of the last search slot given out, and is locked while it is read and written. Each search
+    reserves the first free slot after it and then waits for it, so searches queue in the order they asked.
+    """
+
+    # format of the time in the file as written by earlier versions of the program, which is still read
+    legacy_time_format = '%d/%m/%Y %H:%M:%S'
+    # serializes the threads of this process, which the file lock does not do on every platform
+    __thread_lock = threading.Lock()
+
+    def __init__(self, path='PrevSearchTime.txt', interval=10 * 60):
+        """Sets up the limiter.
+
+        Pre:
+            path: path of the file holding the time of the last search slot, created if needed
+            interval: seconds between two searches
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._path = path
+        self._interval = interval
+
+    def __lock(self, file):
+        file.seek(0)
+        if fcntl != None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+
+    def __unlock(self, file):
+        file.seek(0)
+        if fcntl != None:
+            fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+        else:
+            msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def __parse_time(self, text):
+        """Parses the time in the file, in ISO format or in the format of earlier versions.
+
+        Pre:
+            text: content of the file
+        Post:
+            None
+        Return:
+            the time as seconds since the epoch, or None if the file is empty or unreadable
+        """
+
+        for parse in (datetime.fromisoformat, lambda text: datetime.strptime(text, self.legacy_time_format)):
+            try:
+                return parse(text).timestamp()
+            except ValueError:
+                pass
+        return None
+
+    def reserve(self):
+        """Reserves the first search slot at least interval seconds after the last one given out.
+
+        Pre:
+            None
+        Post:
+            time of the reserved slot written to the file
+        Return:
+            seconds to wait until the reserved slot, 0 if the search can start now
+        """
+
+        with self.__thread_lock:
+            with open(self._path, 'a+') as file:
+                self.__lock(file)
+                try:
+                    now = time.time()
+                    slot = now
+                    text = file.read().strip()
+                    previous = self.__parse_time(text)
+                    if previous != None:
+                        slot = max(now, previous + self._interval)
+                    file.seek(0)
+                    file.truncate()
+                    file.write(datetime.fromtimestamp(slot).isoformat())
+                    file.flush()
+                    os.fsync(file.fileno())
+                finally:
+                    self.__unlock(file)
+        return max(0.0, slot - time.time())
+
+if __name__ == '__main__':
+    import sys
+    import tempfile
+    import subprocess
+
+    if len(sys.argv) == 4:
+        # child process reserving a slot and printing when it may search
+        limiter = SearchLimiter(sys.argv[1], float(sys.argv[2]))
+        print(time.time() + limiter.reserve())
+        sys.exit(0)
+
+    print('SearchLimiter across processes')
+    print('------------------------------')
+    path = os.path.join(tempfile.mkdtemp(), 'PrevSearchTime.txt')
+    interval = 2
+    start = time.time()
+    children = [subprocess.Popen([sys.executable, __file__, path, str(interval), 'child'], stdout=subprocess.PIPE, universal_newlines=True)
+                for i in range(5)]
+    slots = sorted(float(child.communicate()[0]) for child in children)
+    gaps = [slots[i + 1] - slots[i] for i in range(len(slots) - 1)]
+    print('5 processes asked for a search at once with a {} s interval.'.format(interval))
+    print('Their slots are {} s after the start, at least {:.2f} s apart.'.format(', '.join('{:.1f}'.format(slot - start) for slot in slots), min(gaps)))
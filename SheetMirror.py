@@ -0,0 +1,155 @@
+import re
+from urllib.parse import urlparse
+from CrawlMetrics import get_metrics
+
+class SheetMirror:
+    """
+    The SheetMirror module keeps a local copy of the contact rows of Sheet1, indexed by normalized URL. The
+    copy is loaded once, answers whether a website was already scraped without any API call, and writes back
+    only what changed: rows of new websites are appended and rows of re-scraped websites are updated in place.
+    """
+
+    def __init__(self, sheet, values):
+        """Builds the index of the rows already on the sheet.
+
+        Pre:
+            sheet: worksheet with a header row and one website per row
+            values: rows of the sheet, including the header row
+        Post:
+            Every row with a URL is indexed by its normalized URL. If a URL appears on several rows, the
+            first row is kept.
+        Return:
+            None
+        """
+
+        self._sheet = sheet
+        # normalized URL -> sheet row number
+        self._index = {}
+        # sheet row number -> row values
+        self._rows = {}
+        # rows of new websites, appended on the next flush
+        self._appends = []
+        # sheet row numbers of re-scraped websites, updated on the next flush
+        self._dirty = set()
+        self._num_rows = len(values)
+
+        for idx in range(1, len(values)):
+            row = values[idx]
+            if len(row) == 0 or row[0] == '':
+                continue
+            key = self.normalize_url(row[0])
+            if key not in self._index:
+                self._index[key] = idx + 1
+                self._rows[idx + 1] = list(row)
+
+    @staticmethod
+    def normalize_url(url):
+        """Normalizes a URL so that different spellings of the same website share one key.
+
+        Pre:
+            url: URL of the website
+        Post:
+            None
+        Return:
+            the URL without scheme, 'www.', default port, fragment and trailing '/', in lowercase host
+        """
+
+        url = url.strip()
+        if '://' not in url:
+            url = 'http://' + url
+        parsed = urlparse(url)
+        host = parsed.netloc.lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        host = re.sub(':(80|443)$', '', host)
+        key = host + parsed.path.rstrip('/')
+        if parsed.query != '':
+            key += '?' + parsed.query
+        return key
+
+    def __contains__(self, url):
+        return self.normalize_url(url) in self._index
+
+    def __len__(self):
+        return len(self._index)
+
+    @property
+    def num_pending(self):
+        return len(self._appends) + len(self._dirty)
+
+    def upsert(self, row):
+        """Records a row of contacts, to be written on the next flush.
+
+        Pre:
+            row: row values, starting with the URL of the website
+        Post:
+            If the website is already on the sheet and its row differs, the row is marked for an in place
+            update. Otherwise the row is queued for an append.
+        Return:
+            None
+        """
+
+        key = self.normalize_url(row[0])
+        if key in self._index:
+            row_number = self._index[key]
+            if row_number > 0:
+                if self.__padded(self._rows[row_number]) != self.__padded(row):
+                    self._rows[row_number] = list(row)
+                    self._dirty.add(row_number)
+            else:
+                # website queued for an append and re-scraped before the flush
+                self._appends[-row_number - 1] = list(row)
+        else:
+            self._appends.append(list(row))
+            # negative row numbers index the queued appends until their sheet rows are known
+            self._index[key] = -len(self._appends)
+
+    def __padded(self, row):
+        """Pads a row with empty cells, as the Sheets API omits trailing empty cells."""
+
+        return list(row) + [''] * (6 - len(row))
+
+    def flush(self, spreadsheet):
+        """Writes the changed rows with at most one update and one append request.
+
+        Pre:
+            spreadsheet: spreadsheet of the sheet
+        Post:
+            rows marked for an update written in place, queued rows appended to the sheet; rows of a request
+            that failed are kept for the next flush
+        Return:
+            number of rows appended
+        """
+
+        if len(self._dirty) > 0:
+            title = self._sheet.title.replace("'", "''")
+            data = []
+            for row_number in sorted(self._dirty):
+                data.append({'range': "'{}'!A{}".format(title, row_number), 'values': [self._rows[row_number]]})
+            get_metrics().count('sheets_api_calls', method='values_batch_update')
+            spreadsheet.values_batch_update({'valueInputOption': 'RAW', 'data': data})
+            # only once written, so that the rows are written again by the next flush if the update failed
+            self._dirty = set()
+
+        appends = self._appends
+        if len(appends) == 0:
+            return 0
+        get_metrics().count('sheets_api_calls', method='append_rows')
+        response = self._sheet.append_rows(appends, table_range='A1')
+        # the queued rows and their placeholder row numbers are kept until the append succeeded, so that a
+        # failed append, e.g. over the quota, is retried by the next flush
+        self._appends = []
+
+        # find where the rows landed, falling back to the end of the known rows
+        first_row = self._num_rows + 1
+        updated_range = ''
+        if isinstance(response, dict):
+            updated_range = response.get('updates', {}).get('updatedRange', '')
+        match = re.search('![A-Z]+([0-9]+)', updated_range)
+        if match:
+            first_row = int(match.group(1))
+        for i in range(len(appends)):
+            self._index[self.normalize_url(appends[i][0])] = first_row + i
+            self._rows[first_row + i] = appends[i]
+        self._num_rows = max(self._num_rows, first_row + len(appends) - 1)
+        return len(appends)
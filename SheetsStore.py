@@ -0,0 +1,373 @@
+import sys
+import os
+import json
+import atexit
+from datetime import datetime, timedelta, timezone
+from ContactStore import ContactStore
+from SheetMirror import SheetMirror
+from CrawlMetrics import get_metrics
+
+class SheetsStore(ContactStore):
+    """
+    The SheetsStore module keeps the inputs and contacts of the scrape operations in a Google Sheets file of 4
+    sheets. Sheet1 has the contacts, and Sheet2, Sheet3 and Sheet4 have the inputs of the three operations
+    with their statuses. All sheets are read with a single request when the store is opened, and Sheet1 is
+    mirrored locally by a SheetMirror so that buffered rows are written with at most two requests per flush.
+    The client can be a gspread client, or a FakeSheets client to run offline.
+    """
+
+    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
+    # sheet holding the inputs of each operation, after Sheet1
+    __operation_sheets = {'web_of_web_search_scrape': 1, 'web_search_scrape': 2, 'web_scrape': 3}
+    # header of each input sheet
+    __input_headers = [['keyphrase', 'status'], ['keyphrase', 'status'], ['website', 'status']]
+
+    def __init__(self, file_name, client=None, interactive=True):
+        """Opens the Google Sheets file.
+
+        Pre:
+            file_name: name of the file to access
+            client: gspread or FakeSheets client, authorized with credentials.json if None
+            interactive: whether to confirm the file name and wait for the 4 sheets with prompts
+        Post:
+            - If no header is added to a sheet, then the header will be added.
+            - The status of every input is set to 'to scrape'.
+        Return:
+            None
+        """
+
+        if client == None:
+            client = authorize(self.scope)
+        self._client = client
+
+        if interactive:
+            self.__confirm_file_name(file_name)
+            four_sheets_warning = input('The file must contain 4 sheets for the program to work. Hit <ENTER> to proceed.')
+
+        while True:
+            try:
+                self.__open(file_name)
+                break
+            except Exception:
+                if not interactive:
+                    raise
+                pause = input('The file does not contain 4 sheets. Once the file contains 4 sheets, hit <ENTER> to proceed.')
+
+    def __confirm_file_name(self, file_name):
+        """Asks whether to proceed if the file name is listed in the ExistingFileNames file.
+
+        Pre:
+            file_name: name of the file to access
+        Post:
+            program exited if the user does not proceed
+        Return:
+            None
+        """
+
+        metrics = get_metrics()
+        metrics.count('sheets_api_calls', method='open')
+        metrics.count('sheets_api_calls', method='get_worksheet')
+        file_names_sheet = self._client.open('ExistingFileNames').get_worksheet(0)
+
+        # check whether the file_name is unique
+        not_unique = True
+        name = file_name
+        while not_unique:
+            metrics.count('sheets_api_calls', method='col_values')
+            unique_file_names = file_names_sheet.col_values(1)
+            for unique_file_name in unique_file_names:
+                if name == unique_file_name:
+                    while True:
+                        confirm = input('That file name already exists. Would you like to proceed? (Y/N): ').upper()
+                        if confirm == 'Y':
+                            not_unique = False
+                            break
+                        elif confirm == 'N':
+                            sys.exit(0)
+                not_unique = False
+
+    def __open(self, file_name):
+        """Reads the 4 sheets of the file with a single request, writing the missing headers and the 'to scrape'
+        statuses with another.
+
+        Pre:
+            file_name: name of the file to access
+        Post:
+            sheets, mirror of Sheet1 and inputs loaded
+        Return:
+            None
+        """
+
+        # define sheets, opening the file once
+        metrics = get_metrics()
+        metrics.count('sheets_api_calls', method='open')
+        spreadsheet = self._client.open(file_name)
+        metrics.count('sheets_api_calls', method='worksheets')
+        self._sheets = spreadsheet.worksheets()[:4]
+        if len(self._sheets) < 4:
+            raise ValueError('The file does not contain 4 sheets.')
+
+        # read every sheet with a single request
+        ranges = [self.__sheet_range(self._sheets[0], 'A:F')]
+        for sheet in self._sheets[1:]:
+            ranges.append(self.__sheet_range(sheet, 'A:B'))
+        metrics.count('sheets_api_calls', method='values_batch_get')
+        value_ranges = spreadsheet.values_batch_get(ranges)['valueRanges']
+        values = [value_range.get('values', []) for value_range in value_ranges]
+
+        # header and status changes, written with a single request at the end
+        updates = []
+
+        # insert header for sheet1 if not already added
+        if len(values[0]) == 0 or len(values[0][0]) == 0:
+            updates.append({'range': self.__sheet_range(self._sheets[0], 'A1:F1'), 'values': [self.header]})
+
+        # insert header for the input sheets if not already added
+        for i in range(1, 4):
+            if len(values[i]) == 0 or len(values[i][0]) == 0:
+                updates.append({'range': self.__sheet_range(self._sheets[i], 'A1:B1'), 'values': [self.__input_headers[i - 1]]})
+
+        # local copy of the contacts on sheet1, indexed by url
+        self._mirror = SheetMirror(self._sheets[0], values[0])
+
+        # list of the inputs written in Sheet2, Sheet3 and Sheet4
+        self._inputs = [None]
+        for i in range(1, 4):
+            self._inputs.append(self.__first_column(values[i]))
+            if len(self._inputs[i]) > 0:
+                updates.append(self.__status_update(self._sheets[i], len(self._inputs[i]), 'to scrape'))
+
+        if len(updates) > 0:
+            metrics.count('sheets_api_calls', method='values_batch_update')
+            spreadsheet.values_batch_update({'valueInputOption': 'RAW', 'data': updates})
+        self._spreadsheet = spreadsheet
+
+    def __sheet_range(self, sheet, cells):
+        """Builds the A1 notation of cells on a sheet.
+
+        Pre:
+            sheet: worksheet of the cells
+            cells: A1 notation of the cells without the sheet, e.g. 'A1:B1'
+        Post:
+            None
+        Return:
+            A1 notation of the cells including the sheet title
+        """
+
+        return "'{}'!{}".format(sheet.title.replace("'", "''"), cells)
+
+    def __first_column(self, values):
+        """Returns the first column of the rows below the header, up to the first empty cell.
+
+        Pre:
+            values: rows of a sheet, including the header row
+        Post:
+            None
+        Return:
+            column: list of the values in the first column
+        """
+
+        column = []
+        for row in values[1:]:
+            if len(row) == 0 or row[0] == '':
+                break
+            column.append(row[0])
+        return column
+
+    def __status_update(self, sheet, count, status):
+        """Builds the update setting the status of the first rows below the header of a sheet.
+
+        Pre:
+            sheet: worksheet whose statuses are set
+            count: number of rows below the header to set
+            status: status written in the second column
+        Post:
+            None
+        Return:
+            update for a batched values update request
+        """
+
+        return {'range': self.__sheet_range(sheet, 'B2:B{}'.format(count + 1)), 'values': [[status]] * count}
+
+    def inputs(self, operation):
+        return self._inputs[self.__operation_sheets[operation]]
+
+    def set_statuses(self, operation, status):
+        """Sets the status of every input of an operation with a single request.
+
+        Pre:
+            operation: one of operations
+            status: status written in the second column
+        Post:
+            statuses updated in Google Sheets
+        Return:
+            None
+        """
+
+        i = self.__operation_sheets[operation]
+        if len(self._inputs[i]) > 0:
+            get_metrics().count('sheets_api_calls', method='values_batch_update')
+            self._spreadsheet.values_batch_update({'valueInputOption': 'RAW', 'data': [self.__status_update(self._sheets[i], len(self._inputs[i]), status)]})
+
+    def __contains__(self, url):
+        return url in self._mirror
+
+    def __len__(self):
+        return len(self._mirror)
+
+    @property
+    def num_pending(self):
+        return self._mirror.num_pending
+
+    def upsert(self, row):
+        self._mirror.upsert(row)
+
+    def flush(self):
+        """Writes the buffered rows to Sheet1, appending new websites and updating re-scraped websites in place.
+
+        Pre:
+            None
+        Post:
+            buffered rows written to Sheet1 with at most one append and one update request
+        Return:
+            None
+        """
+
+        self._mirror.flush(self._spreadsheet)
+
+# gspread client shared by all SheetsStores
+_client = None
+# seconds before its expiry a cached token is no longer used
+token_margin = 5 * 60
+
+def authorize(scope, credentials_path='credentials.json', token_path='SheetsToken.json'):
+    """Returns the gspread client authorized with the service account of credentials.json, authorizing it on
+    first use. gspread and oauth2client are imported then, as they take long to import. The access token is
+    cached on disk, so that later runs reuse it until it expires instead of requesting a new one.
+
+    Pre:
+        scope: OAuth scopes of the client
+        credentials_path: path of the key file of the service account
+        token_path: path of the file caching the access token
+    Post:
+        the shared client is created if it does not exist, with the cached token if it is still valid, and
+        the token is cached again at exit if it changed
+    Return:
+        the shared gspread client
+    """
+
+    global _client
+    if _client == None:
+        import gspread
+        from oauth2client.service_account import ServiceAccountCredentials
+        creds = ServiceAccountCredentials.from_json_keyfile_name(credentials_path, scope)
+        # note that in the online gspread docs, 'gc' is used instead of 'client'
+        _client = gspread.authorize(creds)
+        # the cached token is only reused for the same service account and scopes
+        key = creds.service_account_email + ' ' + ' '.join(scope)
+        loaded = load_token(_client, key, token_path)
+        atexit.register(save_token, _client, key, token_path, loaded)
+    return _client
+
+def _credentials(client):
+    """Returns the credentials a gspread client signs its requests with, which gspread 6 keeps on its HTTP
+    client and older versions on the client itself."""
+
+    return getattr(getattr(client, 'http_client', client), 'auth', None)
+
+def load_token(client, key, token_path):
+    """Sets the cached access token on the credentials of a client if it is still valid.
+
+    Pre:
+        client: gspread client
+        key: service account email and scopes the token must belong to
+        token_path: path of the file caching the access token
+    Post:
+        cached token set on the credentials of the client
+    Return:
+        the cached token, or None if there is no valid cached token
+    """
+
+    try:
+        with open(token_path) as token_file:
+            cached = json.load(token_file)
+        expiry = datetime.fromisoformat(cached['expiry'])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    if cached.get('key') != key or expiry - timedelta(seconds=token_margin) <= _utcnow():
+        return None
+
+    creds = _credentials(client)
+    if hasattr(creds, 'access_token'):
+        # oauth2client credentials, used directly by gspread before version 4
+        creds.access_token = cached['token']
+        creds.token_expiry = expiry
+    elif creds != None:
+        # google-auth credentials
+        creds.token = cached['token']
+        creds.expiry = expiry
+    return cached['token']
+
+def save_token(client, key, token_path, loaded=None):
+    """Caches the access token of a client, readable only by the user.
+
+    Pre:
+        client: gspread client
+        key: service account email and scopes of the token
+        token_path: path of the file caching the access token
+        loaded: token read from the cache, which is not written again
+    Post:
+        token written to token_path if the client has one that was not loaded from it
+    Return:
+        None
+    """
+
+    creds = _credentials(client)
+    if hasattr(creds, 'access_token'):
+        token, expiry = creds.access_token, creds.token_expiry
+    else:
+        token, expiry = getattr(creds, 'token', None), getattr(creds, 'expiry', None)
+    if token == None or expiry == None or token == loaded:
+        return
+    try:
+        descriptor = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'w') as token_file:
+            json.dump({'key': key, 'token': token, 'expiry': expiry.isoformat()}, token_file)
+    except OSError:
+        pass
+
+def _utcnow():
+    """Returns the current UTC time without time zone, as the credentials store their expiry."""
+
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+if __name__ == '__main__':
+    import subprocess
+    import time
+
+    def cold_start(code):
+        """Returns the best wall time of 5 fresh interpreters running code, in milliseconds."""
+
+        best = float('inf')
+        for i in range(5):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, '-c', code], check=True, stdout=subprocess.DEVNULL)
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    # modules the scraper used to import when WebContactSheetManager was imported
+    eager = 'import requests, asyncio, concurrent.futures.process, sortedcontainers, gspread, oauth2client.service_account; '
+    try:
+        import httpx
+        eager = 'import httpx; ' + eager
+    except ImportError:
+        pass
+
+    print('Cold start benchmark (best of 5 fresh interpreters, without the former credentials round trip)')
+    print('----------------------------------------------------------------------------------------------')
+    interpreter = cold_start('pass')
+    for name, code in [('import WebContactSheetManager', 'import WebContactSheetManager'),
+                       ('WebContactCLI.py --help', 'import sys; sys.argv = ["WebContactCLI.py", "--help"]; import runpy; runpy.run_path("WebContactCLI.py", run_name="__main__")')]:
+        lazy = cold_start(code) - interpreter
+        eager_ms = cold_start(eager + code) - interpreter
+        print('{:>30}: {:7.1f} ms with eager imports, {:7.1f} ms now, {:5.1f}x faster'.format(name, eager_ms, lazy, eager_ms / lazy))
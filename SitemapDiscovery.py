@@ -0,0 +1,381 @@
+import re
+import heapq
+import zlib
+import threading
+from urllib.parse import urlsplit
+from xml.etree import ElementTree
+from HttpClient import get_client
+from CrawlFrontier import CrawlFrontier
+from DomainResolver import get_resolver
+
+class RobotsRules:
+    """The rules of a robots.txt file that apply to one crawler, and the sitemaps the file lists."""
+
+    def __init__(self, lines=(), agent='*'):
+        """Parses the rules.
+
+        Pre:
+            lines: lines of the robots.txt file, nothing is disallowed if empty
+            agent: product token of the crawler, only the rules for every crawler ('*') apply if no group
+                   names it
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self.sitemaps = []
+        # (user agents, (allow, path) rules) of every group of the file
+        groups = []
+        group = None
+        for line in lines:
+            line = line.split('#', 1)[0].strip()
+            if ':' not in line:
+                continue
+            key, value = line.split(':', 1)
+            key = key.strip().lower()
+            value = value.strip()
+            if key == 'sitemap':
+                if value != '':
+                    self.sitemaps.append(value)
+            elif key == 'user-agent':
+                # consecutive User-agent lines share the rules that follow them
+                if group == None or len(group[1]) > 0:
+                    group = ([], [])
+                    groups.append(group)
+                group[0].append(value.lower())
+            elif key in ('allow', 'disallow') and group != None:
+                group[1].append((key == 'allow', value))
+
+        agent = agent.lower()
+        rules = [rule for agents, rules in groups if any(name != '*' and agent.startswith(name) for name in agents) for rule in rules]
+        if len(rules) == 0:
+            rules = [rule for agents, rules in groups if '*' in agents for rule in rules]
+        # (length of the path, allow, pattern of the path) of the rules, an empty Disallow allows everything
+        self._rules = []
+        for allow, path in rules:
+            if path == '':
+                continue
+            pattern = re.escape(path).replace(r'\*', '.*')
+            if pattern.endswith(r'\$'):
+                pattern = pattern[:-2] + '$'
+            self._rules.append((len(path), allow, re.compile(pattern)))
+
+    def allowed(self, url):
+        """Checks whether a URL may be fetched. The longest matching rule decides, Allow on a tie.
+
+        Pre:
+            url: absolute URL on the website of the file
+        Post:
+            None
+        Return:
+            True if no rule disallows the URL, False otherwise
+        """
+
+        split = urlsplit(url)
+        path = split.path or '/'
+        if split.query != '':
+            path += '?' + split.query
+        if path == '/robots.txt':
+            return True
+        best = None
+        for length, allow, pattern in self._rules:
+            if pattern.match(path) != None:
+                if best == None or length > best[0] or (length == best[0] and allow):
+                    best = (length, allow)
+        return best == None or best[1]
+
+class SitemapLocations:
+    """Parser target collecting the locations of a sitemap, without building its tree."""
+
+    def __init__(self):
+        # name of the root element, 'sitemapindex' for a sitemap index and 'urlset' for a sitemap of pages
+        self.kind = None
+        # (kind, URL) of the locations parsed and not taken yet
+        self.locations = []
+        self._text = None
+
+    def start(self, tag, attrib):
+        if self.kind == None:
+            self.kind = tag.rsplit('}', 1)[-1]
+        elif tag == 'loc' or tag.endswith('}loc'):
+            self._text = []
+
+    def data(self, data):
+        if self._text != None:
+            self._text.append(data)
+
+    def end(self, tag):
+        if self._text != None:
+            self.locations.append((self.kind, ''.join(self._text).strip()))
+            self._text = None
+
+    def close(self):
+        pass
+
+class SitemapDiscovery:
+    """
+    The SitemapDiscovery module finds the contact pages of a website from its sitemaps before the website is
+    crawled. It reads robots.txt for the sitemaps it lists and the pages it disallows, falling back on
+    /sitemap.xml, and follows sitemap indexes to the sitemaps of the pages of the website. Sitemaps are read
+    with a streaming XML parser while they download, decompressed on the fly when they are gzip files, so a
+    large sitemap never sits in memory. The pages whose URL looks like a contact page, scored like the links
+    of the CrawlFrontier, are the candidates fetched first.
+    """
+
+    # product token of the scraper in robots.txt, only the rules for every crawler apply if no group names it
+    robots_agent = 'WebContactScraper'
+    # content types of robots.txt
+    robots_content_types = ('text/plain',)
+    # content types of sitemaps, which are often served as gzip files or as plain bytes
+    sitemap_content_types = ('application/xml', 'text/xml', 'application/gzip', 'application/x-gzip', 'application/octet-stream')
+    # sitemap files read per website, sitemap indexes included
+    max_sitemaps = 4
+    # contact pages taken from the sitemaps
+    max_candidates = 3
+    # bytes of a sitemap read once decompressed, the limit of the sitemap protocol
+    max_sitemap_bytes = 50 * 1024 * 1024
+    # sitemaps of a sitemap index whose URL matches list the pages of the website, and are read first
+    page_sitemap_pattern = re.compile('page')
+    # sitemaps of a sitemap index whose URL matches list content without contact pages, and are not read
+    skipped_sitemap_pattern = re.compile('post|product|image|video|tag|categor|author')
+
+    def __init__(self, url):
+        """Sets up the discovery of a website, without fetching anything until discover() is called.
+
+        Pre:
+            url: root URL of the website
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._url = url
+        self._domain = get_resolver().domain(url)
+        self._origin = get_resolver().origin(url)
+        self._robots = RobotsRules()
+        self._candidates = []
+        self._requests = 0
+
+    @property
+    def robots(self):
+        return self._robots
+
+    @property
+    def candidates(self):
+        return self._candidates
+
+    @property
+    def requests(self):
+        return self._requests
+
+    def __fetch(self, url, content_types):
+        """Streams a file of the website.
+
+        Pre:
+            url: URL of the file
+            content_types: content types of the file, see HttpClient.stream_file()
+        Post:
+            request counted
+        Return:
+            generator of raw bytes of consecutive parts of the file, empty if it could not be fetched
+        """
+
+        self._requests += 1
+        return self.__stream(url, content_types)
+
+    def __stream(self, url, content_types):
+        try:
+            yield from get_client().stream_file(url, content_types)
+        except Exception:
+            # a file that cannot be fetched is treated as missing
+            return
+
+    def __unzip(self, chunks):
+        """Decompresses a sitemap as it streams in if it is a gzip file, up to max_sitemap_bytes.
+
+        Pre:
+            chunks: iterable of raw bytes of consecutive parts of the sitemap
+        Post:
+            None
+        Return:
+            generator of bytes of consecutive parts of the XML of the sitemap
+        """
+
+        decompressor = None
+        first = True
+        size = 0
+        for chunk in chunks:
+            if len(chunk) == 0:
+                continue
+            if first:
+                first = False
+                if chunk[:2] == b'\x1f\x8b':
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            while len(chunk) > 0:
+                if decompressor == None:
+                    data, chunk = chunk, b''
+                else:
+                    # bounded, so that a small file that decompresses to gigabytes stops at the limit
+                    data = decompressor.decompress(chunk, self.max_sitemap_bytes - size + 1)
+                    chunk = decompressor.unconsumed_tail
+                size += len(data)
+                if size > self.max_sitemap_bytes:
+                    return
+                yield data
+
+    def locations(self, chunks):
+        """Reads the locations of a sitemap while it streams in.
+
+        Pre:
+            chunks: iterable of raw bytes of consecutive parts of the sitemap, gzip-compressed or not
+        Post:
+            None
+        Return:
+            generator of (kind, URL) of the locations, kind being 'sitemapindex' for the sitemaps of a sitemap
+            index and 'urlset' for pages, up to the first error of a sitemap that is cut off or not XML
+        """
+
+        target = SitemapLocations()
+        parser = ElementTree.XMLParser(target=target)
+        try:
+            for data in self.__unzip(chunks):
+                parser.feed(data)
+                locations, target.locations = target.locations, []
+                yield from locations
+        except ElementTree.ParseError:
+            return
+
+    def __order_sitemaps(self, sitemaps):
+        """Orders the sitemaps of a sitemap index, sitemaps of pages first, dropping sitemaps of content."""
+
+        kept = [sitemap for sitemap in sitemaps if self.skipped_sitemap_pattern.search(sitemap.lower()) == None]
+        return sorted(kept, key=lambda sitemap: self.page_sitemap_pattern.search(sitemap.lower()) == None)
+
+    def discover(self):
+        """Reads robots.txt and the sitemaps of the website for its contact pages.
+
+        Pre:
+            None
+        Post:
+            robots: rules of robots.txt, which disallow nothing if it is missing
+            candidates: URLs of the contact pages found, most likely contact page first
+            requests: number of files fetched
+        Return:
+            candidates
+        """
+
+        # /sitemap.xml, where most websites keep their sitemap, is requested while robots.txt downloads, so
+        # that a website without robots.txt or sitemap only costs one round trip before it is crawled. It is
+        # read to the end, at most max_bytes of the HttpClient, so that its fetch slot is given back without
+        # waiting for robots.txt, which may need the same slot
+        fallback = self._origin + '/sitemap.xml'
+        fallback_chunks = []
+        prefetch = threading.Thread(target=lambda: fallback_chunks.extend(self.__fetch(fallback, self.sitemap_content_types)),
+                                    daemon=True)
+        prefetch.start()
+        robots = b''.join(self.__fetch(self._origin + '/robots.txt', self.robots_content_types))
+        self._robots = RobotsRules(robots.decode('utf-8', errors='ignore').splitlines(), self.robots_agent)
+        prefetch.join()
+
+        sitemaps = list(self._robots.sitemaps)
+        if len(sitemaps) == 0:
+            sitemaps = [fallback]
+        prefetched = {}
+        if fallback in sitemaps:
+            prefetched[fallback] = fallback_chunks
+        resolver = get_resolver()
+        frontier = CrawlFrontier()
+        # (score, -order, URL) of the best candidates, the worst first
+        best = []
+        seen = set()
+        read = 0
+        while len(sitemaps) > 0 and read < self.max_sitemaps and len(best) < self.max_candidates:
+            sitemap = sitemaps.pop(0)
+            if sitemap in seen or not sitemap.startswith(('http://', 'https://')):
+                continue
+            seen.add(sitemap)
+            read += 1
+            children = []
+            chunks = prefetched.pop(sitemap, None)
+            if chunks == None:
+                chunks = self.__fetch(sitemap, self.sitemap_content_types)
+            for kind, url in self.locations(chunks):
+                if kind == 'sitemapindex':
+                    children.append(url)
+                elif url not in seen and resolver.same_site(url, self._domain) and self._robots.allowed(url):
+                    seen.add(url)
+                    # the host is left out, as it may contain the words of a contact page
+                    score = frontier.score(url)
+                    if score > 0 and frontier.is_contact_page(urlsplit(url).path):
+                        heapq.heappush(best, (score, -len(seen), url))
+                        if len(best) > self.max_candidates:
+                            heapq.heappop(best)
+            sitemaps = self.__order_sitemaps(children) + sitemaps
+
+        self._candidates = [url for score, order, url in sorted(best, reverse=True)]
+        return self._candidates
+
+if __name__ == '__main__':
+    import io
+    import gzip
+    import time
+    import tracemalloc
+    import contextlib
+    import HttpClient
+    from FixtureServer import FixtureServer
+    from WebContactScraper import WebsiteContacts
+
+    print('Streaming vs. whole sitemap parsing')
+    print('-----------------------------------')
+    pages = 200000
+    xml = ['<?xml version="1.0" encoding="UTF-8"?>\n<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n']
+    for i in range(pages):
+        xml.append('<url><loc>https://example.com/blog/post-{}/</loc><lastmod>2024-01-01</lastmod></url>\n'.format(i))
+    xml.append('<url><loc>https://example.com/contact/</loc></url>\n</urlset>\n')
+    xml = ''.join(xml).encode('utf-8')
+    compressed = gzip.compress(xml)
+    chunks = [compressed[i:i + 64 * 1024] for i in range(0, len(compressed), 64 * 1024)]
+    discovery = SitemapDiscovery('https://example.com/')
+
+    def whole():
+        root = ElementTree.fromstring(gzip.decompress(b''.join(chunks)))
+        return len([element.text for element in root.iter('{http://www.sitemaps.org/schemas/sitemap/0.9}loc')])
+
+    def streaming():
+        return sum(1 for kind, url in discovery.locations(chunks))
+
+    print('{} URLs, {:.1f} MB of XML, {:.1f} MB gzip-compressed'.format(pages + 1, len(xml) / 2 ** 20, len(compressed) / 2 ** 20))
+    for name, parse in [('whole', whole), ('streaming', streaming)]:
+        tracemalloc.start()
+        start = time.perf_counter()
+        count = parse()
+        secs = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('{:>10}: {:8.0f} URLs/s, peak memory {:6.1f} MB, {} URLs'.format(name, count / secs, peak / 2 ** 20, count))
+
+    print()
+    print('Blind crawl vs. sitemap discovery')
+    print('---------------------------------')
+    fixture = FixtureServer(sites=40, sitemaps=1.0, slow=0, failing=0).start()
+    FixtureServer.install_resolver()
+    HttpClient.configure(cache_path=None, host_rate=1000, host_burst=1000)
+    for use_sitemaps in [False, True]:
+        WebsiteContacts.use_sitemaps = use_sitemaps
+        before = fixture.counters()[0]
+        found = 0
+        expected = 0
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for contacts in WebsiteContacts.scrape_many(fixture.websites, workers=8):
+                record = contacts.record
+                found += sum(len(set(record.contacts(field)) & wanted) for field, wanted in zip(record.fields, fixture.expected(contacts.url)))
+                expected += sum(len(wanted) for wanted in fixture.expected(contacts.url))
+        secs = time.perf_counter() - start
+        requests = fixture.counters()[0] - before
+        name = 'sitemaps' if use_sitemaps else 'crawl'
+        print('{:>10}: {:5.1f} requests per website, {:5.2f} s, {} of {} contacts found'.format(
+              name, requests / fixture.sites, secs, found, expected))
+    fixture.stop()
@@ -0,0 +1,299 @@
+import argparse
+import contextlib
+import csv
+import json
+import sys
+import time
+from HttpClient import configure
+from CrawlMetrics import start_run
+from WebContactScraper import WebsiteContacts
+from GoogleSearchWebScraper import GoogleSearch
+from ScrapePipeline import ScrapePipeline
+from ContactIndex import ContactIndex
+from ScrapeWorker import ScrapeWorker
+
+class WebContactBatch:
+    """
+    The WebContactBatch module runs the three scrape operations of the WebContactSheetManager module without
+    Google Sheets and without any prompt, so that it can run from a scheduler. Keyphrases or websites are read
+    from files or stdin, and the contacts of each website are written as a line of JSONL or CSV as soon as the
+    website finishes. Input is read lazily and results are not kept, so memory stays bounded however many
+    websites are scraped.
+    """
+
+    # names of the operations, in the order of the WebContactSheetManager menu
+    operations = ('web-of-web-search', 'web-search', 'web')
+    # columns of every result, in the order of Sheet1
+    fields = ['url', 'emails', 'facebooks', 'instagrams', 'twitters', 'linkedins']
+
+    def __init__(self, workers=8, parse_processes=0, max_concurrency=None, index=None, dedup=False, processes=0):
+        """Sets up the batch.
+
+        Pre:
+            workers: number of websites scraped at the same time
+            parse_processes: number of processes parsing fetched pages, parsed by the scraping threads if 0
+            max_concurrency: number of pages fetched at the same time per website, WebsiteContacts default if None
+            index: ContactIndex the contacts of every website are added to, not kept if None
+            dedup: whether a contact is only written for the first website of the index it was found on
+            processes: number of worker processes scraping the websites, scraped by this process if 0
+        Post:
+            None
+        Return:
+            None
+        """
+
+        self._workers = workers
+        self._parse_processes = parse_processes
+        self._max_concurrency = max_concurrency
+        self._index = index
+        self._dedup = dedup
+        self._processes = processes
+        self._count = 0
+
+    @property
+    def count(self):
+        return self._count
+
+    @staticmethod
+    def read_lines(paths):
+        """Reads the non-empty lines of files one at a time.
+
+        Pre:
+            paths: paths of the files, '-' for stdin
+        Post:
+            None
+        Return:
+            generator of the stripped non-empty lines
+        """
+
+        for path in paths:
+            if path == '-':
+                lines = sys.stdin
+            else:
+                lines = open(path, encoding='utf-8')
+            try:
+                for line in lines:
+                    line = line.strip()
+                    if line != '':
+                        yield line
+            finally:
+                if lines is not sys.stdin:
+                    lines.close()
+
+    def websites(self, operation, lines):
+        """Finds the websites of an operation, without duplicates.
+
+        Pre:
+            operation: one of operations
+            lines: keyphrases for the search operations, root URLs of websites for 'web'
+        Post:
+            None
+        Return:
+            generator of the websites to scrape, each keyphrase is searched only once its websites are needed
+        """
+
+        if operation != 'web':
+            # websites are scraped as the searches find them
+            return ScrapePipeline(lines, operation == 'web-of-web-search').websites()
+        return self.__unique(lines)
+
+    @staticmethod
+    def __unique(websites):
+        seen = set()
+        for website in websites:
+            if website not in seen:
+                seen.add(website)
+                yield website
+
+    def scrape(self, operation, lines):
+        """Scrapes the websites of an operation.
+
+        Pre:
+            operation: one of operations
+            lines: keyphrases for the search operations, root URLs of websites for 'web'
+        Post:
+            a message is printed for every website that could not be scraped
+        Return:
+            generator of WebsiteContacts objects, in the order the websites finish
+        """
+
+        return WebsiteContacts.scrape_many(self.websites(operation, lines), self._workers, self._parse_processes, self._max_concurrency,
+                                           processes=self._processes)
+
+    def write(self, results, out, output_format='jsonl'):
+        """Writes each result as soon as it is available.
+
+        Pre:
+            results: iterable of WebsiteContacts objects
+            out: text file the results are written to
+            output_format: 'jsonl' for one JSON object per line with a list of each kind of contacts, 'csv' for a
+                           header and one row per line with the contacts of each kind separated by ', '
+        Post:
+            results written and flushed one line at a time, count updated after each result, contacts added
+            to the index
+        Return:
+            None
+        """
+
+        writer = None
+        if output_format == 'csv':
+            writer = csv.writer(out, lineterminator='\n')
+            writer.writerow(self.fields)
+            out.flush()
+
+        for contacts in results:
+            record = contacts.record
+            if self._index != None:
+                new_record = self._index.add(record)
+                if self._dedup:
+                    record = new_record
+            if writer != None:
+                writer.writerow(record.to_row())
+            else:
+                out.write(json.dumps(record.to_dict()) + '\n')
+            out.flush()
+            self._count += 1
+
+    def lookup(self, lines, out):
+        """Writes the websites each contact was found on, as one line of JSON per contact.
+
+        Pre:
+            lines: emails or SNS links
+            out: text file the websites are written to
+        Post:
+            websites written and flushed one line at a time, count updated after each contact
+        Return:
+            None
+        """
+
+        for contact in lines:
+            out.write(json.dumps({'contact': contact, 'sites': self._index.sites(contact)}) + '\n')
+            out.flush()
+            self._count += 1
+
+def parse_args(argv=None):
+    """Parses the command line.
+
+    Pre:
+        argv: arguments without the program name, sys.argv[1:] if None
+    Post:
+        usage printed and program exited if the arguments are invalid
+    Return:
+        argparse namespace of the arguments
+    """
+
+    parser = argparse.ArgumentParser(description='Scrape the contacts of websites without Google Sheets, writing one result per line.')
+    parser.add_argument('operation', choices=WebContactBatch.operations + ('lookup',),
+                        help='web-of-web-search: websites listed on the websites of a Google Search, '
+                             'web-search: websites of a Google Search, web: the given websites, '
+                             'lookup: websites of the contact index each given contact was found on')
+    parser.add_argument('inputs', nargs='*', default=['-'],
+                        help="files with one keyphrase, website or contact per line, '-' for stdin (default)")
+    parser.add_argument('-o', '--output', default='-', help="file the results are written to, '-' for stdout (default)")
+    parser.add_argument('-f', '--format', choices=['jsonl', 'csv'], default='jsonl', help='format of the results (default: jsonl)')
+    parser.add_argument('--workers', type=int, default=8, help='websites scraped at the same time (default: 8)')
+    parser.add_argument('--parse-processes', type=int, default=0, help='processes parsing fetched pages (default: 0, parsed by the scraping threads)')
+    parser.add_argument('--processes', type=int, default=0,
+                        help='worker processes scraping websites, each with its own workers (default: 0, scraped by this process)')
+    parser.add_argument('--queue', default=ScrapeWorker.queue_path,
+                        help='path of the job queue of the worker processes, which workers on other machines can share (default: %(default)s)')
+    parser.add_argument('--run', help='id of the run of the worker processes in the job queue, given again to resume a scrape stopped early')
+    parser.add_argument('--max-concurrency', type=int, default=WebsiteContacts.max_concurrency, help='pages fetched at the same time per website (default: %(default)s)')
+    parser.add_argument('--max-pages', type=int, default=WebsiteContacts.max_pages, help='pages fetched per website (default: %(default)s)')
+    parser.add_argument('--max-depth', type=int, default=WebsiteContacts.max_depth, help='links followed from the homepage (default: %(default)s)')
+    parser.add_argument('--no-sitemaps', action='store_true', help='crawl every website from its homepage without reading robots.txt and its sitemaps')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds to wait for a server before a fetch fails (default: 30)')
+    parser.add_argument('--max-bytes', type=int, default=2 * 1024 * 1024, help='bytes of a page after which it is cut off (default: 2 MB)')
+    parser.add_argument('--host-rate', type=float, default=4.0, help='requests per second per host (default: 4)')
+    parser.add_argument('--host-in-flight', type=int, default=4, help='requests in flight per host (default: 4)')
+    parser.add_argument('--max-in-flight', type=int, default=64, help='requests in flight over all hosts (default: 64)')
+    parser.add_argument('--http2', action='store_true', help='use HTTP/2 if httpx and h2 are installed')
+    parser.add_argument('--cache-path', default='ResponseCache.sqlite3', help='path of the response cache (default: %(default)s)')
+    parser.add_argument('--cache-ttl', type=float, default=12 * 60 * 60, help='seconds a cached page is used without revalidation (default: 12 hours)')
+    parser.add_argument('--no-cache', action='store_true', help='do not cache responses')
+    parser.add_argument('--search-interval', type=float, default=GoogleSearch.search_interval,
+                        help='seconds between two Google Searches of all processes (default: %(default)s)')
+    parser.add_argument('--search-cache-ttl', type=float, default=GoogleSearch.cache_ttl,
+                        help='seconds the results of a Google Search are reused (default: 7 days)')
+    parser.add_argument('--no-search-cache', action='store_true', help='search again keyphrases that were already searched')
+    parser.add_argument('--contact-index', default='ContactIndex.sqlite3',
+                        help='path of the index of the contacts found on every website (default: %(default)s)')
+    parser.add_argument('--no-contact-index', action='store_true', help='do not keep the contacts in the contact index')
+    parser.add_argument('--dedup-contacts', action='store_true',
+                        help='write a contact only for the first website of the contact index it was found on')
+    parser.add_argument('--metrics', help='Prometheus text file the metrics of the run are written to')
+    parser.add_argument('--trace', help='JSON file the timed spans of each website are written to')
+    parser.add_argument('--profile', help='file the cProfile statistics of the run are written to, read with pstats')
+    parser.add_argument('--trace-memory', help='file the largest allocations traced by tracemalloc are written to')
+    args = parser.parse_args(argv)
+    if args.no_contact_index and (args.dedup_contacts or args.operation == 'lookup'):
+        parser.error('--dedup-contacts and lookup need the contact index')
+    return args
+
+def main(argv=None):
+    """Runs an operation from the command line.
+
+    Pre:
+        argv: arguments without the program name, sys.argv[1:] if None
+    Post:
+        results written to the output, messages and a summary written to stderr
+    Return:
+        exit status of the program
+    """
+
+    args = parse_args(argv)
+    cache_path = args.cache_path
+    if args.no_cache:
+        cache_path = None
+    configure(timeout=args.timeout, http2=args.http2, cache_path=cache_path, cache_ttl=args.cache_ttl, max_bytes=args.max_bytes,
+              host_rate=args.host_rate, host_in_flight=args.host_in_flight, max_in_flight=args.max_in_flight)
+    WebsiteContacts.max_pages = args.max_pages
+    WebsiteContacts.max_depth = args.max_depth
+    WebsiteContacts.use_sitemaps = not args.no_sitemaps
+    GoogleSearch.search_interval = args.search_interval
+    GoogleSearch.cache_ttl = args.search_cache_ttl
+    if args.no_search_cache:
+        GoogleSearch.cache_path = None
+    ScrapeWorker.queue_path = args.queue
+    ScrapeWorker.run_id = args.run
+
+    index = None
+    if not args.no_contact_index:
+        index = ContactIndex(args.contact_index)
+
+    metrics = start_run(args.metrics, args.trace, args.profile, args.trace_memory)
+    batch = WebContactBatch(args.workers, args.parse_processes, args.max_concurrency, index, args.dedup_contacts, args.processes)
+    if args.output == '-':
+        out = sys.stdout
+    else:
+        out = open(args.output, 'w', encoding='utf-8', newline='')
+
+    start = time.perf_counter()
+    status = 0
+    try:
+        # messages of the scrapers go to stderr so that stdout only has results
+        with contextlib.redirect_stdout(sys.stderr):
+            if args.operation == 'lookup':
+                batch.lookup(batch.read_lines(args.inputs), out)
+            else:
+                results = batch.scrape(args.operation, batch.read_lines(args.inputs))
+                try:
+                    batch.write(results, out, args.format)
+                finally:
+                    results.close()
+    except KeyboardInterrupt:
+        status = 130
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        if index != None:
+            index.close()
+        metrics.finish()
+    if args.operation == 'lookup':
+        print('Looked up {} contacts in {:.1f} s.'.format(batch.count, time.perf_counter() - start), file=sys.stderr)
+    else:
+        print('Scraped {} websites in {:.1f} s.'.format(batch.count, time.perf_counter() - start), file=sys.stderr)
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
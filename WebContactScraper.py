@@ -1,165 +1,437 @@
 # Demo file for Spyder Tutorial
 # Hans Fangohr, University of Southampton, UK
 
-import requests
-from bs4 import BeautifulSoup
-import re
-from sortedcontainers import SortedSet
+import time
+import queue
+import threading
+from HttpClient import get_client
+from ContactExtractor import ContactExtractor
+from LinkExtractor import LinkExtractor
+from CrawlFrontier import CrawlFrontier
+from ContactRecord import ContactRecord
+from CrawlMetrics import get_metrics
+from DomainResolver import get_resolver
+from SitemapDiscovery import SitemapDiscovery
+from concurrent.futures import ThreadPoolExecutor
 
 class WebsiteContacts:
     """
     The WebsiteContacts module is used to extract contact information from a website given a url.
     Given a url, the module will extract the emails, facebooks, instragrams, twitters, and linkedins
-    on all pages of a website containing 'about' or 'contact' in the relative url.
+    on all pages of a website containing 'about' or 'contact' in the relative url or link text.
     """
     
-    def __init__(self, url="", emails=None, facebooks=None, instagrams=None, twitters=None, linkedins=None):
-        self._url = url
+    # default number of pages of a single website fetched at the same time
+    max_concurrency = 8
+    # maximum number of pages of a single website fetched
+    max_pages = 200
+    # number of links between the homepage and the deepest page fetched
+    max_depth = 2
+    # number of contact pages with contacts after which no more pages are fetched
+    contact_yield = 3
+    # whether the contact pages listed by the sitemaps are fetched before the website is crawled
+    use_sitemaps = True
+    # extractor of the contacts of a webpage, shared by all websites
+    __extractor = ContactExtractor()
+    
+    def __init__(self, url="", emails=None, facebooks=None, instagrams=None, twitters=None, linkedins=None, max_concurrency=None, parse_pool=None, journal=None):
+        if max_concurrency != None:
+            self.max_concurrency = max_concurrency
+        # executor that parses fetched pages, parsed in the calling thread if None
+        self._parse_pool = parse_pool
+        # CrawlJournal recording the fetched pages, from which an interrupted crawl resumes, none if None
+        self._journal = journal
         emptyCnt = 0
-        if emails == None:
-            emails = SortedSet()
-            emptyCnt += 1
-        if facebooks == None:
-            facebooks = SortedSet()
-            emptyCnt += 1
-        if instagrams == None:
-            instagrams = SortedSet()
-            emptyCnt += 1
-        if twitters == None:
-            twitters = SortedSet()
-            emptyCnt += 1
-        if linkedins == None:
-            linkedins = SortedSet()
-            emptyCnt += 1
-          
-        self._emails = emails
-        self._facebooks = facebooks
-        self._instagrams = instagrams
-        self._twitters = twitters
-        self._linkedins = linkedins
+        contacts = [emails, facebooks, instagrams, twitters, linkedins]
+        for i in range(len(contacts)):
+            if contacts[i] == None:
+                contacts[i] = ()
+                emptyCnt += 1
+        
+        # compact record of the url and contacts, sorted once the crawl is done
+        self._record = ContactRecord(url, *contacts)
         
         # only find contacts if all fields other than url are empty
         if url != "" and emptyCnt == 5:
-            self.__find_contacts()
+            self.find_contacts()
     
-    def __sorted_set_to_string(self, convert_set):
-        """Converts the sorted set to a string with values separated by commas.
+    @classmethod
+    async def create(cls, url, max_concurrency=None, parse_pool=None, journal=None):
+        """Creates a WebsiteContacts object and finds its contacts without blocking the event loop.
         
         Pre:
-            self: WebsiteContacts object
-            convert_set: the set to be converted
+            cls: WebsiteContacts class
+            url: root URL of the website
+            max_concurrency: number of pages fetched at the same time, class default if None
+            parse_pool: executor that parses fetched pages, parsed in the event loop if None
+            journal: CrawlJournal recording the fetched pages, from which an interrupted crawl resumes, none if None
         Post:
             None
         Return:
-            returnStr: the formatted string from the convert_set
+            contacts: WebsiteContacts object with the contacts of the website
         """
-        returnStr = ''
-        for i in range(len(convert_set)):
-            returnStr += convert_set[i] + ', '
-        returnStr = returnStr[:len(returnStr)-2]
-        return returnStr
+        
+        contacts = cls(max_concurrency=max_concurrency, parse_pool=parse_pool, journal=journal)
+        contacts._record.url = url
+        await contacts.find_contacts_async()
+        return contacts
+    
+    @classmethod
+    def scrape_many(cls, urls, workers=8, parse_processes=0, max_concurrency=None, journal=None, processes=0):
+        """Scrapes many websites at once. The websites are crawled by a pool of threads, and the fetched pages
+        are optionally parsed by a pool of processes so that parsing is not limited to one core. With several
+        processes, each process crawls websites of a shared ScrapeWorker queue with its own pool of threads.
+        
+        Pre:
+            cls: WebsiteContacts class
+            urls: iterable of the root URLs of the websites, read as websites finish
+            workers: number of websites crawled at the same time
+            parse_processes: number of processes parsing pages, pages parsed by the crawling threads if 0
+            max_concurrency: number of pages fetched at the same time per website, class default if None
+            journal: CrawlJournal recording the fetched pages, from which an interrupted crawl resumes, none if None, nor with processes
+            processes: number of worker processes crawling the websites, crawled by this process if 0
+        Post:
+            a message is printed for every website that could not be scraped
+        Return:
+            generator of WebsiteContacts objects, in the order the websites finish
+        """
+        
+        if processes > 0:
+            # imported only when needed, as it imports this module
+            from ScrapeWorker import ScrapeWorker
+            settings = ScrapeWorker.settings(workers, parse_processes, max_concurrency)
+            for record in ScrapeWorker.scrape(urls, processes, settings=settings):
+                contacts = cls(max_concurrency=max_concurrency)
+                contacts._record = record
+                yield contacts
+            return
+        
+        parse_pool = None
+        if parse_processes > 0:
+            # imported only when needed, as it pulls in multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+            parse_pool = ProcessPoolExecutor(max_workers=parse_processes)
+        
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                # finished websites, put there as they finish by a thread reading the urls, so that websites are
+                # yielded while the next url is awaited, e.g. from a search that is still running
+                finished = queue.Queue()
+                # websites submitted but not yielded, at most two per worker so that the urls are read lazily
+                # and memory stays bounded however many websites there are
+                slots = threading.Semaphore(2 * workers)
+                futures = set()
+                stop = threading.Event()
+                # guards futures and stop, which the thread reading the urls and the caller both change
+                lock = threading.Lock()
+                
+                def feed():
+                    count = 0
+                    try:
+                        for url in urls:
+                            slots.acquire()
+                            with lock:
+                                if stop.is_set():
+                                    break
+                                future = executor.submit(cls, url, max_concurrency=max_concurrency, parse_pool=parse_pool, journal=journal)
+                                futures.add(future)
+                            future.add_done_callback(lambda future, url=url: finished.put((url, future)))
+                            count += 1
+                    except BaseException as error:
+                        finished.put((None, (count, error)))
+                        return
+                    finished.put((None, (count, None)))
+                
+                feeder = threading.Thread(target=feed, daemon=True)
+                feeder.start()
+                try:
+                    received = 0
+                    total = None
+                    while total == None or received < total:
+                        url, future = finished.get()
+                        if url == None:
+                            total, error = future
+                            if error != None:
+                                raise error
+                            continue
+                        received += 1
+                        with lock:
+                            futures.discard(future)
+                        slots.release()
+                        try:
+                            contacts = future.result()
+                        except Exception:
+                            print('The website', url, 'could not be scraped.')
+                            continue
+                        yield contacts
+                finally:
+                    # do not start websites that are still queued if the caller stops early
+                    with lock:
+                        stop.set()
+                        queued = list(futures)
+                    slots.release()
+                    for future in queued:
+                        future.cancel()
+        finally:
+            if parse_pool != None:
+                parse_pool.shutdown()
+    
+    @property
+    def record(self):
+        return self._record
     
     @property
     def url(self):
-        return self._url
+        return self._record.url
     
     @url.setter
     def url(self, url):
-        self._url = url
+        self._record.url = url
     
     @property
     def emails(self):
-        return self.__sorted_set_to_string(self._emails)
+        return self._record.emails
     
     @emails.setter
     def emails(self, emails):
-        self._emails = emails
+        self._record.emails = emails
     
     @property
     def facebooks(self):
-        return self.__sorted_set_to_string(self._facebooks)
+        return self._record.facebooks
     
     @facebooks.setter
     def facebooks(self, facebooks):
-        self._facebooks = facebooks
+        self._record.facebooks = facebooks
     
     @property
     def instagrams(self):
-        return self.__sorted_set_to_string(self._instagrams)
+        return self._record.instagrams
     
     @instagrams.setter
     def instagrams(self, instagrams):
-        self._instagrams = instagrams
+        self._record.instagrams = instagrams
     
     @property
     def twitters(self):
-        return self.__sorted_set_to_string(self._twitters)
+        return self._record.twitters
     
     @twitters.setter
     def twitters(self, twitters):
-        self._twitters = twitters
+        self._record.twitters = twitters
         
     @property
     def linkedins(self):
-        return self.__sorted_set_to_string(self._linkedins)
+        return self._record.linkedins
     
     @linkedins.setter
     def linkedins(self, linkedins):
-        self._linkedins = linkedins
+        self._record.linkedins = linkedins
     
+    def to_row(self):
+        """Returns the row of the website, as written to Sheet1.
+        
+        Pre:
+            self: WebsiteContacts object
+        Post:
+            None
+        Return:
+            see ContactRecord.to_row()
+        """
+        
+        return self._record.to_row()
     
-    def __extract_urls(self, html, root):
-        """Extracts all URLs with shared roots from a given webpage.
+    def to_dict(self):
+        """Returns the website as a dictionary.
         
         Pre:
             self: WebsiteContacts object
-            html: html of webpage
-            root: root of URL
         Post:
             None
         Return:
-            URLs: set of URLs associated with the given root
+            see ContactRecord.to_dict()
+        """
+        
+        return self._record.to_dict()
+    
+    
+    @staticmethod
+    def __extract_urls(links, base, domain):
+        """Extracts all URLs on the website of a registrable domain from the links of a given webpage.
+        
+        Pre:
+            links: (href, anchor text) of the links of the webpage
+            base: URL of the webpage, which relative links are resolved against
+            domain: registrable domain of the website, see DomainResolver.resolve()
+        Post:
+            None
+        Return:
+            URLs: dictionary of the URLs on the website to their anchor texts
         """
         
-        #print("Root is:", root)
-        #print()
-        soup = BeautifulSoup(html, 'lxml')
-        
-        urls = set()
-        for a in soup.find_all('a', href=True):
-            if (a['href'].find(root) == 0):
-                urls.add(a['href'])
-                #print("Found URL:", a['href'])
-            # else if only relative URL
-            elif (len(a['href']) > 0 and a['href'][0] == '/'):
-                urls.add(root + a['href'])
-                #print("Found URL:", root + a['href'])
+        resolver = get_resolver()
+        urls = {}
+        for href, text in links:
+            url = LinkExtractor.resolve(base, href)
+            if resolver.same_site(url, domain):
+                if url not in urls or len(urls[url]) == 0:
+                    urls[url] = text
                 
-        #print(urls)
         return urls
     
-    def __decode_email(self, email):
-        """Decodes encoded email.
+    def __fetch_html(self, url):
+        """Fetches the HTML of a webpage.
+        
+        Pre:
+            self: WebsiteContacts object
+            url: URL of the webpage
+        Post:
+            None
+        Return:
+            raw bytes of the HTML of the webpage, or None if the HTML was not extracted
+        """
+        
+        try:
+            with get_metrics().span('fetch', self.url, url=url):
+                return get_client().fetch_html(url)
+        except Exception:
+            print ("HTML from", url, "was not extracted.")
+            return None
+    
+    def __discover(self):
+        """Reads robots.txt and the sitemaps of the website for its contact pages.
         
         Pre:
             self: WebsiteContacts object
-            email: encoded email
         Post:
             None
         Return:
-            decoded: decoded email
+            SitemapDiscovery object of the website, or None if it failed
         """
         
-        decoded = ''
-        key = int(email[:2], 16)
+        discovery = SitemapDiscovery(self.url)
+        start = time.perf_counter()
+        try:
+            discovery.discover()
+        except Exception:
+            get_metrics().count('errors', stage='discover')
+            return None
+        seconds = time.perf_counter() - start
+        metrics = get_metrics()
+        metrics.observe('discover', seconds)
+        metrics.add_span('discover', start, seconds, self.url, requests=discovery.requests, candidates=len(discovery.candidates))
+        return discovery
     
-        for i in range(2, len(email)-1, 2):
-            decoded += chr(int(email[i:i+2], 16)^key)   # ^ stands for XOR
+    def __stream_page(self, url, domain, contact_page):
+        """Fetches a webpage and parses it while it streams in, so the page is never fully in memory.
+        
+        Pre:
+            self: WebsiteContacts object
+            url: URL of the webpage
+            domain: registrable domain of the website to extract the links of, or None to not extract links
+            contact_page: whether to extract the contacts of the webpage
+        Post:
+            None
+        Return:
+            see _parse_page(), or None if the HTML was not extracted
+        """
+        
+        timings = {}
+        start = time.perf_counter()
+        try:
+            result = WebsiteContacts._parse_page(url, get_client().stream(url), domain, contact_page, timings)
+        except Exception:
+            get_metrics().count('errors', stage='fetch')
+            print ("HTML from", url, "was not extracted.")
+            return None
+        
+        # the page is fetched, parsed and extracted at once, so the time of each stage is summed up
+        metrics = get_metrics()
+        for stage, seconds in timings.items():
+            metrics.observe(stage, seconds)
+        metrics.add_span('page', start, time.perf_counter() - start, self.url, url=url, contact_page=contact_page, **timings)
+        return result
     
-        return decoded
+    @staticmethod
+    def _parse_page(url, chunks, domain, contact_page, timings=None):
+        """Parses a webpage. Kept free of instance state so that it can run in another process.
+        
+        Pre:
+            url: URL of the webpage
+            chunks: iterable of raw bytes of consecutive parts of the webpage
+            domain: registrable domain of the website to extract the links of, or None to not extract links
+            contact_page: whether to extract the contacts of the webpage
+            timings: dictionary the seconds spent waiting for chunks ('fetch'), extracting links ('parse') and
+                     extracting contacts ('extract') are added to, not timed if None
+        Post:
+            timings updated
+        Return:
+            page: ContactRecord object with the contacts of the webpage
+            urls: dictionary of the URLs on the website to their anchor texts
+        """
+        
+        # the links are extracted while the contacts are
+        links = LinkExtractor()
+        clock = time.perf_counter
+        spent = {'fetch': 0.0, 'parse': 0.0}
+        def read():
+            iterator = iter(chunks)
+            while True:
+                start = clock()
+                chunk = next(iterator, None)
+                spent['fetch'] += clock() - start
+                if chunk == None:
+                    return
+                if domain != None:
+                    start = clock()
+                    links.feed(chunk)
+                    spent['parse'] += clock() - start
+                yield chunk
+        
+        page = ContactRecord(url)
+        start = clock()
+        if contact_page:
+            page.update(*WebsiteContacts.__extractor.extract_chunks(read()))
+        else:
+            for chunk in read():
+                pass
+        # the rest of the time reading the page went to extracting the contacts
+        extract_secs = max(0.0, clock() - start - spent['fetch'] - spent['parse'])
+        urls = {}
+        if domain != None:
+            start = clock()
+            urls = WebsiteContacts.__extract_urls(links.close(with_text=True), url, domain)
+            spent['parse'] += clock() - start
+        
+        if timings != None:
+            timings['fetch'] = timings.get('fetch', 0.0) + spent['fetch']
+            if domain != None:
+                timings['parse'] = timings.get('parse', 0.0) + spent['parse']
+            if contact_page:
+                timings['extract'] = timings.get('extract', 0.0) + extract_secs
+        return page, urls
     
-    def __find_contacts(self):
-        """Finds emails of a blog given the root URL.
+    def find_contacts(self):
+        """Finds the contacts of the website, blocking until the crawl is finished.
+        
+        Pre:
+            self: WebsiteContacts object
+        Post:
+            see find_contacts_async()
+        Return:
+            None
+        """
+        
+        import asyncio
+        asyncio.run(self.find_contacts_async())
+    
+    async def find_contacts_async(self):
+        """Finds emails of a blog given the root URL. The contact pages listed by the sitemaps of the website
+        are fetched first, and the website is only crawled from its homepage if they have no contacts. Pages
+        are fetched from a CrawlFrontier, most likely contact page first, with at most max_concurrency pages
+        of the website in flight at once. The links of each page are followed up to max_depth unless
+        robots.txt disallows them, and the crawl stops early once contact_yield contact pages with contacts
+        were found.
         
         Pre: 
             self - WebsiteContacts object
@@ -169,95 +441,104 @@ class WebsiteContacts:
             self.instagrams: updated set of instagrams
             self.twitters: updated set of twitters
             self.twitters: updated set of linkedins
+            the contacts are sorted once the crawl is done, and the time of the crawl and of each of its pages
+            recorded in the CrawlMetrics of the run
         Return:
             None
         """
         
-        # find domain start given root URL
-        domain_start = 0
-        for i in range(len(self._url)-1, 0, -1):
-            if self._url[i] == ".":
-                domain_start = i
-                break
-        # find domain end given root URL
-        domain_end = 0
-        for i in range(len(self._url)-1, domain_start, -1):
-            if self._url[i] == '/':
-                domain_end = i
-                break
-        if domain_end == 0:
-            domain_end = len(self._url)-1
-        
-        domain = self._url[domain_start : domain_end]
-                
-        # setup for while loop conditions
-        visited = set()
-        urls = [self._url]
-        i = 0
-        
-        while i < min(200, len(urls)):
-            url = urls[i]
-            i += 1
-            
-            # if URL in visited then skip to the next iteration
-            if url in visited:
-                continue
-            # otherwise add the URL to set of visited URLs
-            visited.add(url)
+        start = time.perf_counter()
+        
+        # links are followed when they are on the registrable domain of the website, e.g. example.co.uk
+        domain = get_resolver().domain(self.url)
+        
+        import asyncio
+        loop = asyncio.get_running_loop()
+        frontier = CrawlFrontier(self.max_pages, self.max_depth)
+        contact_pages = 0
+        
+        # pages fetched before the crawl was interrupted are not fetched again, and their links are followed
+        links = []
+        if self._journal != None:
+            for url, depth, contact_page, contacts, next_urls in self._journal.pages(self.url):
+                frontier.skip(url)
+                page = ContactRecord(url, **contacts)
+                self._record.merge(page)
+                if contact_page and len(page) > 0:
+                    contact_pages += 1
+                links += [(next_url, text, depth + 1) for next_url, text in next_urls.items()]
+        
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
             
-            # print URL to be tried
-            #print("Trying:", url);
+            robots = None
+            crawled = True
+            if self.use_sitemaps:
+                discovery = await loop.run_in_executor(executor, self.__discover)
+                if discovery != None:
+                    robots = discovery.robots
+                    # the links of the contact pages of the sitemaps are not followed, the crawl does that
+                    for url in discovery.candidates:
+                        frontier.push(url, '', frontier.max_depth)
+                    crawled = len(discovery.candidates) == 0
+            if crawled and (robots == None or robots.allowed(self.url)):
+                frontier.push(self.url)
+            for url, text, depth in links:
+                if robots == None or robots.allowed(url):
+                    frontier.push(url, text, depth)
             
-            try:
-                html = requests.get(url, headers = {"User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_11_2) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/47.0.2526.80 Safari/537.36"}).text
-            except:
-                print ("HTML from", url, "was not extracted.")
-                # if HTML was not extracted, continue to next iteration
-                continue
+            async def fetch(url, domain, contact_page):
+                if self._parse_pool != None:
+                    # the whole page is sent to the parsing process
+                    html = await loop.run_in_executor(executor, self.__fetch_html, url)
+                    if html == None:
+                        return None
+                    with get_metrics().span('parse', self.url, url=url):
+                        return await loop.run_in_executor(self._parse_pool, WebsiteContacts._parse_page, url, [html], domain, contact_page)
+                return await loop.run_in_executor(executor, self.__stream_page, url, domain, contact_page)
             
-            if len(re.findall('(contact|about|our team|board of)', url)) != 0:
-                # list of emails found on URL
-                url_emails = re.findall('[a-z0-9-_]+@[a-z0-9-_]+.com', html, re.IGNORECASE)
-                encoded_url_emails = re.findall("data-cfemail=\"[a-z0-9]{38}\"", html)
-                    
-                # list of SNS contact found on URL
-                url_facebooks = re.findall('facebook.com/[@a-z0-9-_]+/?\"', html, re.IGNORECASE)
-                url_instagrams = re.findall('instagram.com/[@a-z0-9-_]+/?\"', html, re.IGNORECASE)
-                url_twitters = re.findall('twitter.com/[@a-z0-9-_]+/?\"', html, re.IGNORECASE)
-                url_linkedins = re.findall('linkedin.com/[@a-z0-9-_]+/?\"', html, re.IGNORECASE)
+            # (url, depth, whether it is a contact page) of the pages in flight
+            in_flight = {}
+            while True:
+                while len(in_flight) < self.max_concurrency and len(frontier) > 0 and contact_pages < self.contact_yield:
+                    url, text, depth = frontier.pop()
+                    contact_page = frontier.is_contact_page(url, text)
+                    # only extract the links of pages that are not at the maximum depth
+                    link_domain = None
+                    if depth < frontier.max_depth:
+                        link_domain = domain
+                    task = asyncio.ensure_future(fetch(url, link_domain, contact_page))
+                    in_flight[task] = (url, depth, contact_page)
+                if len(in_flight) == 0:
+                    # the website is crawled after all if the contact pages of the sitemaps had no contacts
+                    if not crawled and contact_pages == 0 and (robots == None or robots.allowed(self.url)):
+                        crawled = True
+                        frontier.push(self.url)
+                        continue
+                    break
                 
-                # find email contacts
-                for email in url_emails:
-                    self._emails.add(email.lower())
-                for email in encoded_url_emails:
-                    self._emails.add(self.__decode_email(email[-39:-1]).lower())
-                
-                # find SNS contacts
-                for facebook in url_facebooks:
-                    if (facebook[-2 : -1] == '/'):
-                        self._facebooks.add(facebook.lower()[:-2])
-                    else:
-                        self._facebooks.add(facebook.lower()[:-1])
-                for instagram in url_instagrams:
-                    if (instagram[-2 : -1] == '/'):
-                        self._instagrams.add(instagram.lower()[:-2])
-                    else:
-                        self._instagrams.add(instagram.lower()[:-1])
-                for twitter in url_twitters:
-                    if (twitter[-2 : -1] == '/'):
-                        self._twitters.add(twitter.lower()[:-2])
-                    else:
-                        self._twitters.add(twitter.lower()[:-1])
-                for linkedins in url_linkedins:
-                    if (linkedins[-2 : -1] == '/'):
-                        self._linkedins.add(linkedins.lower()[:-2])
-                    else:
-                        self._linkedins.add(linkedins.lower()[:-1])
-            
-            # look for additional URLs only if its the first iteration
-            if i == 1:
-                for next_urls in self.__extract_urls(html, url[:url.find(domain)+4]):
-                    urls.append(next_urls);
+                done, pending = await asyncio.wait(list(in_flight), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    url, depth, contact_page = in_flight.pop(task)
+                    result = task.result()
+                    if result == None:
+                        continue
+                    page, next_urls = result
+                    if self._journal != None:
+                        self._journal.record_page(self.url, url, depth, contact_page, page, next_urls)
+                    self._record.merge(page)
+                    if contact_page and len(page) > 0:
+                        contact_pages += 1
+                    for next_url, text in next_urls.items():
+                        if robots == None or robots.allowed(next_url):
+                            frontier.push(next_url, text, depth + 1)
+        
+        self._record.freeze()
+        
+        seconds = time.perf_counter() - start
+        metrics = get_metrics()
+        metrics.count('websites')
+        metrics.observe('site', seconds)
+        metrics.add_span('site', start, seconds, self.url, contacts=len(self._record), contact_pages=contact_pages)
     
     def __repr__(self):
         """Convert to formal string, for repr().
@@ -271,7 +552,8 @@ class WebsiteContacts:
 
         """
         
-        return "WebsiteContacts({}, {}, {}, {}, {}, {})".format(self._url, self._emails, self._facebooks, self._instagrams, self._twitters, self._linkedins)
+        record = self._record.freeze()
+        return "WebsiteContacts({}, {}, {}, {}, {}, {})".format(self.url, *[record.contacts(field) for field in record.fields])
                 
     def return_contacts(self, contacts):
         """The contacts of the contact type are printed.
@@ -304,13 +586,8 @@ class WebsiteContacts:
             None
         """
         
-        returnStr = 'URL: ' + self.url + '\n'
-        returnStr += 'Email(s):\n' + self.return_contacts(self._emails) + '\n'
-        returnStr += 'Facebook(s):\n' + self.return_contacts(self._facebooks) + '\n'
-        returnStr += 'Instagram(s):\n' + self.return_contacts(self._instagrams) + '\n'
-        returnStr += 'Twitter(s):\n' + self.return_contacts(self._twitters) + '\n'
-        returnStr += 'LinkedIn(s):\n' + self.return_contacts(self._linkedins)
-        return returnStr
+        # formatted once and cached by the record
+        return str(self._record)
 
 
 if __name__ == '__main__':
@@ -1,152 +1,195 @@
-import gspread
-from oauth2client.service_account import ServiceAccountCredentials
 from WebContactScraper import WebsiteContacts
-from GoogleSearchWebScraper import GoogleSearch
-import csv
-import sys
-import os
-from sortedcontainers import SortedSet
+from SheetsStore import SheetsStore
+from CrawlJournal import CrawlJournal
+from ContactIndex import ContactIndex
+from ScrapePipeline import ScrapePipeline
+from CrawlMetrics import get_metrics, start_run
+import time
+import atexit
+import threading
 
 class WebContactSheet:
     """
     The WebContactSheetManager manages the contact gathered from the WebContactScraper module. In a
     Google Sheets file, the contacts are formatted by url, emails, Facebooks, Instagrams, Twitters, and
-    LinkedIns.
+    LinkedIns. The inputs and contacts are read and written through a ContactStore, which can also be a
+    local SQLiteStore, or a SheetsStore on a FakeSheets client to run offline.
     """
     
-    scope = ['https://spreadsheets.google.com/feeds', 'https://www.googleapis.com/auth/drive']
-    creds = ServiceAccountCredentials.from_json_keyfile_name('credentials.json', scope)
-    # note that in the online gspread docs, 'gc' is used instead of 'client'
-    client = gspread.authorize(creds)
-    # parameter for open is name of sheet
-    # sheet1 specifies the sheet number sheet on the sheet to get access
+    # number of websites scraped at the same time
+    workers = 8
+    # number of processes parsing fetched pages, parsed by the scraping threads if 0
+    parse_processes = 0
+    # number of worker processes scraping websites, each with its own workers, scraped by this process if 0
+    processes = 0
+    # number of buffered rows that triggers a write to Sheet1
+    flush_row_count = 200
+    # seconds after the last write to Sheet1 that trigger a write of the buffered rows
+    flush_seconds = 30
+    # SQLite file recording the progress of the operations, so an interrupted operation can be resumed
+    journal_path = 'CrawlJournal.sqlite3'
+    # SQLite file of the contacts found on every website over all runs, see ContactIndex(), not kept if None
+    contact_index_path = 'ContactIndex.sqlite3'
+    # whether a contact is only written for the first website it was found on
+    dedup_contacts = False
+    # files the CrawlMetrics of each operation are written to, see CrawlMetrics(), not written if None
+    metrics_path = None
+    trace_path = None
+    profile_path = None
+    memory_path = None
     
     # test file_name is 'Contacts'
-    def __init__(self, file_name):
+    def __init__(self, file_name=None, store=None):
         """Sets up the Google Sheet file.
         
         Pre:
-            file_name: name of the file to access
+            file_name: name of the Google Sheets file to access when no store is given
+            store: ContactStore of the inputs and contacts, a SheetsStore of file_name if None
         Post:
-            Sheet1 and Sheet2 are linked to the WebContactSheet class. While Sheet1 provides the 
-            extracted contact info, Sheet2 takes the keywords for a Google Search to find relevant
-            websites to extract contact info from.
+            Sheet1, Sheet2, Sheet3 and Sheet4 are linked to the WebContactSheet class. While Sheet1 provides
+            the extracted contact info, Sheet2, Sheet3 and Sheet4 take the inputs of the three operations.
 
-            - If no header is added to Sheet1 and/or Sheet2, then the respective header(s) will be added.
+            - If no header is added to a sheet, then the header will be added.
             - If contact info and search keywords are already on the respectie sheets, the initialization
               will update the row to insert the next contact info or search keywords.
         Return:
             None
         """
         
-        self._file_names_sheet = self.client.open('ExistingFileNames').get_worksheet(0)
-        
-        # check whether the file_name is unique
-        not_unique = True
-        name = file_name
-        while not_unique:
-            unique_file_names = self._file_names_sheet.col_values(1)
-            for unique_file_name in unique_file_names:
-                if name == unique_file_name:
-                    while True:
-                        confirm = input('That file name already exists. Would you like to proceed? (Y/N): ').upper()
-                        if confirm == 'Y':
-                            not_unique = False
-                            break
-                        elif confirm == 'N':
-                            sys.exit(0)
-                not_unique = False
-        
-        four_sheets_warning = input('The file must contain 4 sheets for the program to work. Hit <ENTER> to proceed.')
-            
-        while True:
-            try:
-                # define sheets
-                self._sheet1 = self.client.open(file_name).get_worksheet(0)
-                self._sheet2 = self.client.open(file_name).get_worksheet(1)
-                self._sheet3 = self.client.open(file_name).get_worksheet(2)
-                self._sheet4 = self.client.open(file_name).get_worksheet(3)
-                
-                # insert header for sheet1 if not already added
-                header1 = self._sheet1.row_values(1)
-                if len(header1) == 0:
-                    # inserting header row
-                    header_row = ['url', 'emails', 'facebooks', 'instagrams', 'twitters', 'linkedins']
-                    self._sheet1.insert_row(header_row, 1)
-                
-                # insert header for sheet2 if not already added
-                header2 = self._sheet2.row_values(1)
-                if len(header2) == 0:
-                    # inserting header row
-                    header_row = ['keyphrase', 'status']
-                    self._sheet2.insert_row(header_row, 1)
-                    
-                # insert header for sheet2 if not already added
-                header3 = self._sheet3.row_values(1)
-                if len(header3) == 0:
-                    # inserting header row
-                    header_row = ['keyphrase', 'status']
-                    self._sheet3.insert_row(header_row, 1)
-                    
-                # insert header for sheet2 if not already added
-                header4 = self._sheet4.row_values(1)
-                if len(header4) == 0:
-                    # inserting header row
-                    header_row = ['website', 'status']
-                    self._sheet4.insert_row(header_row, 1)
-                
-                # define the number of urls
-                self._num_urls = 0
-                idx = 2
-                url = self._sheet1.cell(idx, 1).value
-                while url != '':
-                    idx += 1
-                    url = self._sheet1.cell(idx, 1).value
-                self._num_urls = idx-2
-                
-                # list of new keyphrases written in Sheet2
-                self._sheet2_keyphrases = []
-                # define the number of searches, append searches to _sheet2_search_keyphrases
-                self._sheet2_num_keyphrases = 0
-                idx = 2
-                search = self._sheet2.cell(idx, 1).value
-                while search != '':
-                    self._sheet2_keyphrases.append(search)
-                    self._sheet2.update_cell(idx, 2, 'to scrape')
-                    idx += 1
-                    search = self._sheet2.cell(idx, 1).value
-                self._sheet2_num_keyphrases = idx-2
-                
-                # list of new keyphrases written in Sheet3
-                self._sheet3_keyphrases = []
-                # define the number of searches, append searches to _sheet3_search_keyphrases
-                self._sheet3_num_keyphrases = 0
-                idx = 2
-                search = self._sheet3.cell(idx, 1).value
-                while search != '':
-                    self._sheet3_keyphrases.append(search)
-                    self._sheet3.update_cell(idx, 2, 'to scrape')
-                    idx += 1
-                    search = self._sheet3.cell(idx, 1).value
-                self._sheet3_num_keyphrases = idx-2
-                
-                # list of new websites written in Sheet4
-                self._sheet4_websites = []
-                # define the number of searches, append searches to _sheet2_search_keyphrases
-                self._sheet4_num_websites = 0
-                idx = 2
-                search = self._sheet4.cell(idx, 1).value
-                while search != '':
-                    self._sheet4_websites.append(search)
-                    self._sheet4.update_cell(idx, 2, 'to scrape')
-                    idx += 1
-                    search = self._sheet4.cell(idx, 1).value
-                self._sheet4_num_websites = idx-2
-            
-                break
-            except:
-                pause = input('The file does not contain 4 sheets. Once the file contains 4 sheets, hit <ENTER> to proceed.')
-                    
+        if store == None:
+            store = SheetsStore(file_name)
+        self._store = store
+        # websites found by the searches are checked against the store by the thread reading them
+        self._store_lock = threading.RLock()
+        # define the number of urls
+        self._num_urls = len(self._store)
+        
+        self._journal = CrawlJournal(self.journal_path)
+        # operation whose progress is being recorded in the journal
+        self._operation = None
+        self._index = None
+        if self.contact_index_path != None:
+            self._index = ContactIndex(self.contact_index_path)
+            atexit.register(self._index.close)
+        self._last_flush = time.monotonic()
+        # buffered rows are written even if the program exits early
+        atexit.register(self.flush_rows)
+    
+    def __buffer_row(self, row):
+        """Buffers a row with the contacts of a website, writing the buffer once it is full or old enough.
+        
+        Pre:
+            row: url, emails, Facebooks, Instagrams, Twitters and LinkedIns of the scraped website
+        Post:
+            row buffered by the store, buffered rows written if flush_row_count or flush_seconds is reached
+        Return:
+            None
+        """
+        
+        with self._store_lock:
+            self._store.upsert(row)
+        if self._store.num_pending >= self.flush_row_count or time.monotonic() - self._last_flush >= self.flush_seconds:
+            self.flush_rows()
+    
+    def flush_rows(self):
+        """Writes the buffered changes to Sheet1, appending new websites and updating re-scraped websites in place.
+        
+        Pre:
+            None
+        Post:
+            buffered changes written by the store, to Sheet1 with at most one append and one update request
+        Return:
+            None
+        """
+        
+        self._last_flush = time.monotonic()
+        with self._store_lock, get_metrics().span('sheets_write', rows=self._store.num_pending):
+            self._store.flush()
+        if self._operation != None:
+            self._journal.mark_written(self._operation)
+        
+        # update number of urls
+        self._num_urls = len(self._store)
+    
+    def __contacts_row(self, website_contacts):
+        """Builds the Sheet1 row of a scraped website.
+        
+        Pre:
+            website_contacts: WebsiteContacts object of the scraped website
+        Post:
+            contacts of the website added to the contact index
+        Return:
+            row: url, emails, Facebooks, Instagrams, Twitters and LinkedIns of the website, without the
+                 contacts found on other websites before if dedup_contacts is set
+        """
+        
+        record = website_contacts.record
+        if self._index != None:
+            new_record = self._index.add(record)
+            if self.dedup_contacts:
+                record = new_record
+        return record.to_row()
+    
+    def __begin(self, operation):
+        """Starts recording the progress of an operation in the journal.
+        
+        Pre:
+            operation: name of the operation
+        Post:
+            a message is printed if an interrupted run of the operation is resumed, and the metrics of the
+            operation are recorded from now on
+        Return:
+            None
+        """
+        
+        start_run(self.metrics_path, self.trace_path, self.profile_path, self.memory_path)
+        self._operation = operation
+        if self._journal.is_resuming(operation):
+            print('Resuming the interrupted operation from', self.journal_path + '.')
+    
+    def __outstanding(self, operation, websites, skip_stored=False):
+        """Records the websites of an operation in the journal as they are read and returns the websites still
+        to scrape. The rows of websites scraped before an interruption but not yet written are buffered again.
+        
+        Pre:
+            operation: name of the operation
+            websites: iterable of the URLs of the websites of the operation, read lazily
+            skip_stored: whether websites whose contacts are already stored are skipped
+        Post:
+            rows of scraped websites buffered
+        Return:
+            generator of the URLs of the websites that have not been scraped yet, in the given order, recording
+            each website in the journal as it is read
+        """
+        
+        for url, row in self._journal.websites(operation, 'scraped'):
+            self.__buffer_row(row)
+        
+        def outstanding():
+            for website in websites:
+                if skip_stored:
+                    with self._store_lock:
+                        if website in self._store:
+                            continue
+                self._journal.add_websites(operation, [website])
+                if self._journal.status(operation, website) == 'pending':
+                    yield website
+        return outstanding()
+    
+    def __finish(self, operation):
+        """Stops recording the progress of a finished operation and forgets it.
+        
+        Pre:
+            operation: name of the operation
+        Post:
+            progress of the operation deleted from the journal, and its metrics written
+        Return:
+            None
+        """
+        
+        self._journal.finish(operation)
+        self._operation = None
+        get_metrics().finish()
     
     def append_row(self, url):
         """Scrapes the website of the given url, then appends a row with the scraped contacts to the sheets.
@@ -159,29 +202,35 @@ class WebContactSheet:
             None
         """
         
-        tmp_website_contacts = WebsiteContacts(url)
-        row = [tmp_website_contacts.url, tmp_website_contacts.emails, tmp_website_contacts.facebooks, tmp_website_contacts.instagrams, tmp_website_contacts.twitters, tmp_website_contacts.linkedins]
-        self._sheet1.insert_row(row, self._num_urls + 2)
-        
-        # update number of urls
-        self._num_urls += 1
+        self.__buffer_row(self.__contacts_row(WebsiteContacts(url)))
+        self.flush_rows()
     
     def append_rows(self, urls):
-        """Scrapes the website of the given urls, then appends a row with the scraped contacts to the sheets.
+        """Scrapes the websites of the given urls at the same time, then appends a row with the scraped contacts
+        to the sheets as each website finishes.
         
         Pre:
             urls: the urls of the websites to have added information
         Post:
-            rows added to Google Sheets
+            rows added to Google Sheets in batches, url of each scraped website printed, and the pages and rows
+            of the websites recorded in the journal if an operation is in progress
         Return:
             None
         """
         
-        for url in urls:
-            tmp_website_contacts = WebsiteContacts(url)
-            row = [tmp_website_contacts.url, tmp_website_contacts.emails, tmp_website_contacts.facebooks, tmp_website_contacts.instagrams, tmp_website_contacts.twitters, tmp_website_contacts.linkedins]
-            self._sheet1.insert_row(row, self._num_urls + 2)
-            self._num_urls += 1
+        journal = None
+        if self._operation != None:
+            journal = self._journal
+        try:
+            for tmp_website_contacts in WebsiteContacts.scrape_many(urls, self.workers, self.parse_processes, journal=journal, processes=self.processes):
+                print(tmp_website_contacts.url)
+                row = self.__contacts_row(tmp_website_contacts)
+                if journal != None:
+                    journal.record_result(self._operation, row[0], row)
+                self.__buffer_row(row)
+        finally:
+            # write the remaining rows, also when interrupted with Ctrl+C
+            self.flush_rows()
         
     def web_of_web_search_scrape(self):
         """Performs contact scraping of websites from websites from the Google Search page of the keyphrase(s)
@@ -194,36 +243,19 @@ class WebContactSheet:
         Return:
             None
         """
-    
-        for i in range(self._sheet2_num_keyphrases):
-            if (self._sheet2.cell(i+1, 2).value == 'to scrape'):
-                self._sheet2_keyphrases.append(self._sheet2.cell(i+1, 1).value)
-        
-        website_list = SortedSet()
-        for keyphrase in self._sheet2_keyphrases:
-            search = GoogleSearch(keyphrase)
-            for website in search.website_list:
-                website_list.add(website)
         
-        print()
-        print('Websites to scrape:')
-        print('-------------------')
-        for website in website_list:
-            print(website)
+        operation = 'web_of_web_search_scrape'
+        self.__begin(operation)
         
         print()
         print('Websites scraped:')
         print('-----------------')
-        for website in website_list:
-            # prevents duplicates from being scraped
-            if website in self._sheet1.col_values(1):
-                continue
-            print(website)
-            self.append_row(website)
+        # websites are scraped as the searches find them, and duplicates are not scraped
+        pipeline = ScrapePipeline(self._store.inputs(operation), True, self._journal, operation)
+        self.append_rows(self.__outstanding(operation, pipeline.websites(), skip_stored=True))
         
-        for i in range(self._sheet2_num_keyphrases):
-            if (self._sheet2.cell(i+1, 2).value == 'to scrape'):
-                self._sheet2.cell(i+1, 2).update_cell('scraped')
+        self._store.set_statuses(operation, 'scraped')
+        self.__finish(operation)
     
     def web_search_scrape(self):
         """Performs contact scraping of websites from the Google Search page of the keyphrase(s) from third
@@ -237,35 +269,18 @@ class WebContactSheet:
             None
         """
         
-        for i in range(self._sheet3_num_keyphrases):
-            if (self._sheet3.cell(i+1, 2).value == 'to scrape'):
-                self._sheet3_keyphrases.append(self._sheet3.cell(i+1, 1).value)
-        
-        url_list = SortedSet()
-        for keyphrase in self._sheet3_keyphrases:
-            search = GoogleSearch(keyphrase)
-            for url in search.url_list:
-                url_list.add(url)
+        operation = 'web_search_scrape'
+        self.__begin(operation)
         
-        print()
-        print('Websites to scrape:')
-        print('-------------------')
-        for url in url_list:
-            print(url)
-            
         print()
         print('Websites scraped:')
         print('-----------------')
-        for website in url_list:
-            # prevents duplicates from being scraped
-            if website in self._sheet1.col_values(1):
-                continue
-            print(website)
-            self.append_row(website)
+        # websites are scraped as the searches find them, and duplicates are not scraped
+        pipeline = ScrapePipeline(self._store.inputs(operation), False, self._journal, operation)
+        self.append_rows(self.__outstanding(operation, pipeline.websites(), skip_stored=True))
         
-        for i in range(self._sheet2_num_keyphrases):
-            if (self._sheet2.cell(i+1, 2).value == 'to scrape'):
-                self._sheet2.cell(i+1, 2).update_cell('scraped')
+        self._store.set_statuses(operation, 'scraped')
+        self.__finish(operation)
         
     def web_scrape(self):
         """Performs contact scraping of specified website(s) from fourth sheet of the Google Sheets file.
@@ -278,23 +293,22 @@ class WebContactSheet:
             None
         """
         
-        for i in range(self._sheet4_num_websites):
-            if (self._sheet4.cell(i+1, 2).value == 'to scrape'):
-                self._sheet4_websites.append(self._sheet4.cell(i+1, 1).value)
-                self._sheet2.cell(i+1, 2).update_cell('scraped')
-                
+        operation = 'web_scrape'
+        self.__begin(operation)
         print()
         print('Website(s) to scrape:')
         print('---------------------')
-        for website in self._sheet4_websites:
+        websites = self._store.inputs(operation)
+        for website in websites:
             print(website)
                 
         print()
         print('Website(s) scraped:')
         print('-------------------')
-        for website in self._sheet4_websites:
-            self.append_row(website)
-            print(website)
+        self.append_rows(self.__outstanding(operation, websites))
+        
+        self._store.set_statuses(operation, 'scraped')
+        self.__finish(operation)
         
 if __name__ == '__main__':
 
@@ -330,8 +344,8 @@ if __name__ == '__main__':
         print()
         if choice == '1':
             print('Before proceeding, enter the keywords for the search in the first column the second sheet of the Google Sheet file.')
-            print('NOTICE: Only run this operation once every 10 minutes if different search phrases are used. Otherwise, Google may ban your IP.')
-            print('NOTICE: If the program is re-run with the same search phrase, your IP is safe.')
+            print('NOTICE: Searches are queued to one every 10 minutes, so that Google does not ban your IP.')
+            print('NOTICE: If the program is re-run with the same search phrase within a week, Google is not searched again.')
             confirm = input('Would you like to proceed directly to scraping? (Y/N): ').upper()
             print(confirm)
             while confirm != 'Y' and confirm != 'N':
@@ -340,8 +354,8 @@ if __name__ == '__main__':
                 wcs_manager.web_of_web_search_scrape()
         if choice == '2':
             print('Before proceeding, enter the keywords for the search in the first column the third sheet of the Google Sheet file.')
-            print('NOTICE: Only run this operation once every 10 minutes if different search phrases are used. Otherwise, Google may ban your IP.')
-            print('NOTICE: If the program is re-run with the same search phrase, your IP is safe.')
+            print('NOTICE: Searches are queued to one every 10 minutes, so that Google does not ban your IP.')
+            print('NOTICE: If the program is re-run with the same search phrase within a week, Google is not searched again.')
             confirm = input('EWould you like to proceed directly to scraping? (Y/N): ').upper()
             while confirm != 'Y' and confirm != 'N':
                 confirm = input('Would you like to proceed directly to scraping? (Y/N): ').upper()
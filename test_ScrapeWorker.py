@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from ScrapeWorker import ScrapeWorker
+
+class QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+class ScrapeWorkerTest(unittest.TestCase):
+    """
+    Scrapes a local website in a worker process through ScrapeWorker.scrape(), the way scrape_many() and
+    WebContactSheet do without the CLI.
+    """
+
+    def setUp(self):
+        self._directory = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self._directory, 'contact'))
+        with open(os.path.join(self._directory, 'index.html'), 'w') as file:
+            file.write('<html><body><a href="/contact/">Contact</a></body></html>')
+        with open(os.path.join(self._directory, 'contact', 'index.html'), 'w') as file:
+            file.write('<html><body><a href="mailto:hello@example.com">hello@example.com</a></body></html>')
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), partial(QuietHandler, directory=self._directory))
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._url = 'http://127.0.0.1:{}/'.format(self._server.server_address[1])
+
+    def tearDown(self):
+        self._server.shutdown()
+        self._server.server_close()
+        shutil.rmtree(self._directory)
+
+    def test_scrape_without_cli(self):
+        queue_path = os.path.join(self._directory, 'JobQueue.sqlite3')
+        settings = ScrapeWorker.settings(workers=2)
+        # responses of an earlier server on the same port must not be read from the cache
+        settings['client'] = {'cache_path': None}
+        records = list(ScrapeWorker.scrape([self._url], 1, queue_path, settings))
+        self.assertEqual([record.url for record in records], [self._url])
+        self.assertIn('hello@example.com', records[0].emails)
+
+if __name__ == '__main__':
+    unittest.main()